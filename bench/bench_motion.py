@@ -0,0 +1,68 @@
+"""Benchmark the motion detector, in frames per second per core.
+
+    python bench/bench_motion.py --size 160x90 --zones "0,0,.5,1;.5,0,1,1"
+
+Random frames are copied into the detector buffer as the ffmpeg pipe
+does, then processed; the time is CPU time of this process, so the
+result is per core. The ffmpeg decode of the stream is not included.
+Needs numpy and Home Assistant installed.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import report
+
+from custom_components.aqara_camera.const import (
+    MOTION_FPS,
+    MOTION_HEIGHT,
+    MOTION_WIDTH,
+)
+from custom_components.aqara_camera.motion import MotionDetector, parse_zones
+
+
+def measure(width, height, zones, frames):
+    """Return frames per second of one core at a frame size."""
+    detector = MotionDetector(width, height, zones)
+    buffer = detector.buffer
+    rng = np.random.default_rng(0)
+    chunks = [
+        rng.integers(0, 255, width * height, dtype=np.uint8).tobytes()
+        for _ in range(8)
+    ]
+    started = time.process_time()
+    for index in range(frames):
+        buffer[:] = chunks[index % len(chunks)]
+        detector.process()
+    elapsed = time.process_time() - started
+    return {
+        "size": "{}x{}".format(width, height),
+        "zones": len(zones) or 1,
+        "frames_per_s": round(frames / elapsed),
+        "us_per_frame": round(elapsed / frames * 1e6, 1),
+    }
+
+
+def main():
+    """Parse the arguments and benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", action="append",
+                        help="WIDTHxHEIGHT, may be given more than once")
+    parser.add_argument("--zones", default="",
+                        help="left,top,right,bottom;... as frame fractions")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--output", help="also write the report here")
+    args = parser.parse_args()
+    zones = parse_zones(args.zones)
+    sizes = args.size or ["{}x{}".format(MOTION_WIDTH, MOTION_HEIGHT)]
+    results = []
+    for size in sizes:
+        width, height = (int(value) for value in size.split("x"))
+        results.append(measure(width, height, zones, args.frames))
+    report("motion", {"fps_per_camera": MOTION_FPS, "results": results},
+           args.output)
+
+
+if __name__ == "__main__":
+    main()
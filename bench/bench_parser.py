@@ -0,0 +1,140 @@
+"""Benchmark the property dump parser against the regex it replaced.
+
+    python bench/bench_parser.py --fixture g3_sentinel.json --split 64
+
+The dumps are the ones of the recorded sessions in tests/fixtures: each
+session is replayed to the shell, and the chunks get_all_props hands to
+its feed are what both parsers get. --split cuts the answers of the
+replay into pieces of at most that many bytes, as a slow link would.
+--dump reads a dump saved with "agetprop > dump.txt" on a camera
+instead, fed in --chunk sized pieces.
+
+Both parsers must agree with each other and with what the session
+parsed to when recorded. The report has the time per dump and the peak
+memory allocated while parsing one.
+"""
+import argparse
+import asyncio
+import os
+import re
+import time
+import tracemalloc
+
+from common import report
+
+from core.parser import PropertyParser
+from core.shell import shell_class
+from replay import FIXTURES, ReplayCamera, load_session
+
+
+async def async_capture(fixture, split):
+    """Replay fixture and return the chunks the property feed got."""
+    camera = ReplayCamera(fixture["session"], split=split)
+    shell = shell_class(fixture["model"])(
+        "127.0.0.1", port=await camera.start(), framing=fixture["framing"])
+    chunks = []
+    try:
+        await shell.connect()
+        await shell.login()
+        await shell.get_all_props(chunks.append)
+    finally:
+        await shell.close()
+        await camera.stop()
+    if camera.mismatches:
+        raise RuntimeError("the shell no longer sends what was recorded")
+    return chunks
+
+
+def read_dump(path, chunk):
+    """Return a dump saved from a camera in chunk sized pieces."""
+    with open(path, encoding="utf-8", errors="replace") as file:
+        dump = file.read().replace("\r\n", "\n").replace("\n", "\r\n")
+    return [dump[start:start + chunk] for start in range(0, len(dump), chunk)]
+
+
+def parse_regex(chunks):
+    """Parse as the integration did before PropertyParser."""
+    # the whole dump was read first
+    raw = "".join(chunks).replace("\r", "").replace("\n", "")
+    properties = {}
+    matches = iter(re.findall(r'(\[[^[]+\])', raw))
+    while True:
+        try:
+            key = next(matches)
+            value = next(matches)
+            if not value.strip("[").rstrip("]").endswith("..."):
+                properties[key.strip("[").rstrip("]")] = \
+                    value.strip("[").rstrip("]")
+        except StopIteration:
+            break
+    return properties
+
+
+def parse_stream(chunks):
+    """Parse with PropertyParser, fed as the socket delivered it."""
+    parser = PropertyParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def measure(parse, chunks, runs):
+    """Return ms per dump and peak KiB allocated for one dump."""
+    started = time.perf_counter()
+    for _ in range(runs):
+        parse(chunks)
+    elapsed = (time.perf_counter() - started) / runs
+    tracemalloc.start()
+    parse(chunks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms_per_dump": round(elapsed * 1000, 4),
+            "peak_kib": round(peak / 1024, 1)}
+
+
+def bench(chunks, runs, expected=None):
+    """Check both parsers on one dump and time them."""
+    properties = parse_regex(chunks)
+    if parse_stream(chunks) != properties:
+        raise RuntimeError("the parsers disagree on this dump")
+    if expected is not None and properties != expected:
+        raise RuntimeError("the dump no longer parses as recorded")
+    return {
+        "parsed_properties": len(properties),
+        "bytes": sum(len(chunk) for chunk in chunks),
+        "chunks": len(chunks),
+        "regex": measure(parse_regex, chunks, runs),
+        "property_parser": measure(parse_stream, chunks, runs),
+    }
+
+
+def main():
+    """Parse the arguments and benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", action="append",
+                        help="a session in tests/fixtures, all by default")
+    parser.add_argument("--split", type=int,
+                        help="cut the replayed answers into this size")
+    parser.add_argument("--dump", help="a dump saved from a camera")
+    parser.add_argument("--chunk", type=int, default=4096,
+                        help="bytes per socket read of --dump")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--output", help="also write the report here")
+    args = parser.parse_args()
+    results = {}
+    if args.dump:
+        results[args.dump] = bench(read_dump(args.dump, args.chunk),
+                                   args.runs)
+    else:
+        names = args.fixture or sorted(
+            name for name in os.listdir(FIXTURES) if name.endswith(".json"))
+        for name in names:
+            fixture = load_session(name)
+            chunks = asyncio.run(async_capture(fixture, args.split))
+            results[name] = bench(chunks, args.runs,
+                                  fixture["expected"]["properties"])
+    report("parser", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
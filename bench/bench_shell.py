@@ -0,0 +1,116 @@
+"""Benchmark the shell layer offline.
+
+    python bench/bench_shell.py --latency 0.02 --jitter 0.01 --split 64
+
+Connect and property fetch run against a replay of a recorded G3
+session, so the bytes on the wire are the camera's; latency, jitter and
+split shape the link. Full prepare and PTZ steps need a camera that
+answers any command, they run against the fake camera of the tests
+with the same latency. Needs Home Assistant installed for AqaraCamera.
+"""
+import argparse
+import asyncio
+import time
+
+from common import report, route_ports, summary
+
+from core.aqara_camera import AqaraCamera
+from core.const import STREAM_SUB
+from core.parser import PropertyParser
+from core.shell import shell_class
+from fake_camera import FakeCamera
+from replay import ReplayCamera, load_session
+
+
+async def _async_replay_shell(camera, fixture):
+    """Return a shell connected to the replay, not yet logged in."""
+    shell = shell_class(fixture["model"])(
+        "127.0.0.1", port=camera.port, framing=fixture["framing"])
+    await shell.connect()
+    return shell
+
+
+async def async_bench_replay(args):
+    """Time connect and login, then the property dump, per session."""
+    fixture = load_session(args.fixture)
+    camera = ReplayCamera(fixture["session"], args.latency, args.jitter,
+                          args.split)
+    await camera.start()
+    connect, fetch = [], []
+    try:
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            shell = await _async_replay_shell(camera, fixture)
+            try:
+                await shell.login()
+                connect.append(time.perf_counter() - started)
+                parser = PropertyParser()
+                started = time.perf_counter()
+                await shell.get_all_props(parser.feed)
+                parser.close()
+                fetch.append(time.perf_counter() - started)
+            finally:
+                await shell.close()
+    finally:
+        await camera.stop()
+    if camera.mismatches:
+        raise RuntimeError("the shell no longer sends what was recorded")
+    return {"connect": summary(connect), "property_fetch": summary(fetch)}
+
+
+async def async_bench_camera(args):
+    """Time a full prepare and single PTZ steps of an AqaraCamera."""
+    fake = FakeCamera(latency=args.latency)
+    route_ports(AqaraCamera, {"127.0.0.1": await fake.start()})
+    prepare, steps = [], []
+    try:
+        for _ in range(args.runs):
+            camera = AqaraCamera(None, "127.0.0.1", "g3", STREAM_SUB)
+            started = time.perf_counter()
+            await camera.async_connect()
+            await camera.async_get_device_info()
+            await camera.async_get_product_info()
+            await camera.async_prepare({}, provision=False)
+            prepare.append(time.perf_counter() - started)
+            if not camera.rtsp_url:
+                raise RuntimeError("the fake camera did not prepare")
+            for direction in ("left", "right", "up", "down"):
+                started = time.perf_counter()
+                await camera.async_ptz_control(direction, None, None)
+                steps.append(time.perf_counter() - started)
+            await camera.ptz.async_stop()
+            await camera.async_close()
+    finally:
+        await fake.stop()
+    return {"prepare": summary(prepare), "ptz_step": summary(steps)}
+
+
+async def async_bench(args):
+    """Run every benchmark and return the report."""
+    return {
+        "latency_ms": args.latency * 1000,
+        "jitter_ms": args.jitter * 1000,
+        "split": args.split,
+        **await async_bench_replay(args),
+        **await async_bench_camera(args),
+    }
+
+
+def main():
+    """Parse the arguments and benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds before every answer")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="random extra seconds of up to this much")
+    parser.add_argument("--split", type=int, default=None,
+                        help="cut answers into pieces of at most this size")
+    parser.add_argument("--fixture", default="g3_sentinel.json")
+    parser.add_argument("--output", help="also write the report here")
+    args = parser.parse_args()
+    report("shell", asyncio.run(async_bench(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Shared setup of the Aqara Camera benchmarks.
+
+Like the tests, the benchmarks import the core package from the
+component folder and the fake cameras from the tests folder. Every
+benchmark prints one JSON report, so results can be kept and compared
+across releases.
+"""
+import json
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENT = os.path.join(ROOT, "custom_components", "aqara_camera")
+TESTS = os.path.join(ROOT, "tests")
+
+for path in (ROOT, COMPONENT, TESTS):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def summary(samples):
+    """Return count, mean, median, p95 and max of samples in ms."""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def report(name, results, output=None):
+    """Print the report of a benchmark and write it to output if set."""
+    text = json.dumps({"benchmark": name, **results}, indent=1)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+
+def route_ports(camera_class, ports):
+    """Make camera_class connect to ports[host] instead of port 23.
+
+    The fake cameras listen on ports of their own, a real one always
+    answers on the telnet port.
+    """
+    # the shells of the same module copy as the camera, so they share
+    # its command priorities
+    shell_class = sys.modules[camera_class.__module__].shell_class
+
+    def create_shell(camera):
+        # pylint: disable=protected-access
+        return shell_class(camera._device_name)(
+            camera._host, port=ports[camera._host],
+            framing=camera._framing, metrics=camera.metrics)
+
+    camera_class.create_shell = create_shell
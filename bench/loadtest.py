@@ -0,0 +1,218 @@
+"""Load test the integration with a fleet of fake cameras.
+
+    python bench/loadtest.py --cameras 100 --latency 0.02 --concurrency 16
+
+Starts one fake G3 per loopback address (127.0.0.2 and up, Linux only),
+boots a bare Home Assistant in a scratch config folder, adds one config
+entry per camera and reports as JSON:
+
+- the time until every entry is loaded, and until the background
+  provisioning of every camera is done,
+- the longest event loop stall and the time spent in stalls,
+- the peak thread count, the executor threads included,
+- the memory traced per camera,
+- the PTZ service calls per second with every camera called at once,
+- the time to unload every entry.
+
+It boots Home Assistant by hand through internals that change between
+releases (bootstrap.async_load_base_functionality, the ConfigEntry
+constructor), so it targets Home Assistant 2024.3 only:
+
+    pip install homeassistant==2024.3.3
+"""
+import argparse
+import asyncio
+import logging
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from common import report, route_ports
+
+from homeassistant import bootstrap, config_entries, core, loader
+from homeassistant.auth import auth_manager_from_config
+from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
+from homeassistant.setup import async_setup_component
+
+from custom_components.aqara_camera.const import (
+    CONF_MODEL,
+    CONF_RTSP_AUTH,
+    CONF_SETUP_CONCURRENCY,
+    CONF_STREAM,
+    DOMAIN,
+    SERVICE_PTZ,
+    STREAM_SUB,
+)
+from custom_components.aqara_camera.core.aqara_camera import AqaraCamera
+from custom_components.aqara_camera.startup import get_startup_coordinator
+from fake_camera import G3_PROPERTIES, FakeCamera
+
+# a main loop iteration slower than this counts as a stall
+STALL = 0.05
+# the Home Assistant release the hand-made boot below is written for
+HA_VERSION = (2024, 3)
+
+
+class LoopMonitor:
+    """Measure event loop stalls and the peak thread count."""
+
+    def __init__(self, interval=0.01):
+        """Initialize the monitor."""
+        self.interval = interval
+        self.longest = 0.0
+        self.stalled = 0.0
+        self.threads = threading.active_count()
+        self._task = None
+
+    def start(self):
+        """Start sampling."""
+        self._task = asyncio.create_task(self._async_run())
+
+    def stop(self):
+        """Stop sampling."""
+        self._task.cancel()
+
+    async def _async_run(self):
+        """Sleep and see how late the wakeup is."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            late = time.perf_counter() - started - self.interval
+            self.longest = max(self.longest, late)
+            if late > STALL:
+                self.stalled += late
+            self.threads = max(self.threads, threading.active_count())
+
+
+async def async_start_fleet(count, latency):
+    """Start count fake cameras, return them by host."""
+    fleet = {}
+    for index in range(count):
+        host = "127.0.0.{}".format(index + 2)
+        properties = dict(G3_PROPERTIES)
+        properties["persist.sys.miio_mac"] = \
+            "54:ef:44:00:{:02x}:{:02x}".format(index // 256, index % 256)
+        camera = fleet[host] = FakeCamera(properties, latency)
+        await camera.start(host)
+    return fleet
+
+
+async def async_start_hass(config_dir, concurrency):
+    """Return a bare Home Assistant with the integration set up."""
+    hass = core.HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await bootstrap.async_load_base_functionality(hass)
+    hass.auth = await auth_manager_from_config(hass, [], [])
+    await hass.async_start()
+    assert await async_setup_component(
+        hass, DOMAIN, {DOMAIN: {CONF_SETUP_CONCURRENCY: concurrency}})
+    return hass
+
+
+async def async_wait_provisioned(hass, entries):
+    """Wait until the background setup of every entry is done."""
+    timings = get_startup_coordinator(hass).timings
+    while any("provision" not in timings.get(entry.entry_id, {})
+              for entry in entries):
+        await asyncio.sleep(0.05)
+
+
+async def async_ptz_rate(hass, entries, rounds):
+    """Call the PTZ service on every camera at once, return calls/s."""
+    entity_ids = hass.states.async_entity_ids("camera")
+    if len(entity_ids) != len(entries):
+        raise RuntimeError("{} cameras of {} have an entity".format(
+            len(entity_ids), len(entries)))
+    started = time.perf_counter()
+    for index in range(rounds):
+        direction = "right" if index % 2 else "left"
+        await asyncio.gather(*(
+            hass.services.async_call(
+                DOMAIN, SERVICE_PTZ,
+                {"entity_id": entity_id, "direction": direction},
+                blocking=True)
+            for entity_id in entity_ids
+        ))
+    return len(entity_ids) * rounds / (time.perf_counter() - started)
+
+
+async def async_loadtest(args):
+    """Run the load test and return the report."""
+    fleet = await async_start_fleet(args.cameras, args.latency)
+    route_ports(AqaraCamera, {host: fake.port for host, fake in fleet.items()})
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_start_hass(config_dir, args.concurrency)
+        monitor = LoopMonitor()
+        monitor.start()
+        tracemalloc.start()
+        memory = tracemalloc.get_traced_memory()[0]
+
+        entries = [
+            config_entries.ConfigEntry(
+                version=2, minor_version=1, domain=DOMAIN,
+                title="G3 {}".format(host), source="user", options={},
+                data={"host": host, CONF_MODEL: "g3",
+                      CONF_STREAM: STREAM_SUB, CONF_RTSP_AUTH: True},
+            )
+            for host in fleet
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            hass.config_entries.async_add(entry) for entry in entries))
+        loaded = time.perf_counter() - started
+        await async_wait_provisioned(hass, entries)
+        provisioned = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[0] - memory
+        tracemalloc.stop()
+
+        ptz = await async_ptz_rate(hass, entries, args.ptz_rounds)
+        monitor.stop()
+        failed = [entry.title for entry in entries
+                  if entry.state is not config_entries.ConfigEntryState.LOADED]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            hass.config_entries.async_unload(entry.entry_id)
+            for entry in entries))
+        unloaded = time.perf_counter() - started
+        await hass.async_stop()
+    for fake in fleet.values():
+        await fake.stop()
+    return {
+        "cameras": args.cameras,
+        "latency_ms": args.latency * 1000,
+        "setup_concurrency": args.concurrency,
+        "failed": failed,
+        "loaded_s": round(loaded, 2),
+        "provisioned_s": round(provisioned, 2),
+        "loop_stall_max_ms": round(monitor.longest * 1000, 1),
+        "loop_stalled_s": round(monitor.stalled, 2),
+        "threads_peak": monitor.threads,
+        "memory_per_camera_kib": round(memory / args.cameras / 1024, 1),
+        "ptz_calls_per_s": round(ptz, 1),
+        "unloaded_s": round(unloaded, 2),
+    }
+
+
+def main():
+    """Parse the arguments and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cameras", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds before every camera answer")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="setup_concurrency of the integration")
+    parser.add_argument("--ptz-rounds", type=int, default=4)
+    parser.add_argument("--output", help="also write the report here")
+    args = parser.parse_args()
+    if (MAJOR_VERSION, MINOR_VERSION) != HA_VERSION:
+        parser.error("needs Home Assistant {}.{}, found {}.{}".format(
+            *HA_VERSION, MAJOR_VERSION, MINOR_VERSION))
+    logging.basicConfig(level=logging.ERROR)
+    report("loadtest", asyncio.run(async_loadtest(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Record a camera telnet session as a replay fixture.
+
+    python bench/record_session.py 192.168.1.20 g3 tests/fixtures/x.json
+
+runs the fixture scenario of tests/replay.py against the camera and
+writes what was sent and received, with the parsed results to check
+replays against. With --fake the scenario runs against the fake camera
+of the tests instead.
+"""
+import argparse
+import asyncio
+
+import common  # noqa: F401 pylint: disable=unused-import
+
+from core.shell import FRAMING_PROMPT, FRAMING_SENTINEL, shell_class
+from fake_camera import FakeCamera
+from replay import SessionRecorder, async_run_scenario, save_session
+
+
+async def async_record(args):
+    """Record the scenario and write the fixture."""
+    camera = None
+    host, port = args.host, args.port
+    if args.fake:
+        camera = FakeCamera(generic="g3" not in args.model)
+        host, port = "127.0.0.1", await camera.start()
+    shell = shell_class(args.model)(host, port=port, framing=args.framing)
+    recorder = shell.recorder = SessionRecorder()
+    try:
+        await shell.connect()
+        expected = await async_run_scenario(shell)
+    finally:
+        await shell.close()
+        if camera is not None:
+            await camera.stop()
+    save_session(
+        args.output,
+        recorder.session,
+        description=args.description,
+        model=args.model,
+        framing=args.framing,
+        expected=expected,
+    )
+
+
+def main():
+    """Parse the arguments and record."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("host")
+    parser.add_argument("model", help="g3 or another model name")
+    parser.add_argument("output")
+    parser.add_argument("--port", type=int, default=23)
+    parser.add_argument("--framing", default=FRAMING_SENTINEL,
+                        choices=(FRAMING_SENTINEL, FRAMING_PROMPT))
+    parser.add_argument("--fake", action="store_true",
+                        help="record the fake camera of the tests")
+    parser.add_argument("--description", default="")
+    asyncio.run(async_record(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
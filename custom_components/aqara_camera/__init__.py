@@ -1,73 +1,263 @@
 """The Aqara Camera component."""
+from functools import partial
 import logging
+import os
+
+import voluptuous as vol
 
 from .core.aqara_camera import (
     ERROR_AQARA_CAMERA_AUTH,
     ERROR_AQARA_CAMERA_UNAVAILABLE,
-    AQARA_CAMERA_SUCCESS,
-    AqaraCamera
+    AQARA_CAMERA_SUCCESS
 )
+from .core.const import PRIORITY_BACKGROUND
+from .core.provision import DOWNLOAD_URL, MI_MOTOR, MOSQUITTO
+from .core.scheduler import command_priority
+from .core.session import get_session_manager
 from .core.exceptions import CannotConnect, InvalidAuth, InvalidResponse
 
+from homeassistant.components.ffmpeg import DATA_FFMPEG
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .const import (
     DOMAIN,
     CONF_MODEL,
     CONF_STREAM,
     CONF_RTSP_AUTH,
+    CONF_SETUP_CONCURRENCY,
+    CONF_MQTT_BRIDGE,
+    CONF_MOTION,
+    CONF_MOTION_ZONES,
+    CONF_BINARY_SOURCE,
+    BINARY_SOURCE_CAMERA,
+    BINARY_SOURCE_HOST,
+    DATA_BINARY_SOURCE,
+    DATA_DEVICE_CACHE,
+    DATA_STARTUP,
+    DEFAULT_SETUP_CONCURRENCY,
+    MOTION_WIDTH,
+    MOTION_HEIGHT,
     PLATFORMS
 )
+from .coordinator import AqaraCameraCoordinator
+from .motion import MotionEngine, parse_zones
+from .presets import async_remove_presets
+from .startup import StartupCoordinator, get_startup_coordinator
+from .store import DeviceCache, get_device_cache
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(
+                    CONF_SETUP_CONCURRENCY, default=DEFAULT_SETUP_CONCURRENCY
+                ): cv.positive_int,
+                vol.Optional(
+                    CONF_BINARY_SOURCE, default=BINARY_SOURCE_CAMERA
+                ): vol.In([BINARY_SOURCE_CAMERA, BINARY_SOURCE_HOST]),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    """Set up the Aqara Camera component."""
+    conf = config.get(DOMAIN, {})
+    hass.data[DATA_STARTUP] = StartupCoordinator(
+        conf.get(CONF_SETUP_CONCURRENCY, DEFAULT_SETUP_CONCURRENCY)
+    )
+    hass.data[DATA_BINARY_SOURCE] = conf.get(
+        CONF_BINARY_SOURCE, BINARY_SOURCE_CAMERA
+    )
+    cache = hass.data[DATA_DEVICE_CACHE] = DeviceCache(hass)
+    await cache.async_load()
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up aqara camera from a config entry."""
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    startup = get_startup_coordinator(hass)
+    manager = get_session_manager(hass)
+    host = entry.data[CONF_HOST]
+    snapshot = get_device_cache(hass).get(host)
+    async with startup.async_slot(entry.entry_id):
+        if snapshot is not None:
+            # last known state is enough to add the entity, the camera is
+            # logged in and checked again in the background
+            camera = await manager.async_acquire(
+                host,
+                entry.data[CONF_MODEL],
+                entry.data[CONF_STREAM],
+                snapshot=snapshot,
+            )
+        else:
+            camera = await _async_connect(hass, entry)
 
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {"config": entry.data}
+        coordinator = AqaraCameraCoordinator(hass, entry, camera)
+        data = {
+            "config": entry.data,
+            "camera": camera,
+            "coordinator": coordinator,
+            "motion": _motion_engine(hass, entry, camera)
+        }
 
-    camera = AqaraCamera(
+        hass.data.setdefault(DOMAIN, {})[entry.entry_id] = data
+
+        with startup.timed(entry.entry_id, "platforms"):
+            await hass.config_entries.async_forward_entry_setups(
+                entry, PLATFORMS
+            )
+
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+    entry.async_on_unload(
+        camera.push.async_add_listener(coordinator.async_push_update)
+    )
+
+    # binary check and post_init.sh install are not needed to stream
+    entry.async_create_background_task(
         hass,
-        entry.data[CONF_HOST],
-        entry.data[CONF_MODEL],
-        entry.data[CONF_STREAM],
-        verbose=False,
+        _async_provision(hass, entry, camera, snapshot),
+        f"{DOMAIN}_provision_{entry.entry_id}",
     )
-    ret = camera.connect()
-    if not ret:
-        raise CannotConnect
+    return True
 
-    # Validate data by sending a request to the camera
-    ret, _ = camera.get_product_info()
 
-    if ret == ERROR_AQARA_CAMERA_UNAVAILABLE:
-        raise CannotConnect
+def _motion_engine(hass: HomeAssistant, entry: ConfigEntry, camera):
+    """Return the motion engine of a camera, None when not enabled."""
+    if not entry.options.get(CONF_MOTION):
+        return None
+    manager = hass.data.get(DATA_FFMPEG)
+    if manager is None:
+        _LOGGER.warning(
+            "Motion detection of %s needs ffmpeg in configuration.yaml",
+            entry.title,
+        )
+        return None
+    return MotionEngine(
+        hass,
+        manager.binary,
+        lambda: camera.rtsp_url_for(MOTION_WIDTH, MOTION_HEIGHT),
+        parse_zones(entry.options.get(CONF_MOTION_ZONES, "")),
+    )
 
-    if ret == ERROR_AQARA_CAMERA_AUTH:
-        raise InvalidAuth
 
-    if ret != AQARA_CAMERA_SUCCESS:
-        _LOGGER.error(
-            "Unexpected error code from camera %s %s",
-            entry.data[CONF_HOST],
-            ret,
+async def _async_connect(hass: HomeAssistant, entry: ConfigEntry):
+    """Log into the camera and get it ready to stream."""
+    startup = get_startup_coordinator(hass)
+    manager = get_session_manager(hass)
+    host = entry.data[CONF_HOST]
+    with startup.timed(entry.entry_id, "connect"):
+        camera = await manager.async_acquire(
+            host,
+            entry.data[CONF_MODEL],
+            entry.data[CONF_STREAM],
         )
-        raise InvalidResponse
+    if not camera:
+        raise CannotConnect
 
-    config = {CONF_RTSP_AUTH: entry.data.get(CONF_RTSP_AUTH, True)}
-    await hass.async_add_executor_job(camera.prepare, config)
+    try:
+        with startup.timed(entry.entry_id, "product_info"):
+            # Validate data by sending a request to the camera
+            ret, _ = await camera.async_get_product_info()
 
-    data = {
-        "config": entry.data,
-        "camera": camera
-    }
+        if ret == ERROR_AQARA_CAMERA_UNAVAILABLE:
+            raise CannotConnect
 
-    hass.data[DOMAIN][entry.entry_id] = data
-    return True
+        if ret == ERROR_AQARA_CAMERA_AUTH:
+            raise InvalidAuth
+
+        if ret != AQARA_CAMERA_SUCCESS:
+            _LOGGER.error(
+                "Unexpected error code from camera %s %s",
+                host,
+                ret,
+            )
+            raise InvalidResponse
+
+        with startup.timed(entry.entry_id, "prepare"):
+            config = {CONF_RTSP_AUTH: entry.data.get(CONF_RTSP_AUTH, True)}
+            await camera.async_prepare(config, provision=False)
+    except Exception:
+        await manager.async_release(host)
+        raise
+    return camera
+
+
+async def _async_provision(
+    hass: HomeAssistant, entry: ConfigEntry, camera, snapshot
+):
+    """Run the non-critical camera setup in the background.
+
+    A camera restored from a snapshot is revalidated first; a firmware
+    change invalidates the snapshot and forces a full binary check. All
+    of it runs at background priority, behind the stream and PTZ.
+    """
+    with command_priority(PRIORITY_BACKGROUND):
+        startup = get_startup_coordinator(hass)
+        host = entry.data[CONF_HOST]
+        verified = False
+        if snapshot is not None:
+            with startup.timed(entry.entry_id, "revalidate"):
+                await get_session_manager(hass).async_reconnect(host)
+                await camera.async_get_device_info()
+                verified = camera.fw_version == snapshot.get("fw_version")
+                if not verified:
+                    _LOGGER.info(
+                        "Firmware of camera %s changed, refreshing its state",
+                        host,
+                    )
+                config = {CONF_RTSP_AUTH: entry.data.get(CONF_RTSP_AUTH, True)}
+                await camera.async_prepare(config, provision=False)
+                # through the watcher, so a new url restarts the stream
+                await camera.watcher.async_check()
+
+        fetch = None
+        if hass.data.get(DATA_BINARY_SOURCE) == BINARY_SOURCE_HOST:
+            fetch = partial(_async_fetch_binary, hass)
+        binaries = (MI_MOTOR,)
+        if entry.options.get(CONF_MQTT_BRIDGE):
+            binaries += (MOSQUITTO,)
+        with startup.timed(entry.entry_id, "provision"):
+            await camera.async_provision(verified, fetch, binaries)
+        get_device_cache(hass).async_save(host, camera.snapshot())
+
+        if entry.options.get(CONF_MQTT_BRIDGE):
+            with startup.timed(entry.entry_id, "mqtt"):
+                if not await camera.async_start_mqtt():
+                    _LOGGER.info(
+                        "MQTT bridge of camera %s unavailable, using telnet",
+                        host,
+                    )
+
+
+async def _async_fetch_binary(hass: HomeAssistant, binary) -> bytes:
+    """Return a camera binary from <config>/aqara_camera or the internet."""
+    path = hass.config.path(DOMAIN, binary.name)
+    if os.path.isfile(path):
+        return await hass.async_add_executor_job(_read_file, path)
+    session = async_get_clientsession(hass)
+    async with session.get(DOWNLOAD_URL.format(binary.url)) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+def _read_file(path: str) -> bytes:
+    """Read a file in the executor."""
+    with open(path, "rb") as file:
+        return file.read()
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload the camera when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -75,6 +265,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        await get_session_manager(hass).async_release(entry.data[CONF_HOST])
 
     return unload_ok
 
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget the device snapshot and presets of a removed camera."""
+    get_device_cache(hass).async_remove(entry.data[CONF_HOST])
+    await async_remove_presets(hass, entry.entry_id)
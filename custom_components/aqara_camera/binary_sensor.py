@@ -0,0 +1,91 @@
+"""Motion and PTZ binary sensors for Aqara Camera."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .core.const import SYS_PTZ_MOVING
+from .entity import AqaraCameraPropertyEntity
+from .motion import MotionEngine
+
+PTZ_MOVING = BinarySensorEntityDescription(
+    key=SYS_PTZ_MOVING,
+    name="PTZ moving",
+    device_class=BinarySensorDeviceClass.MOVING,
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Add the PTZ sensor, and the motion sensor if motion is detected."""
+    data = hass.data[DOMAIN][config_entry.entry_id]
+    entities: list[BinarySensorEntity] = [
+        AqaraCameraPtzMovingSensor(data["coordinator"], config_entry, PTZ_MOVING)
+    ]
+    if data["motion"] is not None:
+        entities.append(AqaraCameraMotionSensor(data["motion"], config_entry))
+    async_add_entities(entities)
+
+
+class AqaraCameraMotionSensor(BinarySensorEntity):
+    """Report motion found by the host-side motion engine.
+
+    The engine decodes the stream while this entity exists, its state is
+    pushed on every start and end of a motion event.
+    """
+
+    _attr_device_class = BinarySensorDeviceClass.MOTION
+    _attr_should_poll = False
+
+    def __init__(self, engine: MotionEngine, config_entry: ConfigEntry) -> None:
+        """Initialize the sensor."""
+        self._engine = engine
+        self._attr_name = f"{config_entry.title} Motion"
+        self._attr_unique_id = f"{config_entry.entry_id}_motion"
+        self._attr_device_info = {
+            "identifiers": {
+                (DOMAIN, slugify(f"{config_entry.title}_{config_entry.entry_id}"))
+            },
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Start the engine."""
+        self.async_on_remove(
+            self._engine.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def is_on(self) -> bool:
+        """Return True during a motion event."""
+        return self._engine.motion
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the zones and those with motion."""
+        return {
+            "zones": self._engine.zones,
+            "active_zones": self._engine.active_zones,
+            "detecting": self._engine.enabled,
+        }
+
+
+class AqaraCameraPtzMovingSensor(AqaraCameraPropertyEntity, BinarySensorEntity):
+    """Report while the camera turns, pushed by the camera."""
+
+    @property
+    def is_on(self) -> bool:
+        """Return True while the motor runs."""
+        return self._value == "true"
@@ -3,31 +3,45 @@ from __future__ import annotations
 
 import logging
 import asyncio
+import os
+import tempfile
 
 from homeassistant.components import ffmpeg
 from homeassistant.components.camera import CameraEntityFeature, Camera
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import entity_platform
 from homeassistant.components.ffmpeg import DATA_FFMPEG
-from homeassistant.exceptions import HomeAssistantError
 from homeassistant.util import slugify
-from homeassistant.const import CONF_HOST
-
-from .core.aqara_camera import (
-    AqaraCamera
-)
 
 from .core.const import (
     AQARA_CAMERA_SUCCESS,
-    ERROR_AQARA_CAMERA_UNAVAILABLE
+    ERROR_AQARA_CAMERA_UNAVAILABLE,
+    PERSIST_REC_MODE
 )
 
+from .presets import PresetManager
+from .recorder import RingRecorder
+from .snapshot import SnapshotCache, WarmSnapshotEngine
+
 from .const import (
     CONF_MODEL,
     CONF_STREAM,
+    CONF_WARM_SNAPSHOT,
+    CONF_RECORDER,
     DIR_PRESET,
     DOMAIN,
     SERVICE_PTZ,
+    SERVICE_PTZ_SAVE_PRESET,
+    SERVICE_PTZ_GOTO_PRESET,
+    SERVICE_PTZ_REMOVE_PRESET,
+    SERVICE_PTZ_PATROL,
+    SERVICE_PTZ_STOP_PATROL,
+    SERVICE_EXPORT_CLIP,
     SCHEMA_SERVICE_PTZ,
+    SCHEMA_SERVICE_PTZ_PRESET,
+    SCHEMA_SERVICE_PTZ_PATROL,
+    SCHEMA_SERVICE_EXPORT_CLIP,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -36,41 +50,54 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Add a Aqara camera from a config entry."""
 
-    data = hass.data.get(DOMAIN, None)
-    camera = None
-    if data:
-        camera = hass.data[DOMAIN][config_entry.entry_id].get("camera", None)
-    if not camera:
-        camera = AqaraCamera(
-            hass,
-            config_entry.data[CONF_HOST],
-            config_entry.data[CONF_MODEL],
-            config_entry.data[CONF_STREAM],
-            verbose=False,
-        )
-        ret = await hass.async_add_executor_job(camera.connect)
-        if not ret:
-            ret = await hass.async_add_executor_job(camera.connect)
-            if not ret:
-                raise CannotConnect
+    camera = hass.data[DOMAIN][config_entry.entry_id]["camera"]
+    if not camera.has_properties:
+        await camera.async_get_device_info()
 
-    await hass.async_add_executor_job(camera.get_device_info)
+    presets = PresetManager(hass, camera, config_entry.entry_id)
+    await presets.async_load()
 
-    async_add_entities([HassAqaraCamera(hass, camera, config_entry)])
+    motion = hass.data[DOMAIN][config_entry.entry_id]["motion"]
+    async_add_entities(
+        [HassAqaraCamera(hass, camera, config_entry, presets, motion)]
+    )
 
     platform = entity_platform.current_platform.get()
     platform.async_register_entity_service(
-        SERVICE_PTZ, SCHEMA_SERVICE_PTZ, "perform_ptz",
+        SERVICE_PTZ, SCHEMA_SERVICE_PTZ, "async_perform_ptz",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PTZ_SAVE_PRESET, SCHEMA_SERVICE_PTZ_PRESET,
+        "async_save_preset",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PTZ_GOTO_PRESET, SCHEMA_SERVICE_PTZ_PRESET,
+        "async_goto_preset",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PTZ_REMOVE_PRESET, SCHEMA_SERVICE_PTZ_PRESET,
+        "async_remove_preset",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PTZ_PATROL, SCHEMA_SERVICE_PTZ_PATROL, "async_patrol",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PTZ_STOP_PATROL, {}, "async_stop_patrol",
+    )
+    platform.async_register_entity_service(
+        SERVICE_EXPORT_CLIP, SCHEMA_SERVICE_EXPORT_CLIP, "async_export_clip",
     )
 
 class HassAqaraCamera(Camera):
     """An implementation of a Aqara Camera."""
 
-    def __init__(self, hass, camera, config_entry):
+    def __init__(self, hass, camera, config_entry, presets, motion=None):
         """Initialize a Aqara camera."""
         super().__init__()
 
         self._session = camera
+        self._presets = presets
+        self._motion = motion
         self._name = config_entry.title
         self._model = config_entry.data[CONF_MODEL]
         self._stream = config_entry.data[CONF_STREAM]
@@ -78,13 +105,43 @@ class HassAqaraCamera(Camera):
         self._motion_status = 0
         self._ffmpeg = hass.data.get(DATA_FFMPEG, None)
         self._attr_supported_features = CameraEntityFeature.STREAM
+        self._snapshots = SnapshotCache()
+        self._warm_snapshot = None
+        if self._ffmpeg and config_entry.options.get(CONF_WARM_SNAPSHOT):
+            self._warm_snapshot = WarmSnapshotEngine(
+                hass,
+                self._ffmpeg.binary,
+                lambda: self._session.camera_rtsp_url,
+            )
+        self._recorder = None
+        if self._ffmpeg and config_entry.options.get(CONF_RECORDER):
+            self._recorder = RingRecorder(
+                hass,
+                self._ffmpeg.binary,
+                lambda: self._session.camera_rtsp_url,
+                os.path.join(
+                    tempfile.gettempdir(), DOMAIN, config_entry.entry_id
+                ),
+            )
 
     async def async_added_to_hass(self):
         """Handle entity addition to hass."""
-        # Get product info
-        ret, response = await self.hass.async_add_executor_job(
-            self._session.get_product_info
+        self._attr_brand = self._session.brand
+        self._attr_model = self._session.model
+        self.async_on_remove(
+            self._session.watcher.async_add_listener(self._async_rtsp_update)
         )
+        self.async_on_remove(
+            self._session.push.async_add_listener(self._async_push_update)
+        )
+        if self._recorder:
+            self._recorder.start()
+        if not self._session.connected:
+            # restored from the device cache, state follows on next refresh
+            return
+
+        # Get product info
+        ret, response = await self._session.async_get_product_info()
 
         if ret == ERROR_AQARA_CAMERA_UNAVAILABLE:
             _LOGGER.info(
@@ -99,10 +156,42 @@ class HassAqaraCamera(Camera):
 
         else:
             self._motion_status = response == 1
-        self._attr_brand = self._session.brand
-        self._attr_model = self._session.model
-        self._attr_is_recording = self._session.is_recording
-        self._attr_motion_detection_enabled = not self._session.is_recording
+        self._attr_is_recording = await self._session.async_is_recording()
+        self._attr_motion_detection_enabled = not self._attr_is_recording
+
+    @callback
+    def _async_rtsp_update(self, url_changed):
+        """Follow a new rtsp url or recording mode of the camera."""
+        self._attr_is_recording = self._session.watcher.recording
+        self._attr_motion_detection_enabled = not self._attr_is_recording
+        if url_changed:
+            _LOGGER.debug("%s: rtsp url changed", self._name)
+            if self.stream:
+                self.stream.update_source(self._session.camera_rtsp_url)
+            if self._warm_snapshot:
+                # the decoder still reads the old url
+                self.hass.async_create_task(self._warm_snapshot.async_stop())
+            if self._motion:
+                self._motion.restart()
+            if self._recorder:
+                self._recorder.restart()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_push_update(self, changes):
+        """Apply property changes pushed by the camera."""
+        if PERSIST_REC_MODE in changes:
+            self._attr_is_recording = changes[PERSIST_REC_MODE] != "0"
+            self._attr_motion_detection_enabled = not self._attr_is_recording
+        self.async_write_ha_state()
+
+    async def async_will_remove_from_hass(self):
+        """Stop the snapshot decoder and the recorder."""
+        self._presets.async_stop_patrol()
+        if self._warm_snapshot:
+            await self._warm_snapshot.async_stop()
+        if self._recorder:
+            await self._recorder.async_stop()
 
     @property
     def unique_id(self):
@@ -131,44 +220,126 @@ class HassAqaraCamera(Camera):
     @property
     def extra_state_attributes(self):
         """Return the camera attributes."""
-        return {"rtsp_url": self._session.camera_rtsp_url}
+        return {
+            "rtsp_url": self._session.camera_rtsp_url,
+            "rtsp_urls": self._session.rtsp_urls,
+            "ptz_presets": self._presets.names,
+            **self._session.properties,
+        }
 
     @property
     def name(self):
         """Return the name of this camera."""
         return self._name
 
+    @property
+    def motion_detection_enabled(self):
+        """Return True while motion is detected on the host or camera."""
+        if self._motion:
+            return self._motion.enabled
+        return self._attr_motion_detection_enabled
+
+    async def async_enable_motion_detection(self):
+        """Start the host-side motion detection."""
+        if not self._motion:
+            await super().async_enable_motion_detection()
+            return
+        self._motion.set_enabled(True)
+        self.async_write_ha_state()
+
+    async def async_disable_motion_detection(self):
+        """Stop the host-side motion detection."""
+        if not self._motion:
+            await super().async_disable_motion_detection()
+            return
+        self._motion.set_enabled(False)
+        self.async_write_ha_state()
+
     async def async_camera_image(
         self, width: int | None = None, height: int | None = None
     ) -> bytes | None:
         """Return bytes of camera image."""
+        if self.stream and _stream_has_keyframe(self.stream):
+            # the stream worker already decodes keyframes
+            return await self.stream.async_get_image(width, height)
+        if self._warm_snapshot:
+            return await self._warm_snapshot.async_get_image(width, height)
         if self._ffmpeg:
-            return await ffmpeg.async_get_image(
-                self.hass,
-                self._session.camera_rtsp_url,
-                width=width,
-                height=height,
+            # decode the smallest profile that still covers the request
+            return await self._snapshots.async_get(
+                width,
+                height,
+                lambda: ffmpeg.async_get_image(
+                    self.hass,
+                    self._session.rtsp_url_for(width, height),
+                    width=width,
+                    height=height,
+                ),
             )
         return None
 
     async def stream_source(self):
-        """Return the stream source."""
-        self._session.get_product_info()
-        self._attr_is_recording = self._session.is_recording
+        """Return the stream source, kept current by the rtsp watcher."""
         if len(self._session.camera_rtsp_url) >= 1:
             return self._session.camera_rtsp_url
 
         return None
 
-    def perform_ptz(
+    async def async_perform_ptz(
         self, direction, angle_x=None, angle_y=None, span_x=None, span_y=None
     ):
         """Perform a PTZ action on the camera."""
         if direction.lower() == DIR_PRESET:
-            self._session.ptz_control_preset(angle_x, angle_y, span_x, span_y)
+            await self._session.async_ptz_control_preset(
+                angle_x, angle_y, span_x, span_y
+            )
         else:
-            self._session.ptz_control(direction, span_x, span_y)
+            await self._session.async_ptz_control(direction, span_x, span_y)
+
+    async def async_save_preset(self, preset):
+        """Save the current PTZ position as a preset."""
+        await self._presets.async_save_preset(preset)
+        self.async_write_ha_state()
+
+    async def async_goto_preset(self, preset):
+        """Move to a PTZ preset."""
+        await self._presets.async_goto_preset(preset)
+
+    async def async_remove_preset(self, preset):
+        """Remove a PTZ preset."""
+        self._presets.async_remove_preset(preset)
+        self.async_write_ha_state()
 
+    async def async_patrol(self, presets, dwell, cycles):
+        """Patrol between PTZ presets."""
+        self._presets.async_start_patrol(presets, dwell, cycles)
 
-class CannotConnect(HomeAssistantError):
-    """Error to indicate we cannot connect."""
+    async def async_stop_patrol(self):
+        """Stop the PTZ patrol."""
+        self._presets.async_stop_patrol()
+
+    async def async_export_clip(self, filename, before, after):
+        """Export a clip from the ring recorder."""
+        if not self._recorder:
+            raise HomeAssistantError(
+                f"The ring recorder of {self._name} is not enabled"
+            )
+        if not self.hass.config.is_allowed_path(filename):
+            raise HomeAssistantError(f"Can't write {filename}, no access to path!")
+        await self._recorder.async_export(filename, before, after)
+
+
+def _stream_has_keyframe(stream) -> bool:
+    """Return True when the stream worker runs and has seen a keyframe.
+
+    Stream.async_get_image starts the worker when it is not running,
+    which would open the main profile just for a still image.
+    """
+    thread = getattr(stream, "_thread", None)
+    if thread is None or not thread.is_alive():
+        return False
+    converter = getattr(stream, "_keyframe_converter", None)
+    return converter is not None and (
+        getattr(converter, "_image", None) is not None
+        or getattr(converter, "_packet", None) is not None
+    )
@@ -4,34 +4,44 @@ import logging
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.components import network
 from homeassistant.const import (
     CONF_HOST,
     CONF_NAME
 )
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import AbortFlow
 
 from .core.aqara_camera import (
     ERROR_AQARA_CAMERA_AUTH,
     ERROR_AQARA_CAMERA_UNAVAILABLE,
-    AQARA_CAMERA_SUCCESS,
-    AqaraCamera
+    AQARA_CAMERA_SUCCESS
 )
+from .core.const import MODEL_G3, SESSION_LINGER
+from .core.discovery import async_discover, async_fingerprint, lan_hosts
+from .core.session import get_session_manager
 from .core.exceptions import CannotConnect, InvalidAuth, InvalidResponse
 
 from .const import (
     CONF_MODEL,
     CONF_STREAM,
     CONF_RTSP_AUTH,
+    CONF_WARM_SNAPSHOT,
+    CONF_MQTT_BRIDGE,
+    CONF_MOTION,
+    CONF_MOTION_ZONES,
+    CONF_RECORDER,
     DOMAIN,
     OPT_DEVICE_NAME,
     STREAMS
 )
+from .motion import parse_zones
 
 
 DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_HOST): str,
-        vol.Required(CONF_MODEL, default="g3"): vol.In(OPT_DEVICE_NAME),
+        vol.Required(CONF_MODEL, default=MODEL_G3): vol.In(OPT_DEVICE_NAME),
         vol.Required(CONF_STREAM, default=STREAMS[0]): vol.In(STREAMS),
         vol.Optional(CONF_RTSP_AUTH, default=True): bool,
     }
@@ -44,7 +54,17 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 2
 
-    async def _validate_and_create(self, data):
+    def __init__(self):
+        """Initialize the flow."""
+        self._discovered = {}
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
+    async def _validate_and_create(self, data, login=None):
         """Validate the user input allows us to connect.
         Data has the keys from DATA_SCHEMA with values provided by the user.
         """
@@ -52,22 +72,26 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             {CONF_HOST: data[CONF_HOST]}
         )
 
-        camera = AqaraCamera(
-            self.hass,
+        manager = get_session_manager(self.hass)
+        camera = await manager.async_acquire(
             data[CONF_HOST],
             data[CONF_MODEL],
             data[CONF_STREAM],
-            verbose=False,
+            login=login,
         )
-        ret = await self.hass.async_add_executor_job(camera.connect)
-        if not ret:
+        if not camera:
             raise CannotConnect
 
-        config = {CONF_RTSP_AUTH: data.get(CONF_RTSP_AUTH, True)}
-        await self.hass.async_add_executor_job(camera.prepare, config)
+        try:
+            config = {CONF_RTSP_AUTH: data.get(CONF_RTSP_AUTH, True)}
+            await camera.async_prepare(config)
 
-        # Validate data by sending a request to the camera
-        ret, _ = await self.hass.async_add_executor_job(camera.get_product_info)
+            # Validate data by sending a request to the camera
+            ret, _ = await camera.async_get_product_info()
+            device_info = await camera.async_get_device_info()
+        finally:
+            # keep the login around for the entry setup that follows
+            await manager.async_release(data[CONF_HOST], SESSION_LINGER)
 
         if ret == ERROR_AQARA_CAMERA_UNAVAILABLE:
             raise CannotConnect
@@ -84,39 +108,161 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             raise InvalidResponse
 
         # Try to get camera name
-        ret = await self.hass.async_add_executor_job(camera.get_device_info)
-
-        dev_name = f"{ret[CONF_NAME]}"
+        dev_name = f"{device_info[CONF_NAME]}"
 
         name = data.pop(CONF_NAME, dev_name)
 
         return self.async_create_entry(title=name, data=data)
 
+    async def _async_try_create(self, data, errors, login=None):
+        """Create the entry, or fill errors and return None."""
+        try:
+            return await self._validate_and_create(data, login)
+
+        except CannotConnect:
+            errors["base"] = "cannot_connect"
+
+        except InvalidAuth:
+            errors["base"] = "invalid_auth"
+
+        except InvalidResponse:
+            errors["base"] = "invalid_response"
+
+        except AbortFlow:
+            raise
+
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Unexpected exception")
+            errors["base"] = "unknown"
+        return None
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
+        return self.async_show_menu(
+            step_id="user", menu_options=["discovery", "manual"]
+        )
+
+    async def async_step_manual(self, user_input=None):
+        """Set up a camera by its address."""
         errors = {}
 
         if user_input is not None:
+            self._async_abort_entries_match(
+                {CONF_HOST: user_input[CONF_HOST]}
+            )
+            # the dialect the camera answers in beats the model picked,
+            # and the camera goes on with the fingerprint login
+            model, login = await async_fingerprint(user_input[CONF_HOST])
+            if model is not None:
+                user_input = {**user_input, CONF_MODEL: model}
             try:
-                return await self._validate_and_create(user_input)
+                result = await self._async_try_create(
+                    user_input, errors, login)
+            finally:
+                if login is not None:
+                    await login.close()
+            if result is not None:
+                return result
 
-            except CannotConnect:
-                errors["base"] = "cannot_connect"
+        return self.async_show_form(
+            step_id="manual", data_schema=DATA_SCHEMA, errors=errors
+        )
 
-            except InvalidAuth:
-                errors["base"] = "invalid_auth"
+    async def async_step_discovery(self, user_input=None):
+        """Offer the cameras found on the LAN that are not set up yet."""
+        errors = {}
+
+        if user_input is not None:
+            camera = self._discovered[user_input[CONF_HOST]]
+            data = {
+                CONF_HOST: camera.host,
+                CONF_MODEL: camera.model,
+                CONF_STREAM: user_input[CONF_STREAM],
+                CONF_RTSP_AUTH: user_input[CONF_RTSP_AUTH],
+            }
+            result = await self._async_try_create(data, errors)
+            if result is not None:
+                return result
+        else:
+            configured = {
+                entry.data[CONF_HOST]
+                for entry in self._async_current_entries(include_ignore=False)
+            }
+            interfaces = [
+                (ipv4["address"], ipv4["network_prefix"])
+                for adapter in await network.async_get_adapters(self.hass)
+                if adapter["enabled"]
+                for ipv4 in adapter["ipv4"]
+            ]
+            cameras = await async_discover(lan_hosts(interfaces))
+            self._discovered = {
+                camera.host: camera
+                for camera in cameras
+                if camera.host not in configured
+            }
+            if not self._discovered:
+                return self.async_abort(reason="no_devices_found")
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_HOST): vol.In(
+                    {
+                        host: f"{camera.product} {camera.mac} ({host})"
+                        for host, camera in self._discovered.items()
+                    }
+                ),
+                vol.Required(CONF_STREAM, default=STREAMS[0]): vol.In(STREAMS),
+                vol.Optional(CONF_RTSP_AUTH, default=True): bool,
+            }
+        )
+        return self.async_show_form(
+            step_id="discovery", data_schema=schema, errors=errors
+        )
 
-            except InvalidResponse:
-                errors["base"] = "invalid_response"
 
-            except AbortFlow:
-                raise
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Aqara Camera options."""
 
-            except Exception:  # pylint: disable=broad-except
-                _LOGGER.exception("Unexpected exception")
-                errors["base"] = "unknown"
+    def __init__(self, config_entry):
+        """Initialize options flow."""
+        self._entry = config_entry
 
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        errors = {}
+        if user_input is not None:
+            try:
+                parse_zones(user_input.get(CONF_MOTION_ZONES, ""))
+            except ValueError:
+                errors[CONF_MOTION_ZONES] = "invalid_zones"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = user_input or self._entry.options
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_WARM_SNAPSHOT,
+                    default=options.get(CONF_WARM_SNAPSHOT, False),
+                ): bool,
+                vol.Optional(
+                    CONF_MQTT_BRIDGE,
+                    default=options.get(CONF_MQTT_BRIDGE, False),
+                ): bool,
+                vol.Optional(
+                    CONF_MOTION,
+                    default=options.get(CONF_MOTION, False),
+                ): bool,
+                vol.Optional(
+                    CONF_MOTION_ZONES,
+                    default=options.get(CONF_MOTION_ZONES, ""),
+                ): str,
+                vol.Optional(
+                    CONF_RECORDER,
+                    default=options.get(CONF_RECORDER, False),
+                ): bool,
+            }
+        )
         return self.async_show_form(
-            step_id="user", data_schema=DATA_SCHEMA, errors=errors
+            step_id="init", data_schema=schema, errors=errors
         )
-
@@ -5,6 +5,8 @@ from homeassistant.helpers import config_validation as cv
 from homeassistant.const import Platform
 
 from .core.const import (
+    MODEL_G3,
+    MODEL_GENERIC,
     STREAM_MAIN,
     STREAM_SUB,
     STREAM_SUB2
@@ -16,14 +18,76 @@ DOMAIN = "aqara_camera"
 CONF_STREAM = "stream"
 CONF_MODEL = "model"
 CONF_RTSP_AUTH ="rtsp_auth"
+CONF_SETUP_CONCURRENCY = "setup_concurrency"
+CONF_WARM_SNAPSHOT = "warm_snapshot"
+CONF_MQTT_BRIDGE = "mqtt_bridge"
+CONF_BINARY_SOURCE = "binary_source"
+CONF_MOTION = "motion_detection"
+CONF_MOTION_ZONES = "motion_zones"
+CONF_RECORDER = "ring_recorder"
+
+# where camera binaries come from: downloaded by the camera itself, or
+# pushed through the shell by the HA host
+BINARY_SOURCE_CAMERA = "camera"
+BINARY_SOURCE_HOST = "host"
+
+DATA_STARTUP = f"{DOMAIN}_startup"
+DATA_DEVICE_CACHE = f"{DOMAIN}_device_cache"
+DATA_BINARY_SOURCE = f"{DOMAIN}_binary_source"
+
+STORAGE_KEY = f"{DOMAIN}.devices"
+STORAGE_VERSION = 1
+
+DEFAULT_SETUP_CONCURRENCY = 4
+
+# seconds between two property dumps shared by the property entities
+COORDINATOR_INTERVAL = 60
+# seconds a property dump may wait behind more urgent commands before it
+# is skipped until the next interval
+COORDINATOR_DEADLINE = 10
+
+# seconds a fetched still image is served again
+SNAPSHOT_CACHE_TTL = 2
+
+# warm snapshot decoder: frames per second, seconds without a request
+# before it stops, seconds to wait for a frame, resized frames kept
+WARM_SNAPSHOT_FPS = 1
+WARM_SNAPSHOT_IDLE = 120
+WARM_SNAPSHOT_FIRST_FRAME = 10
+WARM_SNAPSHOT_RESIZED = 4
+
+# host-side motion detection: size and rate of the analysed frames,
+# pixel change counted as motion, share of a zone that has to change,
+# background adaptation per frame, seconds motion is held after the
+# last change, seconds without a frame before the decoder restarts and
+# seconds before retrying a failed decoder
+MOTION_WIDTH = 160
+MOTION_HEIGHT = 90
+MOTION_FPS = 2
+MOTION_THRESHOLD = 25
+MOTION_AREA = 0.02
+MOTION_ALPHA = 0.05
+MOTION_HOLD = 10
+MOTION_STALL = 15
+MOTION_RETRY = 30
+
+# pre-event recorder: seconds per segment, longest pre-roll and
+# post-roll of an exported clip, seconds before restarting ffmpeg
+RECORDER_SEGMENT = 5
+RECORDER_PRE_ROLL = 60
+RECORDER_POST_ROLL = 60
+RECORDER_RETRY = 30
 
 STREAMS = [STREAM_MAIN, STREAM_SUB, STREAM_SUB2]
 
 OPT_DEVICE_NAME = {
-    'g3': "Aqara Camera Hub G3"
+    MODEL_G3: "Aqara Camera Hub G3",
+    MODEL_GENERIC: "Other Aqara camera"
 }
 
-PLATFORMS = [Platform.CAMERA]
+PLATFORMS = [
+    Platform.BINARY_SENSOR, Platform.CAMERA, Platform.SENSOR, Platform.SWITCH
+]
 
 # Services data
 DIR_UP = "up"
@@ -56,3 +120,43 @@ SCHEMA_SERVICE_PTZ = {
         vol.Optional(ATTR_SPAN_Y): cv.positive_int
 }
 
+ATTR_PRESET = "preset"
+ATTR_PRESETS = "presets"
+ATTR_DWELL = "dwell"
+ATTR_CYCLES = "cycles"
+
+SERVICE_PTZ_SAVE_PRESET = "ptz_save_preset"
+SERVICE_PTZ_GOTO_PRESET = "ptz_goto_preset"
+SERVICE_PTZ_REMOVE_PRESET = "ptz_remove_preset"
+SCHEMA_SERVICE_PTZ_PRESET = {
+        vol.Required(ATTR_PRESET): cv.string
+}
+
+SERVICE_PTZ_PATROL = "ptz_patrol"
+SCHEMA_SERVICE_PTZ_PATROL = {
+        vol.Required(ATTR_PRESETS): vol.All(
+            cv.ensure_list, [cv.string], vol.Length(min=1)
+        ),
+        vol.Optional(ATTR_DWELL, default=10): vol.All(
+            vol.Coerce(float), vol.Range(min=0, min_included=False)
+        ),
+        vol.Optional(ATTR_CYCLES, default=0): cv.positive_int
+}
+
+SERVICE_PTZ_STOP_PATROL = "ptz_stop_patrol"
+
+ATTR_FILENAME = "filename"
+ATTR_BEFORE = "before"
+ATTR_AFTER = "after"
+
+SERVICE_EXPORT_CLIP = "export_clip"
+SCHEMA_SERVICE_EXPORT_CLIP = {
+        vol.Required(ATTR_FILENAME): cv.string,
+        vol.Optional(ATTR_BEFORE, default=10): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=RECORDER_PRE_ROLL)
+        ),
+        vol.Optional(ATTR_AFTER, default=10): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=RECORDER_POST_ROLL)
+        )
+}
+
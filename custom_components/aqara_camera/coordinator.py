@@ -0,0 +1,68 @@
+"""Property coordinator for Aqara Camera."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .const import COORDINATOR_DEADLINE, COORDINATOR_INTERVAL, DOMAIN
+from .core.aqara_camera import AqaraCamera
+from .core.const import PRIORITY_BACKGROUND
+from .core.scheduler import CommandExpired, command_priority
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AqaraCameraCoordinator(DataUpdateCoordinator[dict[str, str]]):
+    """Share one property dump per interval between the camera entities.
+
+    Every property entity reads from the same dump, so adding entities
+    adds no telnet traffic. Values pushed by the camera are passed on
+    right away, and listeners are only called when a property changed.
+    Dumps run behind PTZ and stream commands on the shared shell.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, camera: AqaraCamera
+    ) -> None:
+        """Initialize the coordinator with the properties already read."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {entry.title}",
+            update_interval=timedelta(seconds=COORDINATOR_INTERVAL),
+            always_update=False,
+        )
+        self.camera = camera
+        self.data = dict(camera.all_properties)
+
+    async def _async_update_data(self) -> dict[str, str]:
+        """Read all properties in one round-trip."""
+        if not self.camera.connected:
+            raise UpdateFailed("Camera is not connected")
+        try:
+            # a cut short dump keeps the values it did not get to
+            with command_priority(
+                PRIORITY_BACKGROUND, COORDINATOR_DEADLINE, interruptible=True
+            ):
+                await self.camera.async_update_properties(force=True)
+        except CommandExpired:
+            # the shell stayed busy, the values are not known to be wrong
+            return self.data
+        except (OSError, EOFError, asyncio.TimeoutError) as err:
+            raise UpdateFailed(f"Can't read properties: {err}") from err
+        return dict(self.camera.all_properties)
+
+    @callback
+    def async_push_update(self, changes: dict) -> None:
+        """Pass on properties pushed by the camera."""
+        data = dict(self.camera.all_properties)
+        if data != self.data:
+            self.async_set_updated_data(data)
@@ -1,15 +1,26 @@
 """Class for Aqara Camera component."""
-import socket
-import time
+import asyncio
+import functools
 import json
-import re
+import time
 import logging
 
 from homeassistant.const import (
     CONF_NAME
 )
 
-from .shell import TelnetShell, TelnetShellG3
+from .parser import PropertyParser
+from .mqtt import MqttBridge, MQTT_SETPROP_ALLOWED
+from .provision import MI_MOTOR, Provisioner
+from .ptz import PtzWorker
+from .push import PushChannel
+from .scheduler import command_priority
+from .shell import (
+    FRAMING_SENTINEL,
+    ShellMetrics,
+    shell_class
+)
+from .watcher import RtspWatcher
 
 from .const import (
     STREAM_SUB,
@@ -20,25 +31,54 @@ from .const import (
     SPAN_Y,
     CONF_MODEL,
     CONF_RTSP_AUTH,
-    DIR_UP,
-    DIR_DOWN,
-    DIR_LEFT,
-    DIR_RIGHT,
     ERROR_AQARA_CAMERA_UNAVAILABLE,
     ERROR_AQARA_CAMERA_AUTH,
     AQARA_CAMERA_SUCCESS,
     PERSIST_REC_MODE,
     SYS_PTZ_MOVING,
-    MD5_MI_MOTOR_ARMV7L
+    SYS_RTSP_URL,
+    POST_INIT_SH,
+    APP_MONITOR_SH,
+    PROPERTY_CACHE_TTL,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_STREAM
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _timed(operation):
+    """ record how long an AqaraCamera coroutine takes """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            started = time.monotonic()
+            try:
+                return await func(self, *args, **kwargs)
+            finally:
+                self.metrics.record_operation(
+                    operation, time.monotonic() - started)
+        return wrapper
+    return decorator
+
+
+def _priority(priority):
+    """ run the shell commands of an AqaraCamera coroutine at priority """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with command_priority(priority):
+                return await func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class AqaraCamera():
     """ Aqara Camera main class """
 
-    def __init__(self, hass, host, model, stream, verbose=False):
+    def __init__(self, hass, host, model, stream, verbose=False,
+                 cache_ttl=PROPERTY_CACHE_TTL, framing=FRAMING_SENTINEL):
         """ init """
         self._shell = None
         self._host = host
@@ -48,9 +88,22 @@ class AqaraCamera():
         self._mi_motor = False
         self._rtsp_auth = True  # for fast access
         self._properties: dict = {}
-
+        self._properties_time = None
+        self._cache_ttl = cache_ttl
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._framing = framing
+        self._mi_motor_md5 = None
+        self._post_init = False
+
+        self.metrics = ShellMetrics()
         self.hass = hass
         self.rtsp_url = ""
+        self.rtsp_urls: dict = {}
+        self.ptz = PtzWorker(self)
+        self.watcher = RtspWatcher(self)
+        self.push = PushChannel(self)
+        self.mqtt = None
 
     @property
     def brand(self):
@@ -78,111 +131,316 @@ class AqaraCamera():
                         "sys.camera_", "")] = value
         return properties
 
+    @property
+    def all_properties(self):
+        """ return every property of the last snapshot """
+        return self._properties
+
     @property
     def camera_rtsp_url(self):
         """ return rtsp url """
         return self.rtsp_url
 
+    def rtsp_url_for(self, width=None, height=None):
+        """ return the url of the smallest profile covering width x height
+
+        Profiles are named after their height ("360p", "1296p") and are
+        16:9. Without a size, or when no profile is big enough, the
+        configured stream and the biggest profile are used.
+        """
+        if not width and not height:
+            return self.rtsp_url
+        needed = max(height or 0, (width or 0) * 9 / 16)
+        profiles = sorted(
+            (int(name[:-1]), url) for name, url in self.rtsp_urls.items()
+            if name[:-1].isdigit() and url
+        )
+        for profile_height, url in profiles:
+            if profile_height >= needed:
+                return url
+        return profiles[-1][1] if profiles else self.rtsp_url
+
+    @property
+    def connected(self):
+        """ return True while the shell is logged in """
+        return self._shell is not None and self._shell.connected
+
+    @property
+    def has_properties(self):
+        """ return True once a property snapshot was loaded """
+        return len(self._properties) >= 1
+
+    def snapshot(self) -> dict:
+        """ return the device state worth keeping across restarts """
+        return {
+            "fw_version": self._properties.get("ro.sys.fw_ver"),
+            "properties": dict(self._properties),
+            "rtsp_url": self.rtsp_url,
+            "rtsp_urls": dict(self.rtsp_urls),
+            "mi_motor": self._mi_motor,
+            "mi_motor_md5": self._mi_motor_md5,
+            "post_init": self._post_init,
+        }
+
+    def restore(self, snapshot: dict):
+        """ load a snapshot taken by snapshot() """
+        self._properties = dict(snapshot.get("properties", {}))
+        self._properties_time = time.monotonic()
+        self.rtsp_url = snapshot.get("rtsp_url", "")
+        self.rtsp_urls = dict(snapshot.get("rtsp_urls", {}))
+        self._mi_motor = snapshot.get("mi_motor", False)
+        self._mi_motor_md5 = snapshot.get("mi_motor_md5")
+        self._post_init = snapshot.get("post_init", False)
+
     @property
-    def is_recording(self):
+    def cache_stats(self):
+        """ return property cache hit/miss counters """
+        return {"hits": self._cache_hits, "misses": self._cache_misses}
+
+    @property
+    def shell_stats(self):
+        """ return per command latency statistics """
+        return {
+            name: stats.as_dict()
+            for name, stats in self.metrics.commands.items()
+        }
+
+    @_priority(PRIORITY_STREAM)
+    async def async_is_recording(self):
         """ return is_recording """
-        raw = self._shell.get_prop(PERSIST_REC_MODE)
+        raw = await self.async_get_prop(PERSIST_REC_MODE)
         if raw != "0":
             return True
         return False
 
     def debug(self, message: str):
         """ deubug function """
-        if self._debug:
+        if self._debug or _LOGGER.isEnabledFor(logging.DEBUG):
             _LOGGER.debug(f"{self._host}: {message}")
 
-    def connect(self):
-        """ login """
+    def create_shell(self):
+        """ return a new, not yet connected shell of the camera dialect """
+        return shell_class(self._device_name)(
+            self._host, framing=self._framing, metrics=self.metrics)
+
+    @_timed("connect")
+    async def async_connect(self, login=None):
+        """ login
+
+        login is a shell discovery left logged in, its connection is
+        taken over instead of logging in again.
+        """
+        await self.async_close()
+        shell = self.create_shell()
         try:
-            if any(name in self._device_name for name in ['g3']):
-                shell = TelnetShellG3(self._host)
+            started = time.monotonic()
+            if login is not None:
+                shell.take_over(login)
+                logged_in = await shell.start_session()
             else:
-                shell = TelnetShell(self._host)
-
-            if shell.login():
+                await shell.connect()
+                started = time.monotonic()
+                logged_in = await shell.login()
+            if logged_in:
                 self._shell = shell
+            self.metrics.record("login", time.monotonic() - started)
 
-            if self._shell.file_exist("/data/bin/mi_motor"):
+            if await self._shell.file_exist("/data/bin/mi_motor"):
                 self._mi_motor = True
 
-        except (ConnectionRefusedError, socket.timeout) as err:
+        except (ConnectionRefusedError, asyncio.TimeoutError) as err:
             self.debug(f"Can't prepare camera: {err}")
+            await shell.close()
             return False
 
         except Exception as err:
             self.debug(f"Can't prepare camera: {err}")
+            await shell.close()
             return False
         return (self._shell != None)
 
-    def run_command(self, command: str):
+    async def async_close(self):
+        """ logout """
+        if self._shell is not None:
+            await self._shell.close()
+            self._shell = None
+
+    async def async_shutdown(self):
+        """ stop background workers and logout """
+        self.watcher.stop()
+        await self.async_stop_mqtt()
+        self.push.stop()
+        await self.ptz.async_stop()
+        await self.async_close()
+
+    async def async_start_mqtt(self):
+        """ move state and PTZ to the on-device broker if possible
+
+        Without the mosquitto tools on the camera everything stays on
+        telnet.
+        """
+        bridge = MqttBridge(self)
+        if (not await bridge.async_install(self._shell) or
+                not await bridge.async_connect(self._host)):
+            return False
+        self.mqtt = bridge
+        return True
+
+    async def async_install_mqtt(self):
+        """ restart the bridge scripts, e.g. after a camera reboot """
+        if self.mqtt is None or not self.connected:
+            return
+        try:
+            await self.mqtt.async_install(self._shell)
+        except Exception as err:  # pylint: disable=broad-except
+            self.debug(f"Can't restart mqtt scripts: {err}")
+
+    async def async_stop_mqtt(self):
+        """ back to telnet only """
+        bridge, self.mqtt = self.mqtt, None
+        if bridge is not None:
+            await bridge.async_stop()
+
+    @_priority(PRIORITY_BACKGROUND)
+    async def async_keepalive(self):
+        """ check the shell still answers """
+        if self._shell is None or not self._shell.connected:
+            return False
+        ret = await self._shell.run_command("echo keepalive")
+        return "keepalive" in ret
+
+    async def async_run_command(self, command: str):
         """ run command """
         fix = self._shell.suffix
-        ret = self._shell.run_command(command)
+        ret = await self._shell.run_command(command)
         if ret.endswith(fix):
             ret = "".join(ret.rsplit(fix, 1))
         if ret.startswith(fix):
             ret = ret.replace(fix, "", 1)
         return ret
 
-    def get_product_info(self):
+    @_timed("product_info")
+    @_priority(PRIORITY_STREAM)
+    async def async_get_product_info(self):
         """ get product info """
         try:
-            raw = self._shell.get_prop("sys.camera_rtsp_url")
+            raw = await self.async_get_prop(SYS_RTSP_URL)
             if len(raw) <= 6:
-                self._prepare_rtsp(self._rtsp_auth)
-                raw = self._shell.get_prop("sys.camera_rtsp_url")
-            camera_rtsp_url = json.loads(raw.replace(r"\/ # ", "").replace("~ #", ""))
+                await self._async_prepare_rtsp(self._rtsp_auth)
+                self.invalidate_prop(SYS_RTSP_URL)
+                raw = await self.async_get_prop(SYS_RTSP_URL)
+            camera_rtsp_url = json.loads(raw.replace("~ #", ""))
         except Exception as err:
             return ERROR_AQARA_CAMERA_UNAVAILABLE, err
 
-        if len(camera_rtsp_url) >= 1:
-            if self._stream == STREAM_SUB2:
-                self.rtsp_url = camera_rtsp_url["360p"]
-            elif self._stream == STREAM_SUB:
-                self.rtsp_url = camera_rtsp_url["720p"]
-            else:
-                self.rtsp_url = camera_rtsp_url.get("1080p")
-                if not self.rtsp_url:
-                    self.rtsp_url = camera_rtsp_url.get("1296p")
-                    if not self.rtsp_url:
-                        self.rtsp_url = camera_rtsp_url.get("1520p")
-                        if not self.rtsp_url:
-                            return ERROR_AQARA_CAMERA_UNAVAILABLE, ""
-
+        if len(camera_rtsp_url) >= 1 and self.set_rtsp_urls(camera_rtsp_url):
             return AQARA_CAMERA_SUCCESS, ""
         return ERROR_AQARA_CAMERA_UNAVAILABLE, ""
 
-    def _get_all_properties(self):
+    def set_rtsp_urls(self, camera_rtsp_url: dict):
+        """ store the rtsp urls and pick the configured stream
+
+        Returns False when the map has no url for the stream.
+        """
+        self.rtsp_urls = camera_rtsp_url
+        if self._stream == STREAM_SUB2:
+            rtsp_url = camera_rtsp_url.get("360p")
+        elif self._stream == STREAM_SUB:
+            rtsp_url = camera_rtsp_url.get("720p")
+        else:
+            rtsp_url = camera_rtsp_url.get("1080p")
+            if not rtsp_url:
+                rtsp_url = camera_rtsp_url.get("1296p")
+                if not rtsp_url:
+                    rtsp_url = camera_rtsp_url.get("1520p")
+        if not rtsp_url:
+            return False
+        self.rtsp_url = rtsp_url
+        return True
+
+    @_timed("stream_status")
+    @_priority(PRIORITY_STREAM)
+    async def async_get_stream_status(self):
+        """ read rtsp urls, uptime and recording mode in one round-trip
+
+        Returns (urls, uptime, recording), urls is None while the rtsp
+        server has not published them.
+        """
+        url, uptime, rec_mode = await self._shell.run_batch([
+            self._shell.prop_command(SYS_RTSP_URL),
+            "cat /proc/uptime",
+            self._shell.prop_command(PERSIST_REC_MODE),
+        ])
+        try:
+            urls = json.loads(url.output.strip())
+        except ValueError:
+            urls = None
+        if urls:
+            self._properties[SYS_RTSP_URL] = url.output.strip()
+        self._properties[PERSIST_REC_MODE] = rec_mode.output.strip()
+        return (urls, float(uptime.output.split()[0]),
+                rec_mode.output.strip() != "0")
+
+    async def _async_get_all_properties(self):
         """get device all properties"""
-        raw = self._shell.get_prop("")
+        parser = PropertyParser()
+        if await self._shell.get_all_props(parser.feed):
+            self._properties = parser.close()
+        else:
+            # cut short, keep the values it did not get to
+            self._properties.update(parser.close())
+        self._properties_time = time.monotonic()
+
+    @_timed("update_properties")
+    async def async_update_properties(self, force=False):
+        """ refresh the property snapshot once per ttl window """
+        if (not force and self._properties_time is not None and
+                time.monotonic() - self._properties_time < self._cache_ttl):
+            self._cache_hits += 1
+            return
+        self._cache_misses += 1
+        await self._async_get_all_properties()
+
+    async def async_get_prop(self, property_value: str):
+        """ get property from the snapshot, fetching it if needed """
+        await self.async_update_properties()
+        value = self._properties.get(property_value)
+        if value is None:
+            # not in the dump (e.g. truncated), read it on its own
+            value = await self._shell.get_prop(property_value)
+            if value:
+                self._properties[property_value] = value
+        return value
+
+    async def async_set_prop(self, property_value: str, value: str):
+        """ set property and invalidate its cached value """
+        if (property_value not in MQTT_SETPROP_ALLOWED or
+                self.mqtt is None or
+                not self.mqtt.publish("set", property_value, value)):
+            await self._shell.set_prop(property_value, value)
+        self.invalidate_prop(property_value)
+
+    def invalidate_prop(self, property_value=None):
+        """ drop one cached property, or the whole snapshot """
+        if property_value is None:
+            self._properties_time = None
+        else:
+            self._properties.pop(property_value, None)
 
-        pattern = r'(\[[^[]+\])'
-        matches = re.findall(pattern, raw)
-        self._properties = {}
-        it_matches = iter(matches)
-        while True:
-            try:
-                x = next(it_matches)
-                y = next(it_matches)
-                if not y.strip("[").rstrip("]").endswith("..."):
-                    self._properties[x.strip("[").rstrip("]")] = y.strip("[").rstrip("]")
-            except StopIteration:
-                break
-
-    def get_device_info(self):
+    def update_props(self, changes: dict):
+        """ merge pushed property values into the snapshot """
+        self._properties.update(changes)
+
+    @_timed("device_info")
+    async def async_get_device_info(self):
         """ get device info """
         result = {}
-        self._get_all_properties()
+        await self.async_update_properties(force=True)
 
         model = self._properties.get("persist.sys.model", None)
         if model is None:
             # Try again
-            self._get_all_properties()
+            await self.async_update_properties(force=True)
 
         mac = self._properties.get("persist.sys.miio_mac", None)
         name = self._properties.get("ro.sys.name", None)
@@ -193,108 +451,129 @@ class AqaraCamera():
 
         return result
 
-    def _prepare_rtsp(self, rtsp_auth):
-        processes = self._shell.get_running_ps()
+    def _rtsp_commands(self, rtsp_auth, processes, monitor_exists):
+        """ commands switching the rtsp server to the wanted auth mode """
+        commands = []
         if not rtsp_auth:
-            if not self._shell.file_exist("/tmp/app_monitor.sh"):
-                command = 'sed "s/rtsp -a /rtsp /g" /bin/app_monitor.sh > /tmp/app_monitor.sh'
-                self._shell.run_command(command)
-                command = "chmod a+x /tmp/app_monitor.sh"
-                self._shell.run_command(command)
-                command = "pkill app_monitor.sh; /tmp/app_monitor.sh &"
-                self._shell.run_command(command)
+            if not monitor_exists:
+                commands.append(
+                    'sed "s/rtsp -a /rtsp /g" /bin/app_monitor.sh > {}'.format(
+                        APP_MONITOR_SH))
+                commands.append("chmod a+x {}".format(APP_MONITOR_SH))
+                commands.append(
+                    "pkill app_monitor.sh; {} &".format(APP_MONITOR_SH))
             if "rtsp -a" in processes:
-                command = "pkill rtsp"
-                self._shell.run_command(command)
+                commands.append("pkill rtsp")
         else:
             if "rtsp -a" not in processes:
-                command = "pkill rtsp"
-                self._shell.run_command(command)
-
-    def prepare(self, config: dict):
-        """ prepare camera """
-        self._shell.check_bin('mi_motor', MD5_MI_MOTOR_ARMV7L , 'bin/armv7l/mi_motor')
-
-        POST_INIT_SH = "/data/scripts/post_init.sh"
-        if not self._shell.file_exist(POST_INIT_SH):
-            command = "mkdir -p /data/scripts"
-            self._shell.write(command.encode() + b"\n")
-            time.sleep(1)
-            command = "echo -e '#!/bin/sh\r\n\r\n " \
-                "[ -x /data/bin/mosquitto ] && /data/bin/mosquitto -d" \
-                "fw_manager.sh -r\r\n" \
-                "asetprop sys.camera_ptz_moving true\r\n" \
-                "fw_manager.sh -t -k' > {}".format(POST_INIT_SH)
-            self._shell.run_command(command)
-            command = "chmod a+x {}".format(POST_INIT_SH)
-            self._shell.run_command(command)
-            command = "chattr +i {}".format(POST_INIT_SH)
-            self._shell.run_command(command)
+                commands.append("pkill rtsp")
+        return commands
+
+    async def _async_prepare_rtsp(self, rtsp_auth):
+        processes, monitor = await self._shell.run_batch([
+            "ps", "ls -al {}".format(APP_MONITOR_SH)
+        ])
+        commands = self._rtsp_commands(
+            rtsp_auth, processes.output, monitor.status <= 0)
+        await self._shell.run_batch(commands)
+
+    def _post_init_command(self):
+        """ return the command installing post_init.sh unless it exists """
+        return "[ -e {0} ] || (mkdir -p /data/scripts && " \
+            "echo -e '#!/bin/sh\r\n\r\n " \
+            "[ -x /data/bin/mosquitto ] && /data/bin/mosquitto -d\r\n" \
+            "fw_manager.sh -r\r\n" \
+            "asetprop sys.camera_ptz_moving true\r\n" \
+            "fw_manager.sh -t -k' > {0} && " \
+            "chmod a+x {0} && chattr +i {0})".format(POST_INIT_SH)
+
+    @_timed("provision")
+    @_priority(PRIORITY_BACKGROUND)
+    async def async_provision(self, verified=False, fetch=None,
+                              binaries=(MI_MOTOR,)):
+        """ install the binaries and post_init.sh if needed
+
+        With verified, a mi_motor already checked against its md5 on this
+        firmware only has to exist. With fetch, binaries are pushed from
+        the HA host instead of downloaded by the camera.
+        """
+        trusted = ()
+        if verified and self._mi_motor_md5 == MI_MOTOR.md5:
+            trusted = (MI_MOTOR.name,)
+        provisioner = Provisioner(self._shell, fetch)
+        result = await provisioner.async_ensure(binaries, trusted)
+        if result.get(MI_MOTOR.name):
+            self._mi_motor = True
+            self._mi_motor_md5 = MI_MOTOR.md5
+        installed, = await self._shell.run_batch([self._post_init_command()])
+        # only remembered in the snapshot once the camera confirmed it, a
+        # lost answer (-1) tells nothing either way
+        if installed.status >= 0:
+            self._post_init = installed.status == 0
+        return result
 
-        self._rtsp_auth = config.get(CONF_RTSP_AUTH, True)
-        self._prepare_rtsp(self._rtsp_auth)
-        raw = self._shell.get_prop("sys.camera_rtsp_url")
-        if len(raw) <= 6:
-            self._prepare_rtsp(self._rtsp_auth)
+    @_timed("prepare")
+    async def async_prepare(self, config: dict, provision=True):
+        """ prepare camera
+
+        Without provision only the rtsp server is set up, the binary check
+        and post_init.sh install are left to async_provision.
+        """
+        if provision:
+            await self.async_provision()
+        processes, monitor = await self._shell.run_batch([
+            "ps", "ls -al {}".format(APP_MONITOR_SH)
+        ])
 
-    def ptz_control(self, direction, span_x, span_y):
-        """ ptz control """
+        self._rtsp_auth = config.get(CONF_RTSP_AUTH, True)
+        commands = self._rtsp_commands(
+            self._rtsp_auth, processes.output, monitor.status <= 0)
+        commands.append(self._shell.prop_command(SYS_RTSP_URL))
+        results = await self._shell.run_batch(commands)
+        if len(results[-1].output) <= 6:
+            await self._async_prepare_rtsp(self._rtsp_auth)
+        self.invalidate_prop(SYS_RTSP_URL)
+
+    @_timed("motor_position")
+    @_priority(PRIORITY_INTERACTIVE)
+    async def async_get_motor_position(self):
+        """ read the motor position """
+        ret = await self.async_run_command("/data/bin/mi_motor -g")
+        motor_info = json.loads(ret)
+        return {
+            key: motor_info[key] for key in (ANGLE_X, ANGLE_Y, SPAN_X, SPAN_Y)
+        }
+
+    @_timed("move_motor")
+    @_priority(PRIORITY_INTERACTIVE)
+    async def async_move_motor(self, angle_x, angle_y, span_x, span_y):
+        """ move the motor, flagging it as moving, in one round-trip """
+        if self.mqtt is not None and self.mqtt.publish(
+                "move", angle_x, angle_y, span_x, span_y):
+            self.invalidate_prop(SYS_PTZ_MOVING)
+            return True
+        results = await self._shell.run_batch([
+            self._shell.setprop_command(SYS_PTZ_MOVING, "true"),
+            "/data/bin/mi_motor -x {} -y {} -a {} -b {}".format(
+                angle_x, angle_y, span_x, span_y),
+            self._shell.setprop_command(SYS_PTZ_MOVING, "false"),
+        ])
+        self.invalidate_prop(SYS_PTZ_MOVING)
+        return results[1].status == 0
+
+    async def async_ptz_control(self, direction, span_x, span_y):
+        """ ptz control, returns True if the motor moved """
         if not self._mi_motor:
             _LOGGER.error("mi_motor is not exist!")
-            return
-        try:
-            command = "/data/bin/mi_motor -g\n"
-            ret = self.run_command(command)
-            motor_info = json.loads(ret)
-
-            current_angle_x = motor_info[ANGLE_X]
-            current_angle_y = motor_info[ANGLE_Y]
-            if direction.lower() == DIR_UP:
-                current_angle_y += 3
-            if direction.lower() == DIR_DOWN:
-                current_angle_y -= 3
-            if direction.lower() == DIR_LEFT:
-                current_angle_x += 3
-            if direction.lower() == DIR_RIGHT:
-                current_angle_x -= 3
-            self._shell.set_prop(SYS_PTZ_MOVING, "true")
-            command = "/data/bin/mi_motor -x {} -y {} -a {} -b {}\n".format(
-                current_angle_x, current_angle_y, span_x, span_y
-            )
-            ret = self.run_command(command)
-        except Exception as err:
-            self.debug(f"ptz_control got error: {err}")
-        self._shell.set_prop(SYS_PTZ_MOVING, "false")
+            return False
+        return await self.ptz.async_step(direction, span_x, span_y)
 
-    def ptz_control_preset(self, angle_x, angle_y, span_x, span_y):
-        """ ptz control preset """
+    async def async_ptz_control_preset(self, angle_x, angle_y, span_x, span_y):
+        """ ptz control preset, returns True if the motor moved """
         if not self._mi_motor:
             _LOGGER.error("mi_motor is not exist!")
-            return
-        try:
-            if (angle_x is None and angle_y is None and
-                    span_x is None and span_y is None):
-                return
-            command = "/data/bin/mi_motor -g\n"
-            ret = self.run_command(command)
-            motor_info = json.loads(ret)
-            current_angle_x = motor_info[ANGLE_X]
-            current_angle_y = motor_info[ANGLE_Y]
-            current_span_x = motor_info[SPAN_X]
-            current_span_y = motor_info[SPAN_Y]
-            if angle_x is None:
-                angle_x = current_angle_x
-            if angle_y is None:
-                angle_y = current_angle_y
-            if span_x is None:
-                span_x = current_span_x
-            if span_y is None:
-                span_y = current_span_y
-            self._shell.set_prop(SYS_PTZ_MOVING, "true")
-            command = "/data/bin/mi_motor -x {} -y {} -a {} -b {}\n".format(
-                angle_x, angle_y, span_x, span_y
-            )
-            ret = self.run_command(command)
-        except Exception as err:
-            self.debug(f"ptz_control_preset got error: {err}")
-        self._shell.set_prop(SYS_PTZ_MOVING, "false")
+            return False
+        if (angle_x is None and angle_y is None and
+                span_x is None and span_y is None):
+            return True
+        return await self.ptz.async_move(angle_x, angle_y, span_x, span_y)
@@ -7,6 +7,11 @@ STREAM_SUB2 = "Sub (360p)"
 CONF_MODEL = "model"
 CONF_RTSP_AUTH ="rtsp_auth"
 
+# models by shell dialect: the G3 logs in as root to "~ # ", the others
+# as admin to "# "
+MODEL_G3 = "g3"
+MODEL_GENERIC = "generic"
+
 ERROR_AQARA_CAMERA_UNAVAILABLE = "unavailable"
 ERROR_AQARA_CAMERA_AUTH = "error_auth"
 AQARA_CAMERA_SUCCESS = "success"
@@ -21,8 +26,62 @@ ANGLE_Y = "angle_y"
 SPAN_X = "span_x"
 SPAN_Y = "span_y"
 
+ANGLE_X_RANGE = (-170, 170)
+ANGLE_Y_RANGE = (-15, 50)
+# degrees moved by one directional step
+PTZ_STEP = 3
+# seconds the last commanded motor position is trusted
+PTZ_POSITION_TTL = 300
+
 SYS_PTZ_MOVING = "sys.camera_ptz_moving"
+SYS_RTSP_URL = "sys.camera_rtsp_url"
 PERSIST_REC_MODE = "persist.app.camera_rec_mode"
 
+POST_INIT_SH = "/data/scripts/post_init.sh"
+APP_MONITOR_SH = "/tmp/app_monitor.sh"
+
+DATA_SESSIONS = "aqara_camera_sessions"
+
+# seconds between shell health checks
+KEEPALIVE_INTERVAL = 60
+# reconnect delays grow from min to max seconds
+RECONNECT_BACKOFF_MIN = 1
+RECONNECT_BACKOFF_MAX = 60
+# seconds an unused session stays open for the next user
+SESSION_LINGER = 60
+
+# seconds between rtsp url checks
+RTSP_WATCH_INTERVAL = 30
+
+# seconds between property checks of the on-device push loop
+PUSH_INTERVAL = 1
+# a push loop up for this many seconds resets the reconnect backoff
+PUSH_STABLE_TIME = 30
+
+# on-device mosquitto broker
+MQTT_PORT = 1883
+MQTT_TOPIC = "aqara_camera"
+
+# seconds a bulk getprop snapshot is served before it is refreshed
+PROPERTY_CACHE_TTL = 30
+
+# attempts to install a missing or corrupt binary
+PROVISION_RETRIES = 3
+
+# LAN discovery: hosts probed at once, seconds to connect and for each
+# answer, and the largest subnet scanned around an address
+DISCOVERY_CONCURRENCY = 64
+DISCOVERY_TIMEOUT = 1
+DISCOVERY_PREFIX = 24
+
+# shell command priorities, lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_STREAM = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = ("interactive", "stream", "background")
+# seconds of silence after which a command gives the shell up to a more
+# urgent one waiting for it
+SCHEDULER_YIELD = 1
+
 MD5_MOSQUITTO_ARMV7L = '0422c48517dc464a2e986a1038dc448a'
 MD5_MI_MOTOR_ARMV7L = "191a742a619ecaf1120378ce3729c77d"
@@ -0,0 +1,158 @@
+""" Aqara Camera LAN discovery """
+
+import asyncio
+import ipaddress
+from typing import NamedTuple
+
+from .const import (
+    DISCOVERY_CONCURRENCY,
+    DISCOVERY_PREFIX,
+    DISCOVERY_TIMEOUT,
+    MODEL_G3,
+    MODEL_GENERIC
+)
+from .shell import (
+    AsyncTelnetShell,
+    FRAMING_SENTINEL,
+    PROMPTS,
+    TELNET_PORT,
+    shell_class
+)
+
+PRODUCT = "ro.sys.product"
+MAC = "persist.sys.miio_mac"
+
+# login names tried in turn, no password is ever sent
+LOGINS = (b"root", b"admin")
+# model of the dialect each shell prompt belongs to
+PROMPT_MODELS = {"~ # ": MODEL_G3, "/ # ": MODEL_G3, "# ": MODEL_GENERIC}
+# what a telnetd prints when it waits for input, every one ends in a space
+REPLIES = tuple(prompt.encode() for prompt in PROMPTS) + \
+    (b"login: ", b"Password: ")
+# bytes of banner read before a host is given up on
+REPLY_LIMIT = 4096
+
+
+class DiscoveredCamera(NamedTuple):
+    """ a camera answering on the telnet port """
+    host: str
+    model: str
+    product: str
+    mac: str
+
+
+def lan_hosts(interfaces) -> list:
+    """ return the other hosts of the subnets of (address, prefix) pairs
+
+    Subnets larger than DISCOVERY_PREFIX are cut to the one around the
+    address, so a /16 does not turn into 65534 probes.
+    """
+    hosts = set()
+    for address, prefix in interfaces:
+        interface = ipaddress.ip_interface(
+            "{}/{}".format(address, max(prefix, DISCOVERY_PREFIX)))
+        if interface.version != 4 or interface.ip.is_loopback:
+            continue
+        hosts.update(str(host) for host in interface.network.hosts()
+                     if host != interface.ip)
+    return sorted(hosts, key=ipaddress.ip_address)
+
+
+async def _async_read_reply(shell, timeout) -> bytes:
+    """ read until the telnetd waits for input, or it stays silent """
+    reply = b""
+    while not reply.endswith(REPLIES) and len(reply) < REPLY_LIMIT:
+        data = await shell.read_until(b" ", timeout)
+        if not data.endswith(b" "):
+            break
+        reply += data
+    return reply
+
+
+async def _async_login(shell, timeout):
+    """ log in on a connected shell and return the model, or None """
+    banner = await _async_read_reply(shell, timeout)
+    if not banner.endswith(b"login: "):
+        # some telnetds only print the banner after a keypress
+        shell.write(b"\n")
+        banner = await _async_read_reply(shell, timeout)
+    if not banner.endswith(b"login: "):
+        return None
+    for name in LOGINS:
+        shell.write(name + b"\n")
+        reply = await _async_read_reply(shell, timeout)
+        for prompt in PROMPTS:
+            if reply.endswith(prompt.encode()):
+                return PROMPT_MODELS[prompt]
+        if not reply.endswith(b"login: "):
+            return None
+    return None
+
+
+async def async_fingerprint(host, port=TELNET_PORT,
+                            timeout=DISCOVERY_TIMEOUT):
+    """ return the model whose shell dialect host speaks and the shell
+
+    The banner has to end in a login prompt. root is tried first, the
+    G3 answers it with "~ # ", then admin for the "# " shell of the
+    other models. Hosts asking for a password are left alone.
+
+    The shell is left logged in at the prompt for a shell of the model
+    to take over, the caller has to close it. (None, None) when host is
+    no camera.
+    """
+    shell = AsyncTelnetShell(host, port=port)
+    model = None
+    try:
+        await shell.connect(timeout)
+        model = await _async_login(shell, timeout)
+    except (OSError, EOFError, asyncio.TimeoutError):
+        pass
+    if model is None:
+        await shell.close()
+        return None, None
+    return model, shell
+
+
+async def async_probe(host, port=TELNET_PORT, timeout=DISCOVERY_TIMEOUT):
+    """ return the camera on host, or None
+
+    The shell of the fingerprinted dialect takes the connection over
+    and must be able to read the product and mac, so a camera is
+    logged in to once.
+    """
+    model, login = await async_fingerprint(host, port, timeout)
+    if model is None:
+        return None
+    shell = shell_class(model)(host, port=port, framing=FRAMING_SENTINEL)
+    shell.take_over(login)
+    try:
+        await shell.start_session()
+        product, mac = await shell.run_batch(
+            [shell.prop_command(PRODUCT), shell.prop_command(MAC)])
+    except (OSError, EOFError, asyncio.TimeoutError):
+        return None
+    finally:
+        await shell.close()
+    if product.status != 0 or not product.output.strip():
+        return None
+    return DiscoveredCamera(
+        host, model, product.output.strip(), mac.output.strip())
+
+
+async def async_discover(hosts, port=TELNET_PORT,
+                         concurrency=DISCOVERY_CONCURRENCY,
+                         timeout=DISCOVERY_TIMEOUT) -> list:
+    """ probe hosts concurrently and return the cameras found
+
+    At most concurrency probes run at once, each gives up after timeout
+    seconds without an answer, so a /24 takes a few seconds.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(host):
+        async with semaphore:
+            return await async_probe(host, port, timeout)
+
+    results = await asyncio.gather(*(probe(host) for host in hosts))
+    return [camera for camera in results if camera is not None]
@@ -13,3 +13,6 @@ class InvalidAuth(exceptions.HomeAssistantError):
 class InvalidResponse(exceptions.HomeAssistantError):
     """Error to indicate there is invalid response."""
 
+
+class UnknownPreset(exceptions.HomeAssistantError):
+    """Error to indicate a PTZ preset does not exist."""
@@ -0,0 +1,171 @@
+""" Aqara Camera bridge to the on-device mosquitto broker """
+
+import asyncio
+
+from .const import (
+    PERSIST_REC_MODE,
+    SYS_PTZ_MOVING,
+    MQTT_PORT,
+    MQTT_TOPIC
+)
+
+# the broker is provisioned to /data/bin; the clients come with the
+# firmware or are copied to /data/bin by hand, the scripts run them
+# from either through MQTT_PATH
+MQTT_BROKER = "/data/bin/mosquitto"
+MQTT_CLIENTS = ("mosquitto_pub", "mosquitto_sub")
+MQTT_PATH = "PATH=/data/bin:$PATH"
+# properties the command script agrees to set
+MQTT_SETPROP_ALLOWED = (PERSIST_REC_MODE,)
+
+STATE_SH = "/tmp/hass_mqtt_state.sh"
+COMMAND_SH = "/tmp/hass_mqtt_command.sh"
+
+# publish every changed property, retained, to <topic>/state/<name>
+STATE_SCRIPT = (
+    MQTT_PATH + "; {loop} | while read -r k v; do "
+    "mosquitto_pub -r -t \"{topic}/state/$k\" -m \"$v\"; done"
+)
+
+# run whitelisted commands published to <topic>/command
+COMMAND_SCRIPT = (
+    MQTT_PATH + "; mosquitto_sub -t {topic}/command | "
+    "while read -r c a b x y; do case \"$c\" in "
+    "move) {moving}; /data/bin/mi_motor -x \"$a\" -y \"$b\" -a \"$x\" "
+    "-b \"$y\"; {stopped};; "
+    "set) case \"$a\" in {allowed}) {setprop};; esac;; "
+    "esac; done"
+)
+
+
+class MqttBridge():
+    """ Exchange state and commands with the camera over MQTT
+
+    Two scripts run on the camera: one publishes the properties watched
+    by the push channel as retained messages, the other reads commands.
+    The client keeps the push channel paused while it is connected, so
+    the telnet transport takes over again whenever MQTT drops.
+    """
+
+    def __init__(self, camera, port=MQTT_PORT, topic=MQTT_TOPIC):
+        """ init """
+        self._camera = camera
+        self._port = port
+        self._topic = topic
+        self._client = None
+        self._loop = None
+        self._dropped = False
+        self.connected = False
+        self.messages = 0
+        self.commands = 0
+
+    def state_script(self, shell) -> str:
+        """ return the script publishing the watched properties """
+        loop = self._camera.push.script(shell, line="\\1 \\2")
+        return STATE_SCRIPT.format(loop=loop, topic=self._topic)
+
+    def command_script(self, shell) -> str:
+        """ return the script running the published commands """
+        return COMMAND_SCRIPT.format(
+            topic=self._topic,
+            moving=shell.setprop_command(SYS_PTZ_MOVING, "true"),
+            stopped=shell.setprop_command(SYS_PTZ_MOVING, "false"),
+            allowed="|".join(MQTT_SETPROP_ALLOWED),
+            setprop=shell.setprop_command('"$a"', '"$b"'),
+        )
+
+    def install_commands(self, shell) -> list:
+        """ return the commands (re)starting the scripts on the camera """
+        state = self.state_script(shell)
+        command = self.command_script(shell)
+        return [
+            "pkill -f hass_mqtt_; pkill -f {}/".format(self._topic),
+            "pidof mosquitto || {} -d".format(MQTT_BROKER),
+            "cat > {} <<'EOF'\n{}\nEOF".format(STATE_SH, state),
+            "cat > {} <<'EOF'\n{}\nEOF".format(COMMAND_SH, command),
+            "nohup sh {} > /dev/null 2>&1 &".format(STATE_SH),
+            "nohup sh {} > /dev/null 2>&1 &".format(COMMAND_SH),
+        ]
+
+    async def async_install(self, shell) -> bool:
+        """ start the scripts if the camera has the mosquitto tools """
+        probe, = await shell.run_batch(["ls {} && ({}; which {})".format(
+            MQTT_BROKER, MQTT_PATH, " ".join(MQTT_CLIENTS))])
+        if probe.status != 0:
+            self._camera.debug("mosquitto tools missing, staying on telnet")
+            return False
+        await shell.run_batch(self.install_commands(shell))
+        return True
+
+    async def async_connect(self, host) -> bool:
+        """ connect the client, it reconnects by itself afterwards """
+        # only loaded when a camera has the bridge enabled
+        # pylint: disable=import-outside-toplevel
+        import paho.mqtt.client as mqtt
+
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
+        else:
+            client = mqtt.Client()
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self._loop.run_in_executor(
+                None, client.connect, host, self._port)
+        except OSError as err:
+            self._camera.debug(f"Can't connect to mosquitto: {err}")
+            return False
+        client.loop_start()
+        self._client = client
+        return True
+
+    async def async_stop(self):
+        """ disconnect the client and hand state back to telnet """
+        client, self._client = self._client, None
+        if client is None:
+            return
+        client.disconnect()
+        await self._loop.run_in_executor(None, client.loop_stop)
+        self._set_connected(False)
+
+    def publish(self, *args) -> bool:
+        """ send one command line, False if it can't go over MQTT """
+        if self._client is None or not self.connected:
+            return False
+        self.commands += 1
+        self._client.publish(
+            "{}/command".format(self._topic), " ".join(map(str, args)))
+        return True
+
+    def _set_connected(self, connected: bool):
+        """ switch the push channel between MQTT and telnet """
+        if connected == self.connected:
+            return
+        self.connected = connected
+        self._camera.push.set_external(connected)
+        if not connected:
+            self._dropped = True
+        elif self._dropped:
+            # the broker may have restarted with the camera, scripts gone
+            asyncio.create_task(self._camera.async_install_mqtt())
+
+    def _on_connect(self, client, _userdata, _flags, result, *_args):
+        """ subscribe to the retained state, paho thread """
+        if result != 0:
+            return
+        client.subscribe("{}/state/#".format(self._topic))
+        self._loop.call_soon_threadsafe(self._set_connected, True)
+
+    def _on_disconnect(self, _client, _userdata, _result, *_args):
+        """ fall back to telnet, paho thread """
+        self._loop.call_soon_threadsafe(self._set_connected, False)
+
+    def _on_message(self, _client, _userdata, message):
+        """ pass a state message to the push channel, paho thread """
+        name = message.topic.rsplit("/", 1)[-1]
+        value = message.payload.decode(errors="replace")
+        self.messages += 1
+        self._loop.call_soon_threadsafe(
+            self._camera.push.feed, {name: value})
@@ -0,0 +1,83 @@
+""" Aqara Camera property dump parser """
+
+
+class PropertyParser():
+    """ Single-pass incremental parser for getprop/agetprop dumps
+
+    Both dialects print one ``[key]: [value]`` pair per line. Chunks can be
+    fed as they come off the socket; a line is only parsed once complete.
+    Values the firmware cut short with ``...`` are not stored, their keys
+    are collected in ``truncated`` so they can be read one by one.
+    """
+
+    def __init__(self):
+        """ init """
+        self.properties: dict = {}
+        self.truncated: set = set()
+        self._pending = ""
+        self._key = None
+        self._value = None
+
+    def feed(self, chunk: str):
+        """ consume a chunk of the dump """
+        if "\n" not in chunk:
+            self._pending += chunk
+            return
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        properties = self.properties
+        for line in lines:
+            # fast path for a complete "[key]: [value]" line
+            if (self._key is None and line.startswith("[") and
+                    line.endswith("]\r")):
+                key, sep, value = line[1:-2].partition("]: [")
+                if sep and not value.endswith("..."):
+                    properties[key] = value
+                    continue
+            self._parse_line(line)
+
+    def close(self) -> dict:
+        """ flush the last line and return the properties """
+        if self._pending:
+            self._parse_line(self._pending)
+            self._pending = ""
+        self._key = self._value = None
+        return self.properties
+
+    def _parse_line(self, line: str):
+        """ parse one line of the dump """
+        if line.endswith("\r"):
+            line = line[:-1]
+
+        if self._key is not None:
+            # continuation of a value spanning several lines
+            if line.endswith("]"):
+                self._store(self._key, self._value + "\n" + line[:-1])
+                self._key = self._value = None
+            else:
+                self._value += "\n" + line
+            return
+
+        # a prompt may precede the first pair, so search for the bracket
+        start = line.find("[")
+        if start < 0:
+            return
+        key_end = line.find("]", start)
+        if key_end < 0:
+            return
+        value_start = line.find("[", key_end)
+        if value_start < 0:
+            return
+        key = line[start + 1:key_end]
+        if line.endswith("]"):
+            self._store(key, line[value_start + 1:-1])
+        else:
+            self._key = key
+            self._value = line[value_start + 1:]
+
+    def _store(self, key: str, value: str):
+        """ store a parsed pair """
+        if value.endswith("..."):
+            self.truncated.add(key)
+        else:
+            self.properties[key] = value
@@ -0,0 +1,212 @@
+""" Aqara Camera binary provisioning """
+
+import asyncio
+import hashlib
+import logging
+from typing import NamedTuple
+
+from .const import (
+    MD5_MI_MOTOR_ARMV7L,
+    MD5_MOSQUITTO_ARMV7L,
+    PROVISION_RETRIES
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+BIN_DIR = "/data/bin"
+# one "name md5 size mtime" line per binary checked by md5
+VERIFIED_FILE = "/data/bin/.hass_verified"
+
+DOWNLOAD_URL = "http://master.dl.sourceforge.net/project/aqarahub/{}?viasf=1"
+
+# bytes written by one printf when pushing from the HA host, escaped
+# to four characters each to stay below the 1024 character line limit
+# of the busybox shell
+PUSH_CHUNK = 240
+# printf commands sent in one batch
+PUSH_BATCH = 32
+
+
+class Binary(NamedTuple):
+    """ a binary the integration installs in /data/bin """
+    name: str
+    md5: str
+    # path below the aqarahub sourceforge project
+    url: str
+
+    @property
+    def path(self) -> str:
+        """ return the path on the camera """
+        return "{}/{}".format(BIN_DIR, self.name)
+
+
+MI_MOTOR = Binary("mi_motor", MD5_MI_MOTOR_ARMV7L, "bin/armv7l/mi_motor")
+MOSQUITTO = Binary("mosquitto", MD5_MOSQUITTO_ARMV7L, "bin/armv7l/mosquitto")
+
+BINARIES = {binary.name: binary for binary in (MI_MOTOR, MOSQUITTO)}
+
+
+def _octal(data: bytes) -> str:
+    """ escape bytes for printf """
+    return "".join("\\{:03o}".format(byte) for byte in data)
+
+
+class Provisioner():
+    """ Make sure binaries with the right md5 are on the camera
+
+    A binary whose size and mtime still match the marker written after
+    its last md5 check is trusted without hashing. Missing or wrong ones
+    are downloaded by the camera with resumable wget, or pushed from the
+    HA host through the shell when fetch is given, at most retries times.
+    """
+
+    def __init__(self, shell, fetch=None, retries=PROVISION_RETRIES):
+        """ init
+
+        fetch is a coroutine function returning the content of a Binary,
+        for cameras without internet access.
+        """
+        self._shell = shell
+        self._fetch = fetch
+        self._retries = retries
+        self.hashed = 0
+        self.installed = 0
+
+    async def async_ensure(self, binaries, trusted=()) -> dict:
+        """ check and install binaries, return {name: ok}
+
+        Binaries named in trusted only have to exist, e.g. after a check
+        earlier on the same firmware.
+        """
+        commands = ["cat {}".format(VERIFIED_FILE)]
+        commands += ["stat -c '%s %Y' {}".format(b.path) for b in binaries]
+        marker, *stats = await self._shell.run_batch(commands)
+        markers = self._parse_markers(marker.output)
+
+        result = {}
+        unknown = []
+        for binary, stat in zip(binaries, stats):
+            current = stat.output.split() if stat.status == 0 else None
+            if current is None and stat.status > 0:
+                # missing
+                result[binary.name] = False
+            elif current is not None and (
+                    binary.name in trusted or
+                    markers.get(binary.name) == [binary.md5] + current):
+                result[binary.name] = True
+            else:
+                unknown.append(binary)
+
+        fresh = []
+        if unknown:
+            self.hashed += len(unknown)
+            sums = await self._shell.run_batch(
+                ["md5sum {}".format(b.path) for b in unknown])
+            for binary, md5 in zip(unknown, sums):
+                result[binary.name] = binary.md5 in md5.output
+                if result[binary.name]:
+                    fresh.append(binary)
+
+        for binary in binaries:
+            if not result[binary.name]:
+                result[binary.name] = await self._async_install(binary)
+                if result[binary.name]:
+                    fresh.append(binary)
+
+        if fresh or any(name in markers and not ok
+                        for name, ok in result.items()):
+            markers = {
+                name: fields for name, fields in markers.items()
+                if result.get(name, True)
+            }
+            await self._async_write_markers(markers, fresh)
+        return result
+
+    @staticmethod
+    def _parse_markers(output: str) -> dict:
+        """ parse the marker file into {name: [md5, size, mtime]} """
+        markers = {}
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) == 4:
+                markers[fields[0]] = fields[1:]
+        return markers
+
+    async def _async_write_markers(self, markers, binaries):
+        """ record md5, size and mtime of freshly verified binaries """
+        stats = await self._shell.run_batch(
+            ["stat -c '%s %Y' {}".format(b.path) for b in binaries])
+        for binary, stat in zip(binaries, stats):
+            if stat.status == 0:
+                markers[binary.name] = [binary.md5] + stat.output.split()
+        lines = "".join(
+            "{} {}\\n".format(name, " ".join(fields))
+            for name, fields in markers.items()
+        )
+        await self._shell.run_batch(
+            ["printf '{}' > {}".format(lines, VERIFIED_FILE)])
+
+    async def _async_install(self, binary) -> bool:
+        """ download or push a binary, retrying a bounded number of times """
+        for attempt in range(self._retries):
+            if attempt:
+                await asyncio.sleep(2 ** attempt)
+            try:
+                if self._fetch is not None:
+                    ok = await self._async_push(binary)
+                else:
+                    ok = await self._async_download(binary)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug("Installing %s failed: %s", binary.name, err)
+                ok = False
+            if ok:
+                self.installed += 1
+                return True
+        _LOGGER.warning(
+            "Can't install %s after %s attempts", binary.name, self._retries
+        )
+        return False
+
+    async def _async_download(self, binary) -> bool:
+        """ let the camera download the binary, resuming a partial file """
+        part = "{}.part".format(binary.path)
+        wget, md5 = await self._shell.run_batch([
+            "mkdir -p {} && wget -c '{}' -O {}".format(
+                BIN_DIR, DOWNLOAD_URL.format(binary.url), part),
+            "md5sum {}".format(part),
+        ], timeout=60)
+        if binary.md5 not in md5.output:
+            if wget.status == 0:
+                # complete but corrupt, resuming would keep it corrupt
+                await self._shell.run_batch(["rm -f {}".format(part)])
+            return False
+        return await self._async_commit(binary, part)
+
+    async def _async_push(self, binary) -> bool:
+        """ write the binary through the shell from the HA host """
+        data = await self._fetch(binary)
+        if hashlib.md5(data).hexdigest() != binary.md5:
+            _LOGGER.warning("%s from the HA host has a wrong md5", binary.name)
+            return False
+        part = "{}.part".format(binary.path)
+        commands = ["mkdir -p {} && : > {}".format(BIN_DIR, part)]
+        commands += [
+            "printf '{}' >> {}".format(_octal(data[pos:pos + PUSH_CHUNK]), part)
+            for pos in range(0, len(data), PUSH_CHUNK)
+        ]
+        for pos in range(0, len(commands), PUSH_BATCH):
+            results = await self._shell.run_batch(
+                commands[pos:pos + PUSH_BATCH])
+            if any(result.status != 0 for result in results):
+                return False
+        md5, = await self._shell.run_batch(["md5sum {}".format(part)])
+        if binary.md5 not in md5.output:
+            return False
+        return await self._async_commit(binary, part)
+
+    async def _async_commit(self, binary, part) -> bool:
+        """ move a verified download into place """
+        move, = await self._shell.run_batch([
+            "chmod +x {0} && mv {0} {1}".format(part, binary.path)
+        ])
+        return move.status == 0
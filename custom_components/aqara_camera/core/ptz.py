@@ -0,0 +1,195 @@
+""" Aqara Camera PTZ worker """
+
+import asyncio
+import logging
+import time
+
+from .const import (
+    ANGLE_X,
+    ANGLE_Y,
+    SPAN_X,
+    SPAN_Y,
+    ANGLE_X_RANGE,
+    ANGLE_Y_RANGE,
+    DIR_UP,
+    DIR_DOWN,
+    DIR_LEFT,
+    DIR_RIGHT,
+    PTZ_STEP,
+    PTZ_POSITION_TTL
+)
+from .shell import CommandStats
+
+_LOGGER = logging.getLogger(__name__)
+
+AXES = (ANGLE_X, ANGLE_Y, SPAN_X, SPAN_Y)
+
+STEPS = {
+    DIR_UP: (0, PTZ_STEP),
+    DIR_DOWN: (0, -PTZ_STEP),
+    DIR_LEFT: (PTZ_STEP, 0),
+    DIR_RIGHT: (-PTZ_STEP, 0),
+}
+
+
+class _PtzRequest():
+    """ one queued PTZ request """
+    __slots__ = ("delta", "target", "queued", "future")
+
+    def __init__(self, delta=(0, 0), target=None):
+        """ init """
+        self.delta = delta
+        self.target = target or {}
+        self.queued = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class PtzWorker():
+    """ Serialize the PTZ moves of one camera
+
+    Requests queued while the motor moves are folded into one absolute
+    move, e.g. five "left" steps become a single +15 degree move. The
+    last commanded position is kept so mi_motor -g is only read again
+    after position_ttl seconds or an invalidate_position().
+    """
+
+    def __init__(self, camera, position_ttl=PTZ_POSITION_TTL):
+        """ init """
+        self._camera = camera
+        self._position_ttl = position_ttl
+        self._position = None
+        self._position_time = 0.0
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._moved = 0.0
+        self.moves = 0
+        self.coalesced = 0
+        self.latency = CommandStats()
+
+    @property
+    def position(self):
+        """ return the last known motor position """
+        return self._position
+
+    @property
+    def stats(self) -> dict:
+        """ return queue statistics """
+        return {
+            "queue_depth": len(self._pending),
+            "moves": self.moves,
+            "coalesced": self.coalesced,
+            "latency": self.latency.as_dict(),
+        }
+
+    def moved_within(self, seconds) -> bool:
+        """ return True if this worker moved the motor lately """
+        return bool(self._pending) or \
+            time.monotonic() - self._moved < seconds
+
+    def invalidate_position(self):
+        """ forget the position, e.g. after the camera moved by itself """
+        self._position = None
+
+    def set_position(self, position: dict):
+        """ seed the position from an outside read """
+        self._position = dict(position)
+        self._position_time = time.monotonic()
+
+    async def async_step(self, direction, span_x=None, span_y=None):
+        """ queue a relative step in direction
+
+        Returns True if the move it was folded into succeeded.
+        """
+        target = {SPAN_X: span_x, SPAN_Y: span_y}
+        return await self._async_submit(
+            _PtzRequest(STEPS[direction.lower()], target))
+
+    async def async_move(self, angle_x=None, angle_y=None,
+                         span_x=None, span_y=None):
+        """ queue an absolute move, None keeps the current value
+
+        Returns True if the move it was folded into succeeded.
+        """
+        target = {ANGLE_X: angle_x, ANGLE_Y: angle_y,
+                  SPAN_X: span_x, SPAN_Y: span_y}
+        return await self._async_submit(_PtzRequest(target=target))
+
+    async def async_stop(self):
+        """ stop the worker """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for request in self._pending:
+            request.future.cancel()
+        self._pending = []
+
+    async def _async_submit(self, request):
+        """ queue a request and wait until it was executed """
+        self._pending.append(request)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._async_run())
+        return await asyncio.shield(request.future)
+
+    async def async_get_position(self):
+        """ return the motor position, reading it if unknown or stale """
+        if (self._position is None or
+                time.monotonic() - self._position_time > self._position_ttl):
+            self.set_position(await self._camera.async_get_motor_position())
+        return dict(self._position)
+
+    async def _async_run(self):
+        """ execute queued requests, merging all that waited """
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                requests, self._pending = self._pending, []
+                self.coalesced += len(requests) - 1
+                try:
+                    moved = await self._async_execute(requests)
+                except Exception as err:  # pylint: disable=broad-except
+                    moved = False
+                    self.invalidate_position()
+                    self._camera.debug(f"ptz_control got error: {err}")
+                now = time.monotonic()
+                for request in requests:
+                    self.latency.add(now - request.queued)
+                    if not request.future.done():
+                        request.future.set_result(moved)
+
+    async def _async_execute(self, requests):
+        """ fold requests into one absolute move and run it """
+        # a full absolute target makes the current position irrelevant
+        start = None
+        for index, request in enumerate(requests):
+            if all(request.target.get(key) is not None for key in AXES):
+                start = index
+        if start is None:
+            position = await self.async_get_position()
+        else:
+            position = dict(requests[start].target)
+            requests = requests[start:]
+        for request in requests:
+            for key, value in request.target.items():
+                if value is not None:
+                    position[key] = value
+            position[ANGLE_X] += request.delta[0]
+            position[ANGLE_Y] += request.delta[1]
+        position[ANGLE_X] = min(max(position[ANGLE_X], ANGLE_X_RANGE[0]),
+                                ANGLE_X_RANGE[1])
+        position[ANGLE_Y] = min(max(position[ANGLE_Y], ANGLE_Y_RANGE[0]),
+                                ANGLE_Y_RANGE[1])
+        self.moves += 1
+        try:
+            moved = await self._camera.async_move_motor(
+                position[ANGLE_X], position[ANGLE_Y],
+                position[SPAN_X], position[SPAN_Y])
+        finally:
+            self._moved = time.monotonic()
+        if moved:
+            self.set_position(position)
+        else:
+            self.invalidate_position()
+        return moved
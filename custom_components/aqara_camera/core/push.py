@@ -0,0 +1,153 @@
+""" Aqara Camera property push channel """
+
+import asyncio
+import json
+import time
+
+from .const import (
+    PERSIST_REC_MODE,
+    SYS_PTZ_MOVING,
+    PUSH_INTERVAL,
+    PUSH_STABLE_TIME,
+    RECONNECT_BACKOFF_MIN,
+    RECONNECT_BACKOFF_MAX
+)
+
+# properties followed by the on-device loop, camera_ai* as in
+# AqaraCamera.properties
+PUSH_PATTERN = r"^\[({}|{}|[^]]*camera_ai[^]]*)\]:".format(
+    PERSIST_REC_MODE, SYS_PTZ_MOVING).replace(".", r"\.")
+
+# runs on the camera: print every changed property with line, a sed
+# replacement of \1 (name) and \2 (value)
+PUSH_SCRIPT = (
+    "o=/tmp/hass_push.$$; n=/tmp/hass_push_new.$$; : > $o; "
+    "trap 'rm -f $o $n; exit' HUP INT TERM; "
+    "while true; do "
+    "{getprop} | tr -d '\\r' | grep -E '{pattern}' > $n; "
+    "if ! cmp -s $n $o; then "
+    "grep -vxF -f $o $n | "
+    "sed -n 's/^\\[\\([^]]*\\)\\]: \\[\\(.*\\)\\]$/{line}/p'; "
+    "mv $n $o; fi; "
+    "sleep {interval}; done"
+)
+# one JSON object per changed property
+PUSH_LINE_JSON = '{"\\1":"\\2"}'
+
+
+class PushChannel():
+    """ Receive property changes from the camera as they happen
+
+    A second shell runs a loop on the camera that compares the watched
+    properties every interval and prints only the changed ones, so
+    nothing crosses the network while the camera is idle. The first
+    lines after a (re)connect carry every watched value.
+    """
+
+    def __init__(self, camera, interval=PUSH_INTERVAL):
+        """ init """
+        self._camera = camera
+        self._interval = interval
+        self._listeners = []
+        self._task = None
+        self._external = False
+        self.events = 0
+        self.reconnects = 0
+
+    @property
+    def running(self) -> bool:
+        """ return True while the channel runs """
+        return self._task is not None and not self._task.done()
+
+    def async_add_listener(self, update_callback):
+        """ call update_callback(changes) for every pushed change
+
+        The channel runs while it has listeners. Returns a function
+        removing the listener.
+        """
+        self._listeners.append(update_callback)
+        self._start()
+
+        def remove_listener():
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+            if not self._listeners:
+                self.stop()
+
+        return remove_listener
+
+    def set_external(self, external: bool):
+        """ pause the shell while another transport calls feed() """
+        self._external = external
+        if external:
+            self.stop()
+        else:
+            self._start()
+
+    def _start(self):
+        """ start the shell loop if it has listeners and no other source """
+        if self._listeners and not self._external and not self.running:
+            self._task = asyncio.create_task(self._async_run())
+
+    def stop(self):
+        """ stop the channel, its shell is closed by the task """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def script(self, shell, line=PUSH_LINE_JSON) -> str:
+        """ return the watch loop for the dialect of shell """
+        return PUSH_SCRIPT.format(
+            getprop=shell.prop_command(),
+            pattern=PUSH_PATTERN,
+            line=line,
+            interval=self._interval,
+        )
+
+    async def _async_run(self):
+        """ keep the watch loop running, reconnecting with backoff
+
+        A login alone does not reset the backoff: a camera that accepts
+        the login and drops the loop right away would be hammered. Only
+        a loop that ran for PUSH_STABLE_TIME does.
+        """
+        delay = RECONNECT_BACKOFF_MIN
+        while True:
+            shell = self._camera.create_shell()
+            started = None
+            try:
+                await shell.connect()
+                await shell.login()
+                started = time.monotonic()
+                await shell.read_lines(self.script(shell), self._on_line)
+            except (OSError, EOFError, asyncio.TimeoutError) as err:
+                self._camera.debug(f"push channel got error: {err}")
+            finally:
+                await shell.close()
+            if (started is not None and
+                    time.monotonic() - started >= PUSH_STABLE_TIME):
+                delay = RECONNECT_BACKOFF_MIN
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_BACKOFF_MAX)
+
+    def _on_line(self, line: str):
+        """ decode one line of the watch loop """
+        try:
+            changes = json.loads(line)
+        except ValueError:
+            self._camera.debug(f"push channel ignored: {line}")
+            return
+        if isinstance(changes, dict):
+            self.feed(changes)
+
+    def feed(self, changes: dict):
+        """ apply changed properties and pass them on """
+        self.events += 1
+        if (changes.get(SYS_PTZ_MOVING) == "true" and
+                not self._camera.ptz.moved_within(self._interval * 3)):
+            # moved by the Aqara app or a motion track
+            self._camera.ptz.invalidate_position()
+        self._camera.update_props(changes)
+        for update_callback in list(self._listeners):
+            update_callback(changes)
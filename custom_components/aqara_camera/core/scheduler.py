@@ -0,0 +1,128 @@
+""" Aqara Camera shell command scheduler """
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+
+from .const import PRIORITY_INTERACTIVE, PRIORITY_NAMES
+
+# (priority, deadline, interruptible) of the commands run by the current
+# task, commands not marked otherwise are urgent and never interrupted
+_PRIORITY = contextvars.ContextVar(
+    "aqara_camera_priority", default=(PRIORITY_INTERACTIVE, None, False))
+
+
+class CommandExpired(asyncio.TimeoutError):
+    """ a queued command did not get the shell before its deadline """
+
+
+@contextmanager
+def command_priority(priority: int, deadline=None, interruptible=False):
+    """ run the shell commands of the current task at priority
+
+    With a deadline, a command still queued after that many seconds
+    fails with CommandExpired instead of running late. Only interruptible
+    commands may be cut short for a more urgent one, so mark only reads
+    that can simply be repeated, never installs or multi-step changes.
+    """
+    token = _PRIORITY.set((priority, deadline, interruptible))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class CommandScheduler():
+    """ Hand one shell to one command at a time, most urgent first
+
+    Used like a lock. Waiters are served by priority and in arrival order
+    within a priority; the priority comes from command_priority() of the
+    waiting task. An interruptible holder can check yielding to cut its
+    silence waits short while a more urgent command is queued.
+    """
+
+    def __init__(self, metrics=None):
+        """ init """
+        # heap of [priority, arrival, future, interruptible]
+        self._queue = []
+        self._arrival = itertools.count()
+        self._holder = None
+        self._interruptible = False
+        self.metrics = metrics
+
+    @property
+    def yielding(self) -> bool:
+        """ return True while an interruptible holder should give way """
+        self._prune()
+        return (self._holder is not None and self._interruptible and
+                bool(self._queue) and self._queue[0][0] < self._holder)
+
+    async def __aenter__(self):
+        """ wait for the shell at the priority of the current task """
+        await self.acquire(*_PRIORITY.get())
+
+    async def __aexit__(self, *exc_info):
+        """ pass the shell on """
+        self.release()
+
+    async def acquire(self, priority: int, deadline=None,
+                      interruptible=False):
+        """ wait until the shell is free and no more urgent command waits """
+        started = time.monotonic()
+        self._prune()
+        if self._holder is None:
+            self._holder = priority
+            self._interruptible = interruptible
+            self._record(priority, 0.0)
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._queue, [
+            priority, next(self._arrival), future, interruptible])
+        expire = None
+        if deadline is not None:
+            expire = loop.call_later(deadline, self._expire, future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.cancelled() and future.exception() is None:
+                # cancelled after the shell was handed over
+                self.release()
+            raise
+        finally:
+            if expire is not None:
+                expire.cancel()
+        self._record(priority, time.monotonic() - started)
+
+    def release(self):
+        """ hand the shell to the most urgent waiter """
+        while self._queue:
+            priority, _, future, interruptible = heapq.heappop(self._queue)
+            if not future.done():
+                self._holder = priority
+                self._interruptible = interruptible
+                future.set_result(None)
+                return
+        self._holder = None
+        self._interruptible = False
+
+    def _prune(self):
+        """ drop cancelled and expired waiters from the top of the queue """
+        while self._queue and self._queue[0][2].done():
+            heapq.heappop(self._queue)
+
+    def _expire(self, future):
+        """ fail a waiter that missed its deadline """
+        if not future.done():
+            future.set_exception(CommandExpired(
+                "shell busy past the command deadline"))
+            if self.metrics is not None:
+                self.metrics.expired += 1
+
+    def _record(self, priority: int, waited: float):
+        """ record the queue wait of a command """
+        if self.metrics is not None:
+            self.metrics.record_wait(PRIORITY_NAMES[priority], waited)
@@ -0,0 +1,158 @@
+"""Session manager for Aqara Camera component."""
+import asyncio
+import logging
+
+from .aqara_camera import AqaraCamera
+from .const import (
+    DATA_SESSIONS,
+    KEEPALIVE_INTERVAL,
+    RECONNECT_BACKOFF_MIN,
+    RECONNECT_BACKOFF_MAX
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_session_manager(hass):
+    """ return the session manager shared by the integration """
+    manager = hass.data.get(DATA_SESSIONS)
+    if manager is None:
+        manager = hass.data[DATA_SESSIONS] = SessionManager(hass)
+    return manager
+
+
+class _Session():
+    """ one logged-in camera and its users """
+
+    def __init__(self, camera: AqaraCamera):
+        """ init """
+        self.camera = camera
+        self.refs = 0
+        self.keepalive_task = None
+        self.close_handle = None
+        self.connect_lock = asyncio.Lock()
+
+
+class SessionManager():
+    """ Own exactly one logged-in shell per camera host """
+
+    def __init__(self, hass, keepalive=KEEPALIVE_INTERVAL):
+        """ init """
+        self.hass = hass
+        self._keepalive = keepalive
+        self._sessions: dict = {}
+        self._lock = asyncio.Lock()
+        self._host_locks: dict = {}
+
+    async def async_acquire(self, host, model, stream, snapshot=None,
+                            login=None):
+        """ return the logged-in camera for host, or None
+
+        With a snapshot, a new camera is restored from it and returned
+        right away; the login then happens through async_reconnect.
+        A new camera takes over the connection of login, a shell left
+        logged in by discovery; the caller still closes it if unused.
+        """
+        # logins to different hosts run concurrently, only the session
+        # table is guarded by the shared lock
+        async with self._host_locks.setdefault(host, asyncio.Lock()):
+            async with self._lock:
+                session = self._sessions.get(host)
+                if session is not None:
+                    return self._ref(session)
+
+            camera = AqaraCamera(self.hass, host, model, stream)
+            if snapshot is not None:
+                camera.restore(snapshot)
+            elif not await camera.async_connect(login):
+                return None
+
+            async with self._lock:
+                session = self._sessions[host] = _Session(camera)
+                session.keepalive_task = asyncio.create_task(
+                    self._async_keepalive(host, session)
+                )
+                return self._ref(session)
+
+    @staticmethod
+    def _ref(session):
+        """ add a reference to session and keep it open """
+        if session.close_handle:
+            session.close_handle.cancel()
+            session.close_handle = None
+        session.refs += 1
+        return session.camera
+
+    async def async_release(self, host, linger=0):
+        """ drop a reference, closing the session when unused
+
+        With linger, the session stays open that many seconds so the
+        next user (e.g. setup right after the config flow) can reuse it.
+        """
+        async with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                return
+            session.refs = max(0, session.refs - 1)
+            if session.refs:
+                return
+            if linger:
+                session.close_handle = asyncio.get_running_loop().call_later(
+                    linger, self._schedule_close, host, session
+                )
+                return
+            await self._async_close(host, session)
+
+    async def async_reconnect(self, host):
+        """ log in again, backing off exponentially until it works """
+        session = self._sessions.get(host)
+        if session is None:
+            return None
+        camera = session.camera
+        async with session.connect_lock:
+            if await camera.async_keepalive():
+                return camera
+            delay = RECONNECT_BACKOFF_MIN
+            while not await camera.async_connect():
+                _LOGGER.debug(
+                    "%s: reconnect failed, retrying in %ss", host, delay
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_BACKOFF_MAX)
+            camera.metrics.reconnects += 1
+            _LOGGER.debug("%s: connected", host)
+        return camera
+
+    async def async_close_all(self):
+        """ close every session """
+        async with self._lock:
+            for host, session in list(self._sessions.items()):
+                await self._async_close(host, session)
+
+    def _schedule_close(self, host, session):
+        """ close a lingering session """
+        asyncio.create_task(self._async_close_idle(host, session))
+
+    async def _async_close_idle(self, host, session):
+        """ close a lingering session if nobody picked it up """
+        async with self._lock:
+            if self._sessions.get(host) is session and not session.refs:
+                await self._async_close(host, session)
+
+    async def _async_close(self, host, session):
+        """ stop keepalive and logout """
+        self._sessions.pop(host, None)
+        if session.close_handle:
+            session.close_handle.cancel()
+        if session.keepalive_task:
+            session.keepalive_task.cancel()
+        await session.camera.async_shutdown()
+
+    async def _async_keepalive(self, host, session):
+        """ health-check the shell and reconnect with backoff """
+        while True:
+            await asyncio.sleep(self._keepalive)
+            if session.connect_lock.locked():
+                continue
+            if not await session.camera.async_keepalive():
+                await self.async_reconnect(host)
@@ -1,91 +1,631 @@
 """ Aqara Camera telnet shell """
 
+import asyncio
+import codecs
+import secrets
 import time
-from telnetlib import Telnet
-from typing import Union
+from bisect import bisect_left
+from collections import deque
+from typing import NamedTuple, Union
 
-WGET = "(wget http://master.dl.sourceforge.net/project/aqarahub/{0}?viasf=1 " \
-            "-O /data/bin/{1} && chmod +x /data/bin/{1})"
+from .const import SCHEDULER_YIELD
+from .scheduler import CommandScheduler
 
+TELNET_PORT = 23
 
-class TelnetShell(Telnet):
-    """ Telnet Shell """
+# response framing strategies
+FRAMING_PROMPT = "prompt"
+FRAMING_SENTINEL = "sentinel"
+
+# prompts of the camera shells, longest first: the G3 starts in ~ and
+# moves to /, other models only print "# "
+PROMPTS = ("~ # ", "/ # ", "# ")
+
+# latency samples kept per command for percentiles
+STATS_WINDOW = 100
+# upper bounds in seconds of the latency histogram buckets
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Telnet protocol bytes (RFC 854)
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+
+
+class CommandResult(NamedTuple):
+    """ output and exit status of one batched command """
+    output: str
+    # -1 when the end marker never arrived
+    status: int
+
+
+class CommandStats():
+    """ latency statistics of one command """
+
+    def __init__(self):
+        """ init """
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self._recent = deque(maxlen=STATS_WINDOW)
+
+    def add(self, latency: float, timed_out=False):
+        """ record one call """
+        self.count += 1
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS, latency)] += 1
+        self.total += latency
+        self.last = latency
+        self.max = max(self.max, latency)
+        self._recent.append(latency)
+        if timed_out:
+            self.timeouts += 1
+
+    def percentile(self, percent: float) -> float:
+        """ return a percentile of the recent latencies """
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+    def as_dict(self) -> dict:
+        """ return the statistics as a dict """
+        return {
+            "count": self.count,
+            "timeouts": self.timeouts,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+            "last": self.last,
+            "histogram": self.histogram(),
+        }
+
+    def histogram(self) -> dict:
+        """ return call counts per latency bucket """
+        labels = ["<={}".format(bound) for bound in HISTOGRAM_BUCKETS]
+        labels.append(">{}".format(HISTOGRAM_BUCKETS[-1]))
+        return dict(zip(labels, self.buckets))
+
+
+class ShellMetrics():
+    """ counters shared by all shells of one camera
+
+    They outlive a single connection, so reconnects do not reset them.
+    """
+
+    def __init__(self):
+        """ init """
+        self.commands: dict = {}
+        self.operations: dict = {}
+        self.queue_wait: dict = {}
+        self.total = CommandStats()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.connects = 0
+        self.reconnects = 0
+        # queued commands dropped at their deadline, and commands that
+        # gave the shell up to a more urgent one
+        self.expired = 0
+        self.yielded = 0
+
+    @staticmethod
+    def _add(stats: dict, name: str, latency: float, timed_out: bool):
+        """ add one sample to stats[name] """
+        entry = stats.get(name)
+        if entry is None:
+            entry = stats[name] = CommandStats()
+        entry.add(latency, timed_out)
+
+    def record(self, name: str, latency: float, timed_out=False):
+        """ record one shell round-trip """
+        self._add(self.commands, name, latency, timed_out)
+        self.total.add(latency, timed_out)
+
+    def record_operation(self, name: str, latency: float):
+        """ record one camera operation, made of one or more round-trips """
+        self._add(self.operations, name, latency, False)
+
+    def record_wait(self, priority: str, latency: float):
+        """ record how long a command of a priority waited for the shell """
+        self._add(self.queue_wait, priority, latency, False)
+
+    def as_dict(self) -> dict:
+        """ return every counter as a dict """
+        return {
+            "total": self.total.as_dict(),
+            "commands": {
+                name: stats.as_dict() for name, stats in self.commands.items()
+            },
+            "operations": {
+                name: stats.as_dict()
+                for name, stats in self.operations.items()
+            },
+            "queue_wait": {
+                name: stats.as_dict()
+                for name, stats in self.queue_wait.items()
+            },
+            "expired": self.expired,
+            "yielded": self.yielded,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+        }
+
+
+class AsyncTelnetShell():
+    """ Asyncio telnet shell
+
+    With FRAMING_PROMPT a response ends when the shell prompt is seen.
+    With FRAMING_SENTINEL every command is followed by an echo of a unique
+    end marker and its exit status, so a response completes as soon as
+    the marker arrives whatever the prompt looks like. A begin marker
+    lets the next command drop what is left of an interrupted one, so a
+    stalled low priority command can give the shell up to an urgent one.
+    """
     _aqara_property = False
 
-    def __init__(self, host: str, password=None):
+    def __init__(self, host: str, password=None, port=TELNET_PORT,
+                 framing=FRAMING_PROMPT, metrics=None):
         """ init """
-        super().__init__(host, timeout=3)
         self._host = host
+        self._port = port
+        # called with ("send" or "recv", bytes) to record a session
+        self.recorder = None
         self._password = password
         self._suffix = "# "
+        self._reader = None
+        self._writer = None
+        self._buffer = b""
+        self._iac_tail = b""
+        self._eof = False
+        self._framing = framing
+        self._logged_in = False
+        self.metrics = metrics if metrics is not None else ShellMetrics()
+        self._scheduler = CommandScheduler(self.metrics)
+        self.stats = self.metrics.commands
+
+    async def connect(self, timeout=3):
+        """ open the telnet connection """
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port), timeout
+        )
+        self._buffer = b""
+        self._iac_tail = b""
+        self._eof = False
+        self._logged_in = False
+        self.metrics.connects += 1
+
+    def take_over(self, shell):
+        """ continue on the open connection of shell, left at a prompt
 
-    def login(self):
+        Discovery logs in to tell the dialect apart; the shell of that
+        dialect takes the connection over and start_session finishes the
+        login, instead of connecting and logging in again.
+        """
+        self._reader, self._writer = shell._reader, shell._writer
+        self._buffer, self._iac_tail = shell._buffer, shell._iac_tail
+        self._eof = shell._eof
+        self._logged_in = False
+        shell._reader = shell._writer = None
+        self.metrics.connects += 1
+
+    async def close(self):
+        """ close the telnet connection """
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is None:
+            return
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, asyncio.CancelledError):
+            pass
+
+    @property
+    def connected(self) -> bool:
+        """ return True while the connection is open """
+        return (self._writer is not None and not self._eof and
+                not self._writer.is_closing())
+
+    async def login(self):
         """ login function """
         self.write(b"\n")
         login_name = 'admin'
-        self.read_until(b"login: ", timeout=3)
+        await self.read_until(b"login: ", timeout=3)
         self.write(login_name.encode() + b"\n")
 
         if self._password:
-            self.read_until(b"Password: ", timeout=3)
-            self.run_command(self._password)
+            await self.read_until(b"Password: ", timeout=3)
+            self.write(self._password.encode() + b"\n")
+            suffix = "\r\n{}".format(self._suffix)
+            await self.read_until(suffix.encode(), timeout=10)
+        return await self.start_session()
 
+    async def start_session(self):
+        """ set the shell up once logged in """
         command = "stty -echo"
         self.write(command.encode() + b"\n")
-        self.read_until(b"stty -echo\n", timeout=10)
+        await self.read_until(b"stty -echo\n", timeout=10)
+        self._logged_in = True
         return True
 
+    @property
+    def framing(self) -> str:
+        """ return the response framing strategy """
+        return self._framing
+
+    @property
+    def _sentinel(self) -> bool:
+        """ return True when sentinel framing is in use """
+        return self._framing == FRAMING_SENTINEL and self._logged_in
+
+    def _record(self, command: str, started: float, timed_out: bool):
+        """ record the latency of a command """
+        name = command.split(None, 1)[0].rsplit("/", 1)[-1] if \
+            command.strip() else "<empty>"
+        self.metrics.record(name, time.monotonic() - started, timed_out)
+
     @property
     def suffix(self):
         """ return shell extra prefix or suffix"""
         return self._suffix
 
-    def run_command(self, command: str, as_bytes=False) -> Union[str, bytes]:
+    def write(self, data: bytes):
+        """ write raw data, escaping IAC """
+        if self.recorder is not None:
+            self.recorder("send", data)
+        data = data.replace(bytes([IAC]), bytes([IAC, IAC]))
+        self.metrics.bytes_written += len(data)
+        self._writer.write(data)
+
+    def _filter_iac(self, data: bytes) -> bytes:
+        """ strip telnet negotiation and refuse every option """
+        data = self._iac_tail + data
+        self._iac_tail = b""
+        if IAC not in data:
+            return data.replace(b"\0", b"")
+        out = bytearray()
+        i = 0
+        length = len(data)
+        while i < length:
+            pos = data.find(IAC, i)
+            if pos < 0:
+                out += data[i:]
+                break
+            out += data[i:pos]
+            if pos + 1 >= length:
+                self._iac_tail = data[pos:]
+                break
+            cmd = data[pos + 1]
+            if cmd == IAC:
+                out.append(IAC)
+                i = pos + 2
+            elif cmd in (DO, DONT, WILL, WONT):
+                if pos + 2 >= length:
+                    self._iac_tail = data[pos:]
+                    break
+                reply = WONT if cmd in (DO, DONT) else DONT
+                self._writer.write(bytes([IAC, reply, data[pos + 2]]))
+                i = pos + 3
+            elif cmd == SB:
+                end = data.find(bytes([IAC, SE]), pos + 2)
+                if end < 0:
+                    self._iac_tail = data[pos:]
+                    break
+                i = end + 2
+            else:
+                i = pos + 2
+        return bytes(out).replace(b"\0", b"")
+
+    async def _fill(self, timeout) -> bool:
+        """ read one chunk from the socket into the buffer """
+        if self._eof:
+            return False
+        chunk = await self._read_chunk(timeout)
+        if not chunk:
+            self._eof = True
+            return False
+        self.metrics.bytes_read += len(chunk)
+        if self.recorder is not None:
+            self.recorder("recv", chunk)
+        self._buffer += self._filter_iac(chunk)
+        return True
+
+    async def _read_chunk(self, timeout) -> bytes:
+        """ read from the socket, waiting at most timeout seconds
+
+        Under sentinel framing an interruptible command silent for
+        SCHEDULER_YIELD seconds while a more urgent one is queued is
+        interrupted with ctrl-c, which also drops the rest of its batch
+        on the camera. Other commands run to the end.
+        """
+        if not self._sentinel or timeout is None or timeout <= SCHEDULER_YIELD:
+            return await asyncio.wait_for(self._reader.read(4096), timeout)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                return await asyncio.wait_for(
+                    self._reader.read(4096),
+                    min(SCHEDULER_YIELD, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                if self._scheduler.yielding:
+                    self.metrics.yielded += 1
+                    self.write(b"\x03")
+                    raise
+                if loop.time() >= deadline:
+                    raise
+
+    async def read_until(self, match: bytes, timeout=None) -> bytes:
+        """ read until match or timeout, like Telnet.read_until """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        start = 0
+        while True:
+            pos = self._buffer.find(match, start)
+            if pos >= 0:
+                pos += len(match)
+                data, self._buffer = self._buffer[:pos], self._buffer[pos:]
+                return data
+            start = max(0, len(self._buffer) - len(match) + 1)
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                if not await self._fill(remaining):
+                    break
+            except asyncio.TimeoutError:
+                break
+        data, self._buffer = self._buffer, b""
+        if not data and self._eof:
+            raise EOFError("telnet connection closed")
+        return data
+
+    async def run_command(
+            self, command: str, as_bytes=False) -> Union[str, bytes]:
         """Run command and return it result."""
         # pylint: disable=broad-except
         aqara_timeout = 10
         if self._aqara_property:
             aqara_timeout = 3
+        started = time.monotonic()
+        if self._sentinel:
+            async with self._scheduler:
+                result = (await self._run_batch(
+                    [command], aqara_timeout))[0]
+            self._record(command, started, result.status < 0)
+            return result.output.encode() if as_bytes else result.output
+        suffix = "\r\n{}".format(self._suffix)
         try:
-            self.write(command.encode() + b"\n")
-            suffix = "\r\n{}".format(self._suffix)
-            raw = self.read_until(suffix.encode(), timeout=aqara_timeout)
+            async with self._scheduler:
+                self.write(command.encode() + b"\n")
+                raw = await self.read_until(
+                    suffix.encode(), timeout=aqara_timeout)
         except Exception:
             raw = b''
-        return raw if as_bytes else raw.decode()
+        self._record(command, started, not raw.endswith(suffix.encode()))
+        return raw if as_bytes else raw.decode(errors="replace")
+
+    async def run_batch(self, commands: list, timeout=None) -> list:
+        """Run many commands with a single write and return their results.
+
+        Every command is followed by an echo of a unique end marker and
+        its exit status, the output stream is split on those markers.
+        The timeout applies to silence between chunks.
+        """
+        if not commands:
+            return []
+        if timeout is None:
+            timeout = 3 if self._aqara_property else 10
+        started = time.monotonic()
+        async with self._scheduler:
+            results = await self._run_batch(commands, timeout)
+        self._record("batch", started, results[-1].status < 0)
+        return results
+
+    async def _run_batch(self, commands: list, timeout) -> list:
+        """ run_batch without taking the lock """
+        token = secrets.token_hex(4)
+        markers = [
+            "__END_{}_{}__".format(token, index)
+            for index in range(len(commands))
+        ]
+        begin = "__BEGIN_{}__".format(token)
+        script = 'echo "{}"\n'.format(begin) + "".join(
+            '{}\necho "{} $?"\n'.format(command, marker)
+            for command, marker in zip(commands, markers)
+        )
+        last = markers[-1].encode()
+        try:
+            # drop prompts and output left over by earlier commands
+            self._buffer = b""
+            self.write(script.encode())
+            await self._skip_to(begin.encode(), timeout)
+            raw = await self._read_until_quiet(last, timeout)
+            if raw.endswith(last):
+                raw += await self._read_until_quiet(b"\n", timeout)
+        except Exception:  # pylint: disable=broad-except
+            raw = b''
+        return self._split_batch(raw.decode(errors="replace"), markers)
+
+    def _split_batch(self, raw: str, markers: list) -> list:
+        """ demultiplex a batch output on its end markers """
+        results = []
+        start = 0
+        for marker in markers:
+            pos = raw.find(marker, start)
+            if pos < 0:
+                results.append(CommandResult(self._strip_prompts(
+                    raw[start:]), -1))
+                start = len(raw)
+                continue
+            output = self._strip_prompts(raw[start:pos])
+            end = raw.find("\n", pos)
+            if end < 0:
+                end = len(raw)
+            try:
+                status = int(raw[pos + len(marker):end].strip())
+            except ValueError:
+                status = -1
+            results.append(CommandResult(output, status))
+            start = end + 1
+        return results
+
+    def _strip_prompts(self, output: str) -> str:
+        """ drop the prompts the shell printed around an output
+
+        Any known prompt is accepted, not only the current suffix, so a
+        shell that ends up in another directory still parses.
+        """
+        stripped = True
+        while stripped:
+            stripped = False
+            output = output.strip("\r\n")
+            for prompt in PROMPTS:
+                if output.startswith(prompt):
+                    output = output[len(prompt):]
+                    stripped = True
+                    break
+            for prompt in PROMPTS:
+                if output.endswith(prompt):
+                    output = output[:-len(prompt)]
+                    stripped = True
+                    break
+        return output
 
-    def file_exist(self, filename: str) -> bool:
+    async def _read_until_quiet(self, match: bytes, timeout) -> bytes:
+        """ read until match, giving up after timeout seconds of silence """
+        start = 0
+        while True:
+            pos = self._buffer.find(match, start)
+            if pos >= 0:
+                pos += len(match)
+                data, self._buffer = self._buffer[:pos], self._buffer[pos:]
+                return data
+            start = max(0, len(self._buffer) - len(match) + 1)
+            try:
+                if not await self._fill(timeout):
+                    break
+            except asyncio.TimeoutError:
+                break
+        data, self._buffer = self._buffer, b""
+        return data
+
+    async def _skip_to(self, marker: bytes, timeout):
+        """ drop the output up to the end of the line holding marker """
+        if (await self._read_until_quiet(marker, timeout)).endswith(marker):
+            await self._read_until_quiet(b"\n", timeout)
+
+    async def stream_command(self, command: str, feed, timeout=None) -> bool:
+        """Run command and pass its decoded output to feed as it arrives.
+
+        The timeout applies to silence between chunks, so a long dump is
+        not cut off while it is still flowing. Return True if the end of
+        the response was seen.
+        """
+        if timeout is None:
+            timeout = 3 if self._aqara_property else 10
+        line = command.encode() + b"\n"
+        if self._sentinel:
+            token = secrets.token_hex(4)
+            begin = "__BEGIN_{}__".format(token)
+            line = 'echo "{}"\n'.format(begin).encode() + line
+            line += 'echo "__END_{}__ $?"\n'.format(token).encode()
+            match = "__END_{}__".format(token).encode()
+        else:
+            match = "\r\n{}".format(self._suffix).encode()
+        keep = len(match) - 1
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        started = time.monotonic()
+        found = False
+        async with self._scheduler:
+            if self._sentinel:
+                self._buffer = b""
+            self.write(line)
+            if self._sentinel:
+                await self._skip_to(begin.encode(), timeout)
+            while True:
+                pos = self._buffer.find(match)
+                if pos >= 0:
+                    data = self._buffer[:pos]
+                    self._buffer = self._buffer[pos + len(match):]
+                    feed(decoder.decode(data, final=True))
+                    found = True
+                    break
+                if len(self._buffer) > keep:
+                    feed(decoder.decode(self._buffer[:-keep]))
+                    self._buffer = self._buffer[-keep:]
+                try:
+                    if not await self._fill(timeout):
+                        break
+                except asyncio.TimeoutError:
+                    break
+            if not found:
+                feed(decoder.decode(self._buffer, final=True))
+                self._buffer = b""
+            elif self._sentinel:
+                await self._read_until_quiet(b"\n", timeout)
+        self._record(command, started, not found)
+        return found
+
+    async def read_lines(self, command: str, on_line):
+        """Run a command that never ends and pass each output line on.
+
+        Lines are decoded and stripped, empty lines and prompts are
+        skipped. Returns when the connection is closed; meant for a
+        shell of its own, since the lock is held meanwhile.
+        """
+        prompt = self._suffix.strip()
+        async with self._scheduler:
+            self._buffer = b""
+            self.write(command.encode() + b"\n")
+            while await self._fill(None):
+                *lines, self._buffer = self._buffer.split(b"\n")
+                for line in lines:
+                    text = line.decode(errors="replace").strip()
+                    if text and text != prompt:
+                        on_line(text)
+
+    async def get_all_props(self, feed) -> bool:
+        """ stream the full property dump to feed """
+        return await self.stream_command(self.prop_command(), feed)
+
+    async def file_exist(self, filename: str) -> bool:
         """ check file exit """
-        raw = self.run_command("ls -al {}".format(filename))
+        raw = await self.run_command("ls -al {}".format(filename))
         if "No such" not in str(raw):
             return True
         return False
 
-    def get_running_ps(self) -> str:
+    async def get_running_ps(self) -> str:
         """ get processes list """
-        return self.run_command("ps")
+        return await self.run_command("ps")
 
-    def check_bin(self, filename: str, md5: str, url=None) -> bool:
-        """Check binary md5 and download it if needed."""
-        # used * for development purposes
-        data = self.run_command("md5sum /data/bin/{}".format(filename))
-        if md5 in data:
-            return True
-        if url:
-            self.run_command("mkdir -p /data/bin\n")
-            self.run_command(WGET.format(url, filename))
-            return self.check_bin(filename, md5)
-        return False
+    def prop_command(self, property_value: str = "") -> str:
+        """ return the getprop command line of this dialect """
+        command = "agetprop" if self._aqara_property else "getprop"
+        if property_value:
+            command = "{} {}".format(command, property_value)
+        return command
+
+    def setprop_command(self, property_value: str, value: str) -> str:
+        """ return the setprop command line of this dialect """
+        command = "asetprop" if self._aqara_property else "setprop"
+        return "{} {} {}".format(command, property_value, value)
 
-    def get_prop(self, property_value: str):
+    async def get_prop(self, property_value: str):
         """ get property """
         # pylint: disable=broad-except
         try:
-            if self._aqara_property:
-                command = "agetprop {}\n\r".format(property_value)
-            else:
-                command = "getprop {}\n\r".format(property_value)
-            ret = self.run_command(command)
+            ret = await self.run_command(self.prop_command(property_value))
             if ret.endswith(self._suffix):
                 ret = "".join(ret.rsplit(self._suffix, 1))
             if ret.startswith(self._suffix):
@@ -94,48 +634,64 @@ class TelnetShell(Telnet):
         except Exception:
             return ''
 
-    def set_prop(self, property_value: str, value: str):
+    async def set_prop(self, property_value: str, value: str):
         """ set property """
-        if self._aqara_property:
-            command = "asetprop {} {}\n".format(property_value, value)
-        else:
-            command = "setprop {} {}\n".format(property_value, value)
-        self.write(command.encode() + b"\n")
-        self.read_until(self._suffix.encode(), timeout=3)
-        self.read_until(self._suffix.encode(), timeout=3)
+        command = "{}\n".format(self.setprop_command(property_value, value))
+        if self._sentinel:
+            await self.run_command(command)
+            return
+        started = time.monotonic()
+        async with self._scheduler:
+            self.write(command.encode() + b"\n")
+            await self.read_until(self._suffix.encode(), timeout=3)
+            raw = await self.read_until(self._suffix.encode(), timeout=3)
+        self._record(command, started, not raw.endswith(
+            self._suffix.encode()))
 
-    def get_version(self):
+    async def get_version(self):
         """ get camera version """
-        return self.get_prop("ro.sys.fw_ver")
+        return await self.get_prop("ro.sys.fw_ver")
 
 
-class TelnetShellG3(TelnetShell):
-    """ Telnet Shell """
+class AsyncTelnetShellG3(AsyncTelnetShell):
+    """ Asyncio telnet shell for G3 """
 
-    def __init__(self, host: str, password=None):
+    def __init__(self, host: str, password=None, port=TELNET_PORT,
+                 framing=FRAMING_PROMPT, metrics=None):
         """ init """
-        super().__init__(host, password)
+        super().__init__(host, password, port, framing, metrics)
         self._suffix = "~ # "
         self._aqara_property = True
         self._password = password
 
-    def login(self):
+    async def login(self):
         """ login function """
         self.write(b"\n")
-        self.read_until(b"login: ", timeout=1)
+        await self.read_until(b"login: ", timeout=1)
 
         command = "root"
         self.write(command.encode() + b"\n")
         if self._password:
-            self.read_until(b"Password: ", timeout=1)
+            await self.read_until(b"Password: ", timeout=1)
             self.write(self._password.encode() + b"\n")
-        self.read_until(self._suffix.encode(), timeout=3)
+        await self.read_until(self._suffix.encode(), timeout=3)
+        return await self.start_session()
 
+    async def start_session(self):
+        """ set the shell up once logged in """
         command = "stty -echo"
         self.write(command.encode() + b"\n")
         command = "cd /"
         self.write(command.encode() + b"\n")
         self._suffix = "/ # "
 
-        self.read_until(self._suffix.encode(), timeout=3)
+        await self.read_until(self._suffix.encode(), timeout=3)
+        self._logged_in = True
         return True
+
+
+def shell_class(model: str):
+    """ return the shell class of the dialect a camera model speaks """
+    if "g3" in model:
+        return AsyncTelnetShellG3
+    return AsyncTelnetShell
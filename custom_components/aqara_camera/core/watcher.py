@@ -0,0 +1,100 @@
+""" Aqara Camera rtsp url watcher """
+
+import asyncio
+
+from .const import (
+    RTSP_WATCH_INTERVAL,
+    SYS_RTSP_URL
+)
+
+
+class RtspWatcher():
+    """ Follow the rtsp url of one camera
+
+    The url changes on every camera reboot. One batch per interval reads
+    the url, the uptime and the recording mode; listeners are only called
+    when one of them changed, with url_changed telling whether the stream
+    has to be restarted.
+    """
+
+    def __init__(self, camera, interval=RTSP_WATCH_INTERVAL):
+        """ init """
+        self._camera = camera
+        self._interval = interval
+        self._listeners = []
+        self._task = None
+        self.uptime = None
+        self.recording = None
+        self.reboots = 0
+
+    def async_add_listener(self, update_callback):
+        """ call update_callback(url_changed) on changes
+
+        The watcher runs while it has listeners. Returns a function
+        removing the listener.
+        """
+        self._listeners.append(update_callback)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._async_run())
+
+        def remove_listener():
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+            if not self._listeners:
+                self.stop()
+
+        return remove_listener
+
+    def stop(self):
+        """ stop the watcher """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_run(self):
+        """ check the camera every interval """
+        while True:
+            await asyncio.sleep(self._interval)
+            if not self._camera.connected:
+                continue
+            try:
+                await self.async_check()
+            except Exception as err:  # pylint: disable=broad-except
+                self._camera.debug(f"rtsp watcher got error: {err}")
+
+    async def async_check(self):
+        """ read url, uptime and recording mode in one batch
+
+        Listeners are called when something changed. Returns
+        (url_changed, changed).
+        """
+        camera = self._camera
+        urls, seconds, recording = await camera.async_get_stream_status()
+        old_url = camera.rtsp_url
+        changed = False
+
+        if self.uptime is not None and seconds < self.uptime:
+            # rebooted: every cached value may be stale
+            self._camera.debug("rebooted")
+            self.reboots += 1
+            camera.invalidate_prop()
+            camera.ptz.invalidate_position()
+        self.uptime = seconds
+
+        if urls:
+            camera.set_rtsp_urls(urls)
+        else:
+            # the rtsp server is not up yet, let product info prepare it
+            camera.invalidate_prop(SYS_RTSP_URL)
+            await camera.async_get_product_info()
+
+        if recording != self.recording:
+            self.recording = recording
+            changed = True
+
+        url_changed = camera.rtsp_url != old_url
+        changed = changed or url_changed
+        if changed:
+            for update_callback in list(self._listeners):
+                update_callback(url_changed)
+        return url_changed, changed
@@ -0,0 +1,72 @@
+"""Diagnostics support for Aqara Camera."""
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from homeassistant.components.diagnostics import REDACTED, async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .startup import get_startup_coordinator
+
+TO_REDACT = {
+    CONF_HOST,
+    "rtsp_url",
+    "rtsp_urls",
+    "persist.sys.miio_mac",
+    "persist.sys.miio_did",
+    "persist.sys.did",
+    "sys.camera_rtsp_url",
+}
+# camera properties that identify the device or hold a secret, the dump
+# differs between firmwares so the keys are matched by name
+PROPERTY_TO_REDACT = re.compile(
+    r"(mac|did|token|key|passw|ssid|rtsp_url)", re.IGNORECASE
+)
+
+
+def _redact_properties(snapshot: dict[str, Any]) -> dict[str, Any]:
+    """Redact the identifying camera properties of a snapshot."""
+    properties = {
+        key: REDACTED if PROPERTY_TO_REDACT.search(key) else value
+        for key, value in snapshot.get("properties", {}).items()
+    }
+    return {**snapshot, "properties": properties}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the shell metrics and worker counters of a camera."""
+    camera = hass.data[DOMAIN][entry.entry_id]["camera"]
+    return async_redact_data(
+        {
+            "entry": {"data": dict(entry.data), "options": dict(entry.options)},
+            "connected": camera.connected,
+            "startup": get_startup_coordinator(hass).timings.get(
+                entry.entry_id, {}
+            ),
+            "shell": camera.metrics.as_dict(),
+            "property_cache": camera.cache_stats,
+            "ptz": camera.ptz.stats,
+            "push": {
+                "running": camera.push.running,
+                "events": camera.push.events,
+                "reconnects": camera.push.reconnects,
+            },
+            "rtsp_watcher": {
+                "reboots": camera.watcher.reboots,
+                "uptime": camera.watcher.uptime,
+            },
+            "mqtt": None if camera.mqtt is None else {
+                "connected": camera.mqtt.connected,
+                "messages": camera.mqtt.messages,
+                "commands": camera.mqtt.commands,
+            },
+            "snapshot": _redact_properties(camera.snapshot()),
+        },
+        TO_REDACT,
+    )
@@ -0,0 +1,57 @@
+"""Base entity for Aqara Camera properties."""
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers.entity import EntityDescription
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .coordinator import AqaraCameraCoordinator
+
+
+class AqaraCameraPropertyEntity(CoordinatorEntity[AqaraCameraCoordinator]):
+    """Follow the camera property named by the description key.
+
+    State is only written when this property or the availability
+    changed, so updates of other properties cause no recorder writes.
+    """
+
+    def __init__(
+        self,
+        coordinator: AqaraCameraCoordinator,
+        config_entry: ConfigEntry,
+        description: EntityDescription,
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{config_entry.title} {description.name}"
+        self._attr_unique_id = f"{config_entry.entry_id}_{description.key}"
+        self._attr_device_info = {
+            "identifiers": {
+                (DOMAIN, slugify(f"{config_entry.title}_{config_entry.entry_id}"))
+            },
+        }
+        self._value = coordinator.data.get(description.key)
+        self._written = None
+
+    @property
+    def available(self) -> bool:
+        """Return True while the property can be read."""
+        return super().available and self._value is not None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state if the property changed."""
+        self._value = self.coordinator.data.get(self.entity_description.key)
+        if (self._value, self.available) == self._written:
+            return
+        self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Remember what was written last."""
+        self._written = (self._value, self.available)
+        super().async_write_ha_state()
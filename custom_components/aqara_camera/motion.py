@@ -0,0 +1,306 @@
+"""Host-side motion detection for Aqara Camera."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    MOTION_WIDTH,
+    MOTION_HEIGHT,
+    MOTION_FPS,
+    MOTION_THRESHOLD,
+    MOTION_AREA,
+    MOTION_ALPHA,
+    MOTION_HOLD,
+    MOTION_STALL,
+    MOTION_RETRY
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+FULL_FRAME = (0.0, 0.0, 1.0, 1.0)
+
+
+def parse_zones(text: str) -> list[tuple[float, float, float, float]]:
+    """Parse "left,top,right,bottom;..." zones given as frame fractions.
+
+    Raises ValueError for a malformed zone, an empty text means the
+    whole frame.
+    """
+    zones = []
+    for part in filter(None, (part.strip() for part in text.split(";"))):
+        left, top, right, bottom = (float(value) for value in part.split(","))
+        if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+            raise ValueError(f"Invalid motion zone {part}")
+        zones.append((left, top, right, bottom))
+    return zones
+
+
+class MotionDetector:
+    """Frame differencing against a running average background.
+
+    Every array is allocated once. The caller writes a grayscale frame
+    into frame, process() then only runs in-place ufuncs over it.
+    """
+
+    def __init__(
+        self,
+        width: int = MOTION_WIDTH,
+        height: int = MOTION_HEIGHT,
+        zones: list[tuple[float, float, float, float]] | None = None,
+        threshold: float = MOTION_THRESHOLD,
+        area: float = MOTION_AREA,
+        alpha: float = MOTION_ALPHA,
+    ) -> None:
+        """Initialize the detector."""
+        self.frame = np.zeros((height, width), np.uint8)
+        self._background = np.zeros((height, width), np.float32)
+        self._diff = np.empty((height, width), np.float32)
+        self._magnitude = np.empty((height, width), np.float32)
+        self._mask = np.empty((height, width), np.bool_)
+        self._threshold = threshold
+        self._alpha = alpha
+        self._primed = False
+        self._zones = []
+        for left, top, right, bottom in zones or [FULL_FRAME]:
+            first_row, first_column = int(top * height), int(left * width)
+            rows = slice(first_row, max(int(bottom * height), first_row + 1))
+            columns = slice(
+                first_column, max(int(right * width), first_column + 1)
+            )
+            pixels = (rows.stop - rows.start) * (columns.stop - columns.start)
+            self._zones.append(((rows, columns), max(int(pixels * area), 1)))
+
+    @property
+    def buffer(self) -> memoryview:
+        """Return the frame as a writable byte buffer."""
+        return memoryview(self.frame).cast("B")
+
+    def process(self) -> list[int]:
+        """Return the zones with motion in frame and learn the frame."""
+        if not self._primed:
+            np.copyto(self._background, self.frame)
+            self._primed = True
+            return []
+        np.subtract(self.frame, self._background, out=self._diff)
+        np.abs(self._diff, out=self._magnitude)
+        np.greater(self._magnitude, self._threshold, out=self._mask)
+        np.multiply(self._diff, self._alpha, out=self._diff)
+        np.add(self._background, self._diff, out=self._background)
+        return [
+            index
+            for index, (zone, minimum) in enumerate(self._zones)
+            if np.count_nonzero(self._mask[zone]) >= minimum
+        ]
+
+    def reset(self) -> None:
+        """Learn the background again, e.g. after the view changed."""
+        self._primed = False
+
+
+class _FrameProtocol(asyncio.SubprocessProtocol):
+    """Copy ffmpeg output straight into the frame of a detector."""
+
+    def __init__(self, buffer: memoryview, on_frame: Callable[[], None]):
+        """Initialize the protocol."""
+        self._buffer = buffer
+        self._size = len(buffer)
+        self._filled = 0
+        self._on_frame = on_frame
+        self.exited = asyncio.get_running_loop().create_future()
+
+    def pipe_data_received(self, fd: int, data: bytes) -> None:
+        """Fill the frame and hand over every complete one."""
+        view = memoryview(data)
+        while view:
+            take = min(self._size - self._filled, len(view))
+            self._buffer[self._filled:self._filled + take] = view[:take]
+            self._filled += take
+            view = view[take:]
+            if self._filled == self._size:
+                self._filled = 0
+                self._on_frame()
+
+    def process_exited(self) -> None:
+        """Wake up the engine."""
+        if not self.exited.done():
+            self.exited.set_result(None)
+
+
+class MotionEngine:
+    """Run ffmpeg on the sub stream and report motion per zone.
+
+    ffmpeg scales the stream down to a few grayscale frames per second,
+    so one decoder per camera stays cheap. The engine runs while it has
+    listeners and is enabled, and restarts the decoder when it stalls.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        binary: str,
+        source: Callable[[], str],
+        zones: list[tuple[float, float, float, float]] | None = None,
+        fps: float = MOTION_FPS,
+        hold: float = MOTION_HOLD,
+    ) -> None:
+        """Initialize the engine."""
+        self.hass = hass
+        self._binary = binary
+        self._source = source
+        self._fps = fps
+        self._hold = hold
+        self._detector = MotionDetector(zones=zones)
+        self._listeners: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+        self._last_motion = 0.0
+        self.zones = zones or [FULL_FRAME]
+        self.enabled = True
+        self.motion = False
+        self.active_zones: list[int] = []
+        self.frames = 0
+
+    @property
+    def running(self) -> bool:
+        """Return True while the decoder runs."""
+        return self._task is not None and not self._task.done()
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]):
+        """Call update_callback when motion starts or ends.
+
+        The engine runs while it has listeners. Returns a function
+        removing the listener.
+        """
+        self._listeners.append(update_callback)
+        self._start()
+
+        @callback
+        def remove_listener() -> None:
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+            if not self._listeners:
+                self.stop()
+
+        return remove_listener
+
+    @callback
+    def set_enabled(self, enabled: bool) -> None:
+        """Start or stop detecting, listeners stay registered."""
+        self.enabled = enabled
+        if enabled:
+            self._start()
+        else:
+            self.stop()
+            self.motion = False
+            self.active_zones = []
+        self._notify()
+
+    @callback
+    def restart(self) -> None:
+        """Reconnect the decoder, e.g. after the rtsp url changed."""
+        if self.running:
+            self.stop()
+            self._start()
+
+    def _start(self) -> None:
+        """Start the decoder if it is wanted and not running."""
+        if self._listeners and self.enabled and not self.running:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), "aqara_camera_motion"
+            )
+
+    @callback
+    def stop(self) -> None:
+        """Stop the decoder, its process is killed by the task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_run(self) -> None:
+        """Keep the decoder running, retrying when it fails."""
+        try:
+            while True:
+                try:
+                    await self._async_decode()
+                except OSError as err:
+                    _LOGGER.warning(
+                        "Can't run ffmpeg for motion detection: %s", err
+                    )
+                self._clear_motion()
+                await asyncio.sleep(MOTION_RETRY)
+        finally:
+            self._clear_motion()
+
+    async def _async_decode(self) -> None:
+        """Feed decoded frames to the detector until ffmpeg stops."""
+        detector = self._detector
+        detector.reset()
+        height, width = detector.frame.shape
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.subprocess_exec(
+            lambda: _FrameProtocol(detector.buffer, self._on_frame),
+            self._binary,
+            "-rtsp_transport", "tcp",
+            "-i", self._source(),
+            "-an",
+            "-vf", f"fps={self._fps},scale={width}:{height}",
+            "-pix_fmt", "gray",
+            "-f", "rawvideo",
+            "pipe:",
+            stdin=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            frames = -1
+            while frames != self.frames:
+                frames = self.frames
+                try:
+                    await asyncio.wait_for(
+                        asyncio.shield(protocol.exited), MOTION_STALL
+                    )
+                    break
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                _LOGGER.debug("No frame from %s, restarting", self._source())
+        finally:
+            # kills ffmpeg if it still runs
+            transport.close()
+
+    def _on_frame(self) -> None:
+        """Process a complete frame."""
+        self.frames += 1
+        self._set_motion(self._detector.process())
+
+    def _set_motion(self, zones: list[int]) -> None:
+        """Hold motion after the last change and tell the listeners."""
+        now = time.monotonic()
+        if zones:
+            self._last_motion = now
+            zones = sorted(set(self.active_zones).union(zones))
+            if self.motion and zones == self.active_zones:
+                return
+            self.motion = True
+            self.active_zones = zones
+            self._notify()
+        elif self.motion and now - self._last_motion >= self._hold:
+            self._clear_motion()
+
+    def _clear_motion(self) -> None:
+        """End the motion event, e.g. when the decoder stops."""
+        if self.motion:
+            self.motion = False
+            self.active_zones = []
+            self._notify()
+
+    def _notify(self) -> None:
+        """Tell the listeners the motion state changed."""
+        for update_callback in list(self._listeners):
+            update_callback()
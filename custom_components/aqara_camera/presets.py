@@ -0,0 +1,133 @@
+"""Named PTZ presets and patrols for Aqara Camera."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, STORAGE_VERSION
+from .core.aqara_camera import AqaraCamera
+from .core.exceptions import UnknownPreset
+
+_LOGGER = logging.getLogger(__name__)
+
+SAVE_DELAY = 10
+# seconds to wait after a failed patrol move, doubled on every failure
+PATROL_RETRY = 10
+PATROL_MAX_FAILURES = 5
+
+
+def _preset_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the preset storage of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.presets.{entry_id}")
+
+
+async def async_remove_presets(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the presets of a removed camera."""
+    await _preset_store(hass, entry_id).async_remove()
+
+
+class PresetManager:
+    """Store the PTZ presets of one camera and run its patrol."""
+
+    def __init__(
+        self, hass: HomeAssistant, camera: AqaraCamera, entry_id: str
+    ) -> None:
+        """Initialize the presets."""
+        self.hass = hass
+        self._camera = camera
+        self._store = _preset_store(hass, entry_id)
+        self._presets: dict[str, dict[str, float]] = {}
+        self._patrol: asyncio.Task | None = None
+
+    @property
+    def names(self) -> list[str]:
+        """Return the preset names."""
+        return list(self._presets)
+
+    @property
+    def patrolling(self) -> bool:
+        """Return True while a patrol runs."""
+        return self._patrol is not None and not self._patrol.done()
+
+    async def async_load(self) -> None:
+        """Load the presets from storage."""
+        self._presets = await self._store.async_load() or {}
+
+    async def async_save_preset(self, name: str) -> None:
+        """Store the current motor position under name."""
+        self._presets[name] = await self._camera.ptz.async_get_position()
+        self._store.async_delay_save(lambda: self._presets, SAVE_DELAY)
+
+    @callback
+    def async_remove_preset(self, name: str) -> None:
+        """Forget a preset."""
+        if self._presets.pop(name, None) is None:
+            raise UnknownPreset(f"Unknown preset {name}")
+        self._store.async_delay_save(lambda: self._presets, SAVE_DELAY)
+
+    async def async_goto_preset(self, name: str) -> None:
+        """Move to a preset."""
+        preset = self._get(name)
+        await self._camera.async_ptz_control_preset(**preset)
+
+    @callback
+    def async_start_patrol(
+        self, names: list[str], dwell: float, cycles: int = 0
+    ) -> None:
+        """Walk the presets in order, cycles times or forever with 0."""
+        hops = [self._get(name) for name in names]
+        self.async_stop_patrol()
+        self._patrol = self.hass.async_create_background_task(
+            self._async_patrol(hops, dwell, cycles),
+            f"{DOMAIN}_patrol",
+        )
+
+    @callback
+    def async_stop_patrol(self) -> None:
+        """Stop the running patrol."""
+        if self._patrol is not None:
+            self._patrol.cancel()
+            self._patrol = None
+
+    def _get(self, name: str) -> dict[str, float]:
+        """Return a preset or raise."""
+        if (preset := self._presets.get(name)) is None:
+            raise UnknownPreset(f"Unknown preset {name}")
+        return preset
+
+    async def _async_patrol(
+        self, hops: list[dict[str, Any]], dwell: float, cycles: int
+    ) -> None:
+        """Patrol between presets.
+
+        Every hop is a full absolute move, so the PTZ worker never has to
+        read the motor position on the way. A failed move is retried after
+        a growing pause; the patrol stops after PATROL_MAX_FAILURES failed
+        moves in a row, e.g. when the camera has no mi_motor.
+        """
+        if not hops:
+            # nothing would ever await, the loop would hog the event loop
+            return
+        cycle = 0
+        failures = 0
+        while not cycles or cycle < cycles:
+            for hop in hops:
+                if await self._camera.async_ptz_control_preset(**hop):
+                    failures = 0
+                    await asyncio.sleep(dwell)
+                    continue
+                failures += 1
+                if failures >= PATROL_MAX_FAILURES:
+                    _LOGGER.warning(
+                        "Stopping the patrol, %s PTZ moves failed in a row",
+                        failures,
+                    )
+                    return
+                await asyncio.sleep(
+                    max(dwell, PATROL_RETRY * 2 ** (failures - 1))
+                )
+            cycle += 1
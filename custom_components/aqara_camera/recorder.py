@@ -0,0 +1,226 @@
+"""Pre-event ring buffer recording for Aqara Camera."""
+from __future__ import annotations
+
+import asyncio
+import glob
+import logging
+import os
+import shutil
+import time
+from collections.abc import Callable
+from contextlib import suppress
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    RECORDER_SEGMENT,
+    RECORDER_PRE_ROLL,
+    RECORDER_POST_ROLL,
+    RECORDER_RETRY
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = "segment%03d.ts"
+SEGMENT_GLOB = "segment*.ts"
+
+
+class RingRecorder:
+    """Keep the last minutes of a stream as remuxed segments on disk.
+
+    ffmpeg copies the stream without re-encoding into fixed-length
+    MPEG-TS segments and starts over at the first one after a fixed
+    count, so disk use does not grow with uptime and a segment is only
+    ever appended to. Clips are cut from whole segments with the concat
+    demuxer, again without re-encoding.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        binary: str,
+        source: Callable[[], str],
+        directory: str,
+        segment: float = RECORDER_SEGMENT,
+    ) -> None:
+        """Initialize the recorder."""
+        self.hass = hass
+        self._binary = binary
+        self._source = source
+        self._directory = directory
+        self._segment = segment
+        # a clip with the longest pre- and post-roll, the segment being
+        # written and one that may be cut short at a keyframe
+        self._segments = (
+            int((RECORDER_PRE_ROLL + RECORDER_POST_ROLL) / segment) + 3
+        )
+        self._task: asyncio.Task | None = None
+        self._started = 0.0
+        self._exports = 0
+
+    @property
+    def running(self) -> bool:
+        """Return True while ffmpeg records."""
+        return self._task is not None and not self._task.done()
+
+    @callback
+    def start(self) -> None:
+        """Start recording into the ring."""
+        if not self.running:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), "aqara_camera_recorder"
+            )
+
+    @callback
+    def restart(self) -> None:
+        """Record from the current source, e.g. after the url changed."""
+        if self.running:
+            self.stop()
+            self.start()
+
+    @callback
+    def stop(self) -> None:
+        """Stop recording, the segments stay until the next start."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def async_stop(self) -> None:
+        """Stop recording and remove the segments."""
+        task = self._task
+        self.stop()
+        if task is not None:
+            # ffmpeg has to be gone before its folder is
+            with suppress(asyncio.CancelledError):
+                await task
+        await self.hass.async_add_executor_job(
+            shutil.rmtree, self._directory, True
+        )
+
+    async def _async_run(self) -> None:
+        """Keep ffmpeg recording, retrying when it fails.
+
+        The ring is only cleared once, a retry keeps what was recorded
+        before ffmpeg failed.
+        """
+        await self.hass.async_add_executor_job(self._prepare_directory)
+        self._started = time.time()
+        while True:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self._binary,
+                    "-rtsp_transport", "tcp",
+                    "-i", self._source(),
+                    "-map", "0",
+                    "-c", "copy",
+                    "-f", "segment",
+                    "-segment_time", str(self._segment),
+                    "-segment_wrap", str(self._segments),
+                    "-segment_format", "mpegts",
+                    "-reset_timestamps", "1",
+                    os.path.join(self._directory, SEGMENT_PATTERN),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except OSError as err:
+                _LOGGER.warning("Can't run ffmpeg for recording: %s", err)
+            else:
+                try:
+                    await process.wait()
+                finally:
+                    if process.returncode is None:
+                        process.kill()
+                        await process.wait()
+                _LOGGER.debug(
+                    "Recording %s stopped with %s",
+                    self._source(),
+                    process.returncode,
+                )
+            await asyncio.sleep(RECORDER_RETRY)
+
+    def _prepare_directory(self) -> None:
+        """Drop segments of an earlier run, their times are unknown."""
+        os.makedirs(self._directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self._directory, SEGMENT_GLOB)):
+            os.remove(path)
+
+    async def async_export(
+        self, filename: str, before: float, after: float
+    ) -> None:
+        """Write the stream from before seconds ago to after from now."""
+        if not self.running:
+            raise HomeAssistantError("The ring recorder is not running")
+        trigger = time.time()
+        # the segment holding the end of the clip has to be closed
+        await asyncio.sleep(after + self._segment)
+        segments = [
+            path
+            for path, start, end in await self.hass.async_add_executor_job(
+                self._closed_segments
+            )
+            if end > trigger - before and start < trigger + after
+        ]
+        if not segments:
+            raise HomeAssistantError("Nothing recorded for this clip yet")
+
+        self._exports += 1
+        playlist = os.path.join(self._directory, f"export{self._exports}.txt")
+        await self.hass.async_add_executor_job(
+            _write_playlist, playlist, segments, filename
+        )
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self._binary,
+                "-y",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", playlist,
+                "-map", "0",
+                "-c", "copy",
+                "-bsf:a", "aac_adtstoasc",
+                filename,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            _, error = await process.communicate()
+        finally:
+            await self.hass.async_add_executor_job(os.remove, playlist)
+        if process.returncode != 0:
+            lines = error.decode(errors="replace").strip().splitlines()
+            raise HomeAssistantError(
+                f"Can't export clip to {filename}: {lines[-1] if lines else ''}"
+            )
+
+    def _closed_segments(self) -> list[tuple[str, float, float]]:
+        """Return (path, start, end) of the finished segments by time.
+
+        A segment ends at its modification time and starts where the one
+        before it ended. The newest one is still being written.
+        """
+        segments = []
+        for path in glob.glob(os.path.join(self._directory, SEGMENT_GLOB)):
+            try:
+                end = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if end >= self._started:
+                segments.append((end, path))
+        segments.sort()
+        result = []
+        start = segments[0][0] - self._segment if segments else 0.0
+        for end, path in segments[:-1]:
+            result.append((path, start, end))
+            start = end
+        return result
+
+
+def _write_playlist(playlist: str, segments: list[str], filename: str):
+    """Write a concat demuxer playlist and the folder of the clip."""
+    with open(playlist, "w", encoding="utf-8") as file:
+        file.writelines(
+            "file '{}'\n".format(path.replace("'", "'\\''")) for path in segments
+        )
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
@@ -0,0 +1,132 @@
+"""Property and diagnostic sensors for Aqara Camera."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .core.aqara_camera import AqaraCamera
+from .core.const import PERSIST_REC_MODE
+from .entity import AqaraCameraPropertyEntity
+
+
+@dataclass(frozen=True, kw_only=True)
+class AqaraCameraSensorDescription(SensorEntityDescription):
+    """Describe an Aqara Camera diagnostic sensor."""
+
+    value_fn: Callable[[AqaraCamera], float | int]
+
+
+SENSORS: tuple[AqaraCameraSensorDescription, ...] = (
+    AqaraCameraSensorDescription(
+        key="shell_latency",
+        name="Shell latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda camera: camera.metrics.total.percentile(95) * 1000,
+    ),
+    AqaraCameraSensorDescription(
+        key="shell_timeouts",
+        name="Shell timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda camera: camera.metrics.total.timeouts,
+    ),
+    AqaraCameraSensorDescription(
+        key="shell_bytes_read",
+        name="Shell bytes read",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda camera: camera.metrics.bytes_read,
+    ),
+    AqaraCameraSensorDescription(
+        key="reconnects",
+        name="Reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda camera: camera.metrics.reconnects,
+    ),
+)
+
+
+PROPERTY_SENSORS: tuple[SensorEntityDescription, ...] = (
+    SensorEntityDescription(
+        key="ro.sys.fw_ver",
+        name="Firmware",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorEntityDescription(
+        key=PERSIST_REC_MODE,
+        name="Recording mode",
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Add the property and diagnostic sensors of a camera."""
+    data = hass.data[DOMAIN][config_entry.entry_id]
+    async_add_entities(
+        AqaraCameraSensor(data["camera"], config_entry, description)
+        for description in SENSORS
+    )
+    async_add_entities(
+        AqaraCameraPropertySensor(data["coordinator"], config_entry, description)
+        for description in PROPERTY_SENSORS
+    )
+
+
+class AqaraCameraSensor(SensorEntity):
+    """Report one of the shell metrics of a camera.
+
+    The values are read from memory on every poll, nothing is sent to
+    the camera.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    entity_description: AqaraCameraSensorDescription
+
+    def __init__(
+        self,
+        camera: AqaraCamera,
+        config_entry: ConfigEntry,
+        description: AqaraCameraSensorDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        self._camera = camera
+        self.entity_description = description
+        self._attr_name = f"{config_entry.title} {description.name}"
+        self._attr_unique_id = f"{config_entry.entry_id}_{description.key}"
+        self._attr_device_info = {
+            "identifiers": {
+                (DOMAIN, slugify(f"{config_entry.title}_{config_entry.entry_id}"))
+            },
+        }
+
+    @property
+    def native_value(self) -> float | int:
+        """Return the current value."""
+        return self.entity_description.value_fn(self._camera)
+
+
+class AqaraCameraPropertySensor(AqaraCameraPropertyEntity, SensorEntity):
+    """Show a camera property as it is."""
+
+    @property
+    def native_value(self) -> str | None:
+        """Return the property value."""
+        return self._value
@@ -0,0 +1,217 @@
+"""Still image support for Aqara Camera."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from homeassistant.components.camera import Image
+from homeassistant.components.camera.img_util import scale_jpeg_camera_image
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    SNAPSHOT_CACHE_TTL,
+    WARM_SNAPSHOT_FPS,
+    WARM_SNAPSHOT_IDLE,
+    WARM_SNAPSHOT_FIRST_FRAME,
+    WARM_SNAPSHOT_RESIZED
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+
+
+class WarmSnapshotEngine:
+    """Keep one ffmpeg decoder running and serve its latest JPEG frame.
+
+    The decoder starts on the first request and stops by itself once no
+    image was asked for during the idle period.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        binary: str,
+        source: Callable[[], str],
+        idle_timeout: float = WARM_SNAPSHOT_IDLE,
+    ) -> None:
+        """Initialize the engine."""
+        self.hass = hass
+        self._binary = binary
+        self._source = source
+        self._idle_timeout = idle_timeout
+        self._task: asyncio.Task | None = None
+        self._frame: bytes | None = None
+        self._frame_id = 0
+        self._new_frame = asyncio.Event()
+        self._last_request = 0.0
+        self._resized: OrderedDict[tuple, bytes] = OrderedDict()
+
+    @property
+    def running(self) -> bool:
+        """Return True while the decoder runs."""
+        return self._task is not None and not self._task.done()
+
+    async def async_get_image(
+        self, width: int | None = None, height: int | None = None
+    ) -> bytes | None:
+        """Return the latest frame, scaled to fit width and height."""
+        self._last_request = time.monotonic()
+        if not self.running:
+            self._frame = None
+            self._new_frame.clear()
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), "aqara_camera_warm_snapshot"
+            )
+        if self._frame is None:
+            try:
+                await asyncio.wait_for(
+                    self._new_frame.wait(), WARM_SNAPSHOT_FIRST_FRAME
+                )
+            except asyncio.TimeoutError:
+                return None
+        frame, frame_id = self._frame, self._frame_id
+        if not width and not height:
+            return frame
+
+        key = (frame_id, width, height)
+        if (image := self._resized.get(key)) is not None:
+            self._resized.move_to_end(key)
+            return image
+        image = await self.hass.async_add_executor_job(
+            scale_jpeg_camera_image,
+            Image("image/jpeg", frame),
+            width,
+            height,
+        )
+        self._resized[key] = image
+        while len(self._resized) > WARM_SNAPSHOT_RESIZED:
+            self._resized.popitem(last=False)
+        return image
+
+    async def async_stop(self) -> None:
+        """Stop the decoder."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _async_run(self) -> None:
+        """Decode the stream into JPEG frames until idle."""
+        process = await asyncio.create_subprocess_exec(
+            self._binary,
+            "-rtsp_transport", "tcp",
+            "-i", self._source(),
+            "-an",
+            "-vf", f"fps={WARM_SNAPSHOT_FPS}",
+            "-f", "image2pipe",
+            "-c:v", "mjpeg",
+            "-q:v", "4",
+            "pipe:",
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        buffer = b""
+        try:
+            while time.monotonic() - self._last_request < self._idle_timeout:
+                chunk = await asyncio.wait_for(
+                    process.stdout.read(65536), WARM_SNAPSHOT_FIRST_FRAME
+                )
+                if not chunk:
+                    break
+                buffer += chunk
+                while (end := buffer.find(JPEG_EOI)) >= 0:
+                    start = buffer.find(JPEG_SOI, 0, end)
+                    if start >= 0:
+                        self._frame = buffer[start:end + 2]
+                        self._frame_id += 1
+                        self._new_frame.set()
+                    buffer = buffer[end + 2:]
+        except asyncio.TimeoutError:
+            _LOGGER.debug("No frame from %s, stopping decoder", self._source())
+        finally:
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            self._resized.clear()
+
+
+class SnapshotCache:
+    """Share one image fetch between concurrent callers of a camera.
+
+    Callers asking for the same size while a fetch runs await its result,
+    results are served again for a short time, and fetches of different
+    sizes run one after the other so a camera never has more than one
+    ffmpeg process.
+    """
+
+    def __init__(self, ttl: float = SNAPSHOT_CACHE_TTL) -> None:
+        """Initialize the cache."""
+        self._ttl = ttl
+        self._lock = asyncio.Lock()
+        self._pending: dict[tuple, asyncio.Future] = {}
+        self._images: dict[tuple, tuple[float, bytes | None]] = {}
+        self.requests = 0
+        self.hits = 0
+        self.coalesced = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters."""
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+        }
+
+    async def async_get(
+        self,
+        width: int | None,
+        height: int | None,
+        fetch: Callable[[], Awaitable[bytes | None]],
+    ) -> bytes | None:
+        """Return a cached image or fetch it once for all callers."""
+        self.requests += 1
+        key = (width, height)
+        cached = self._images.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._ttl:
+            self.hits += 1
+            return cached[1]
+
+        if (pending := self._pending.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            # the fetch is a task of its own, so a caller that is
+            # cancelled does not leave the others waiting
+            pending = self._pending[key] = asyncio.create_task(
+                self._async_fetch(key, fetch)
+            )
+            pending.add_done_callback(_retrieve_exception)
+        return await asyncio.shield(pending)
+
+    async def _async_fetch(
+        self, key: tuple, fetch: Callable[[], Awaitable[bytes | None]]
+    ) -> bytes | None:
+        """Fetch one image for every caller waiting for it."""
+        try:
+            async with self._lock:
+                image = await fetch()
+            if image is not None:
+                self._images[key] = (time.monotonic(), image)
+            return image
+        finally:
+            del self._pending[key]
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    """Mark a failed fetch as seen, the callers get the error themselves."""
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,59 @@
+"""Bounded concurrent setup of Aqara cameras."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_STARTUP, DEFAULT_SETUP_CONCURRENCY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_startup_coordinator(hass: HomeAssistant) -> StartupCoordinator:
+    """Return the startup coordinator shared by all config entries."""
+    startup = hass.data.get(DATA_STARTUP)
+    if startup is None:
+        startup = hass.data[DATA_STARTUP] = StartupCoordinator()
+    return startup
+
+
+class StartupCoordinator:
+    """Limit how many cameras log in at once and time each setup phase.
+
+    Home Assistant sets up all config entries concurrently, so startup is
+    bounded by the slowest camera as long as the critical path per camera
+    is short; this keeps a large fleet from opening every telnet session
+    at the same instant.
+    """
+
+    def __init__(self, limit: int = DEFAULT_SETUP_CONCURRENCY) -> None:
+        """Initialize the coordinator."""
+        self._semaphore = asyncio.Semaphore(limit)
+        self.timings: dict[str, dict[str, float]] = {}
+
+    @asynccontextmanager
+    async def async_slot(self, entry_id: str):
+        """Wait for a free setup slot and time the whole setup."""
+        started = time.monotonic()
+        async with self._semaphore:
+            self.record(entry_id, "queued", time.monotonic() - started)
+            with self.timed(entry_id, "setup"):
+                yield
+
+    @contextmanager
+    def timed(self, entry_id: str, phase: str):
+        """Record how long a setup phase takes."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(entry_id, phase, time.monotonic() - started)
+
+    def record(self, entry_id: str, phase: str, seconds: float) -> None:
+        """Store the duration of a setup phase."""
+        self.timings.setdefault(entry_id, {})[phase] = round(seconds, 3)
+        _LOGGER.debug("Camera %s %s took %.3fs", entry_id, phase, seconds)
@@ -0,0 +1,49 @@
+"""Persistent device snapshots for Aqara Camera."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_DEVICE_CACHE, STORAGE_KEY, STORAGE_VERSION
+
+SAVE_DELAY = 10
+
+
+def get_device_cache(hass: HomeAssistant) -> DeviceCache:
+    """Return the device cache loaded in async_setup."""
+    return hass.data[DATA_DEVICE_CACHE]
+
+
+class DeviceCache:
+    """Last known device snapshot of every camera, keyed by host.
+
+    A snapshot is only valid for the firmware it was taken on, see
+    AqaraCamera.snapshot for its content.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        """Load the snapshots from storage."""
+        self._data = await self._store.async_load() or {}
+
+    def get(self, host: str) -> dict[str, Any] | None:
+        """Return the snapshot of a camera."""
+        return self._data.get(host)
+
+    @callback
+    def async_save(self, host: str, snapshot: dict[str, Any]) -> None:
+        """Store the snapshot of a camera."""
+        self._data[host] = snapshot
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    @callback
+    def async_remove(self, host: str) -> None:
+        """Forget the snapshot of a camera."""
+        if self._data.pop(host, None) is not None:
+            self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
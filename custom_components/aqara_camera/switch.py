@@ -0,0 +1,69 @@
+"""AI detection switches for Aqara Camera."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.switch import (
+    SwitchEntity,
+    SwitchEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+from .coordinator import AqaraCameraCoordinator
+from .entity import AqaraCameraPropertyEntity
+
+AI_PROPERTY = "camera_ai_"
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Add a switch for every on/off AI property the camera has."""
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    async_add_entities(
+        AqaraCameraAiSwitch(
+            coordinator,
+            config_entry,
+            SwitchEntityDescription(
+                key=key,
+                name="AI {}".format(
+                    key.split(AI_PROPERTY, 1)[1].replace("_", " ")
+                ),
+                entity_category=EntityCategory.CONFIG,
+            ),
+        )
+        for key, value in coordinator.data.items()
+        if AI_PROPERTY in key and value in ("0", "1")
+    )
+
+
+class AqaraCameraAiSwitch(AqaraCameraPropertyEntity, SwitchEntity):
+    """Turn one AI detection of the camera on or off."""
+
+    coordinator: AqaraCameraCoordinator
+
+    @property
+    def is_on(self) -> bool:
+        """Return True while the detection is on."""
+        return self._value == "1"
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Turn the detection on."""
+        await self._async_set("1")
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Turn the detection off."""
+        await self._async_set("0")
+
+    async def _async_set(self, value: str) -> None:
+        """Set the property and show it without waiting for the next dump."""
+        camera = self.coordinator.camera
+        await camera.async_set_prop(self.entity_description.key, value)
+        camera.update_props({self.entity_description.key: value})
+        self.coordinator.async_push_update({self.entity_description.key: value})
@@ -0,0 +1,18 @@
+"""Shared setup for the Aqara Camera tests.
+
+The core package does not need Home Assistant, so it is imported on its
+own from the component folder.
+"""
+import os
+import sys
+
+COMPONENT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "custom_components",
+    "aqara_camera",
+)
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+for path in (COMPONENT, TESTS):
+    if path not in sys.path:
+        sys.path.insert(0, path)
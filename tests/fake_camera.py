@@ -0,0 +1,205 @@
+"""Fake Aqara camera telnetd for the tests and benchmarks.
+
+It behaves like the busybox shell behind a pty: input lines run one at
+a time, a carriage return ends a line like a newline does, every line
+(empty ones too) is answered with a prompt, and ctrl-c kills the
+running command and drops the input not read yet.
+
+The G3 logs root in to "~ # " and switches to "/ # " on "cd /". The
+generic dialect of the other models logs admin in to "# " and echoes
+input as typed.
+"""
+import asyncio
+import json
+import time
+
+from core.provision import MI_MOTOR
+
+G3_PROPERTIES = {
+    "ro.sys.manufacturer": "Aqara",
+    "ro.sys.product": "CH-H03",
+    "ro.sys.name": "Camera Hub G3",
+    "ro.sys.fw_ver": "3.3.4_0007.0004",
+    "persist.sys.model": "lumi.camera.gwpagl01",
+    "persist.sys.miio_mac": "54:ef:44:aa:bb:cc",
+    "persist.app.camera_rec_mode": "0",
+    "persist.app.camera_ai_face": "1",
+    "sys.camera_ptz_moving": "false",
+    "sys.camera_rtsp_url": json.dumps({
+        "1296p": "rtsp://192.168.1.20:8554/1296p",
+        "720p": "rtsp://192.168.1.20:8554/720p",
+        "360p": "rtsp://192.168.1.20:8554/360p",
+    }),
+}
+
+
+class FakeCamera:
+    """Serve the G3 shell dialect on a local port.
+
+    latency delays every answer, like a slow Wi-Fi link would.
+    """
+
+    def __init__(self, properties=None, latency=0.0, generic=False):
+        """Initialize the camera."""
+        self.generic = generic
+        self.properties = dict(G3_PROPERTIES if properties is None
+                               else properties)
+        self.motor = {"angle_x": 0, "angle_y": 0,
+                      "span_x": 10000, "span_y": 10000}
+        self.latency = latency
+        self.commands = []
+        self.logins = 0
+        self.port = None
+        self._server = None
+        self._sessions = set()
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start listening and return the port."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        """Stop listening and hang up on the open sessions."""
+        self._server.close()
+        for task in self._sessions:
+            task.cancel()
+        await asyncio.gather(*self._sessions, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        """Run one telnet session."""
+        task = asyncio.current_task()
+        self._sessions.add(task)
+        session = _Session(self, writer)
+        writer.write(b"\xff\xfb\x01\xff\xfb\x03\r\nCamera-Hub-G3 login: ")
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                session.feed(data)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._sessions.discard(task)
+            session.close()
+            writer.close()
+
+
+class _Session:
+    """One pty session of the fake camera."""
+
+    def __init__(self, camera, writer):
+        """Initialize the session."""
+        self._camera = camera
+        self._writer = writer
+        self._prompt = None
+        self._echo = True
+        self._buffer = b""
+        self._lines = []
+        self._wakeup = asyncio.Event()
+        self._current = None
+        self._task = asyncio.create_task(self._run())
+
+    def feed(self, data):
+        """Take input as the pty line discipline does."""
+        # telnet negotiation answers
+        while b"\xff" in data:
+            pos = data.index(b"\xff")
+            data = data[:pos] + data[pos + 3:]
+        if b"\x03" in data:
+            data = data[data.rindex(b"\x03") + 1:]
+            self._lines.clear()
+            self._buffer = b""
+            if self._current is not None:
+                self._current.cancel()
+        self._buffer += data.replace(b"\r", b"\n")
+        *lines, self._buffer = self._buffer.split(b"\n")
+        self._lines.extend(line.decode(errors="replace") for line in lines)
+        self._wakeup.set()
+
+    def close(self):
+        """End the session."""
+        self._task.cancel()
+
+    def _write(self, text):
+        """Write to the client."""
+        if not self._writer.is_closing():
+            self._writer.write(text.encode())
+
+    async def _run(self):
+        """Run the input lines one after the other."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._lines:
+                line = self._lines.pop(0)
+                self._current = asyncio.ensure_future(self._line(line))
+                try:
+                    await self._current
+                except asyncio.CancelledError:
+                    if self._task.cancelling():
+                        raise
+                    self._write("^C\r\n" + (self._prompt or ""))
+                self._current = None
+
+    async def _line(self, line):
+        """Answer one input line."""
+        if self._camera.latency:
+            await asyncio.sleep(self._camera.latency)
+        if self._prompt is None:
+            if line == ("admin" if self._camera.generic else "root"):
+                self._camera.logins += 1
+                self._prompt = "# " if self._camera.generic else "~ # "
+                self._write("\r\n" + self._prompt)
+            else:
+                self._write("\r\nCamera-Hub-G3 login: ")
+            return
+        if self._echo:
+            self._write(line + ("\n" if self._camera.generic else "\r\n"))
+        output = ""
+        for part in line.split(";"):
+            output += await self._command(part.strip())
+        self._write(output + self._prompt)
+
+    async def _command(self, command):
+        """Run one command and return its output."""
+        camera = self._camera
+        if command:
+            camera.commands.append(command)
+        args = command.split()
+        if not args:
+            return ""
+        if command == "stty -echo":
+            self._echo = False
+        elif command == "cd /" and not self._camera.generic:
+            self._prompt = "/ # "
+        elif args[0] == "sleep":
+            await asyncio.sleep(float(args[1]))
+        elif args[0] in ("agetprop", "getprop"):
+            if len(args) == 1:
+                return "".join(
+                    "[{}]: [{}]\r\n".format(key, value)
+                    for key, value in camera.properties.items())
+            return camera.properties.get(args[1], "") + "\r\n"
+        elif args[0] in ("asetprop", "setprop"):
+            camera.properties[args[1]] = command.split(None, 2)[2]
+        elif args[0] == "echo":
+            return command[5:].replace("$?", "0").strip('"') + "\r\n"
+        elif args[0] == "md5sum" and args[1] == MI_MOTOR.path:
+            return "{}  {}\r\n".format(MI_MOTOR.md5, MI_MOTOR.path)
+        elif command == "/data/bin/mi_motor -g":
+            return json.dumps(camera.motor) + "\r\n"
+        elif args[0] == "/data/bin/mi_motor":
+            camera.motor["angle_x"] = float(args[2])
+            camera.motor["angle_y"] = float(args[4])
+        elif command == "cat /proc/uptime":
+            return "{:.2f} 100.00\r\n".format(time.monotonic())
+        elif args[0] == "ls":
+            if args[-1] == "/data/bin/mi_motor":
+                return "-rwxr-xr-x 1 root root 1 /data/bin/mi_motor\r\n"
+            return "ls: {}: No such file or directory\r\n".format(args[-1])
+        elif command == "ps":
+            return "  101 root      1012 S    rtsp -a\r\n"
+        return ""
@@ -0,0 +1,163 @@
+"""Replay recorded camera telnet sessions for the tests and benchmarks.
+
+A session is what AsyncTelnetShell.recorder saw: ("send", bytes) and
+("recv", bytes) in order. ReplayCamera plays the camera side back to a
+shell running the same scenario, checking that the shell sends what it
+sent when recorded. The random tokens of the sentinel markers differ
+from run to run, so they are matched by shape and the recorded answers
+are rewritten with the live ones.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+
+from core.parser import PropertyParser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "fixtures")
+
+# the random part of __BEGIN_<token>__ and __END_<token>_<index>__
+_TOKEN = re.compile(rb"(?<=__BEGIN_)[0-9a-f]{8}|(?<=__END_)[0-9a-f]{8}")
+
+
+def load_session(name):
+    """Return a recorded session fixture by file name."""
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        fixture = json.load(file)
+    fixture["session"] = [
+        (direction, data.encode("latin-1"))
+        for direction, data in fixture["session"]
+    ]
+    return fixture
+
+
+def save_session(path, session, **fields):
+    """Write a recorded session and the fields describing it."""
+    fixture = dict(fields)
+    fixture["session"] = [
+        (direction, data.decode("latin-1")) for direction, data in session
+    ]
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(fixture, file, indent=1)
+        file.write("\n")
+
+
+class SessionRecorder:
+    """Collect what a shell sends and receives, for shell.recorder."""
+
+    def __init__(self):
+        """Initialize the recorder."""
+        self.session = []
+
+    def __call__(self, direction, data):
+        """Record a chunk, merging it with the chunk before if a send."""
+        if (direction == "send" and self.session and
+                self.session[-1][0] == "send"):
+            self.session[-1] = ("send", self.session[-1][1] + data)
+        else:
+            self.session.append((direction, bytes(data)))
+
+
+async def async_run_scenario(shell):
+    """Run the commands the fixtures are recorded with.
+
+    Return what the shell made of the answers, the fixture keeps it to
+    compare replays against.
+    """
+    await shell.login()
+    parser = PropertyParser()
+    complete = await shell.get_all_props(parser.feed)
+    url = await shell.get_prop("sys.camera_rtsp_url")
+    motor = await shell.run_command("/data/bin/mi_motor -g")
+    post_init = await shell.file_exist("/data/scripts/post_init.sh")
+    return {
+        "complete": complete,
+        "properties": parser.close(),
+        "rtsp_url": url,
+        "motor": motor,
+        "post_init": post_init,
+    }
+
+
+class ReplayCamera:
+    """Serve a recorded session to every connection.
+
+    latency and a random jitter of up to jitter seconds delay every
+    recorded answer; with split, an answer is cut into random pieces of
+    at most split bytes, each delayed, as a slow link would deliver it.
+    """
+
+    def __init__(self, session, latency=0.0, jitter=0.0, split=None,
+                 seed=0):
+        """Initialize the camera."""
+        self.latency = latency
+        self.jitter = jitter
+        self.split = split
+        self.mismatches = []
+        self.port = None
+        self._random = random.Random(seed)
+        self._session = list(session)
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start listening and return the port."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        """Stop listening."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        """Replay the session on one connection."""
+        tokens = {}
+        received = b""
+        try:
+            for direction, data in self._session:
+                if direction == "recv":
+                    await self._answer(writer, _TOKEN.sub(
+                        lambda match: tokens.get(match[0], match[0]), data))
+                    continue
+                while len(received) < len(data):
+                    chunk = await reader.read(4096)
+                    if not chunk:
+                        return
+                    received += _strip_iac(chunk)
+                sent, received = received[:len(data)], received[len(data):]
+                if _TOKEN.sub(b"", sent) != _TOKEN.sub(b"", data):
+                    self.mismatches.append((data, sent))
+                    return
+                tokens.update(zip(_TOKEN.findall(data),
+                                  _TOKEN.findall(sent)))
+            # the session is over, wait for the shell to hang up
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, writer, data):
+        """Write a recorded answer, late and in pieces if asked to."""
+        while data:
+            size = len(data)
+            if self.split:
+                size = self._random.randint(1, self.split)
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(data[:size])
+            await writer.drain()
+            data = data[size:]
+
+
+def _strip_iac(data):
+    """Drop the telnet negotiation answers of the shell."""
+    while b"\xff" in data:
+        pos = data.index(b"\xff")
+        data = data[:pos] + data[pos + 3:]
+    return data
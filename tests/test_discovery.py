@@ -0,0 +1,98 @@
+"""Tests of the LAN discovery dialect detection."""
+import asyncio
+
+from core.const import MODEL_G3, MODEL_GENERIC
+from core.discovery import DiscoveredCamera, async_discover, async_probe
+from fake_camera import G3_PROPERTIES, FakeCamera
+
+TIMEOUT = 0.3
+
+
+async def _async_telnetd(banner, answer=None):
+    """Start a telnetd printing banner, then answer to every line."""
+
+    async def handle(reader, writer):
+        writer.write(banner)
+        try:
+            while await reader.readline():
+                if answer is not None:
+                    writer.write(answer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def _probe_fake(generic):
+    """Probe a fake camera of one dialect."""
+
+    async def run():
+        camera = FakeCamera(generic=generic)
+        port = await camera.start()
+        try:
+            return await async_probe("127.0.0.1", port, TIMEOUT), camera
+        finally:
+            await camera.stop()
+
+    return asyncio.run(run())
+
+
+def test_g3():
+    """root gets "~ # " from the G3."""
+    found, camera = _probe_fake(False)
+    assert found == DiscoveredCamera(
+        "127.0.0.1", MODEL_G3, G3_PROPERTIES["ro.sys.product"],
+        G3_PROPERTIES["persist.sys.miio_mac"])
+    # the properties are read on the fingerprint login
+    assert camera.logins == 1
+
+
+def test_generic():
+    """The other models refuse root and give admin "# "."""
+    found, camera = _probe_fake(True)
+    assert found is not None
+    assert found.model == MODEL_GENERIC
+    assert found.mac == G3_PROPERTIES["persist.sys.miio_mac"]
+    assert camera.logins == 1
+
+
+def test_not_cameras():
+    """Password prompts, silence and closed ports are no cameras."""
+
+    async def run():
+        password, password_port = await _async_telnetd(
+            b"router login: ", b"Password: ")
+        silent, silent_port = await _async_telnetd(b"")
+        closed, closed_port = await _async_telnetd(b"")
+        closed.close()
+        await closed.wait_closed()
+        try:
+            return [
+                await async_probe("127.0.0.1", port, TIMEOUT)
+                for port in (password_port, silent_port, closed_port)
+            ]
+        finally:
+            for server in (password, silent):
+                server.close()
+
+    assert asyncio.run(run()) == [None, None, None]
+
+
+def test_discover():
+    """Several hosts are probed at once, only cameras are returned."""
+
+    async def run():
+        camera = FakeCamera()
+        port = await camera.start("127.0.0.1")
+        try:
+            return await async_discover(
+                ["127.0.0.1", "127.0.0.1"], port, concurrency=2,
+                timeout=TIMEOUT)
+        finally:
+            await camera.stop()
+
+    found = asyncio.run(run())
+    assert [camera.model for camera in found] == [MODEL_G3, MODEL_G3]
@@ -0,0 +1,162 @@
+"""Tests of the MQTT bridge against a stand-in for the broker.
+
+The camera side scripts run under the local sh, with stub mosquitto
+clients, agetprop, asetprop and mi_motor in a scratch bin folder that
+takes the place of /data/bin. The client side runs against a stand-in
+for the paho client.
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import time
+
+from core.const import MQTT_TOPIC, PERSIST_REC_MODE, SYS_PTZ_MOVING
+from core.mqtt import MqttBridge
+from core.push import PushChannel
+from core.shell import AsyncTelnetShellG3
+
+# every stub logs its name and arguments, one call per line
+STUB = '#!/bin/sh\necho "$(basename "$0") $*" >> {log}\n'
+# the broker delivers two commands, one not allowed, then closes
+SUB = ('#!/bin/sh\n'
+       'printf "move 10 20 30 40\\nset {allowed} 1\\n'
+       'set ro.sys.name evil\\n"\n')
+AGETPROP = ('#!/bin/sh\n'
+            'printf "[{recording}]: [1]\\r\\n[ro.sys.name]: [G3]\\r\\n'
+            '[{moving}]: [false]\\r\\n"\n')
+
+
+class _Camera:
+    """The parts of AqaraCamera the bridge uses."""
+
+    def __init__(self):
+        """Initialize the camera."""
+        self.push = PushChannel(self)
+        self.fed = []
+        self.external = []
+        self.push.feed = self.fed.append
+        self.push.set_external = self.external.append
+
+    def debug(self, message):
+        """Ignore debug output."""
+
+
+class _Client:
+    """Stand-in for paho.mqtt.client.Client."""
+
+    def __init__(self):
+        """Initialize the client."""
+        self.subscribed = []
+        self.published = []
+
+    def subscribe(self, topic):
+        """Record a subscription."""
+        self.subscribed.append(topic)
+
+    def publish(self, topic, payload):
+        """Record a publish."""
+        self.published.append((topic, payload))
+
+
+class _Message:
+    """Stand-in for paho.mqtt.client.MQTTMessage."""
+
+    def __init__(self, topic, payload):
+        """Initialize the message."""
+        self.topic = topic
+        self.payload = payload
+
+
+def _bin_folder(tmp_path):
+    """Fill a scratch /data/bin and return it and the call log."""
+    log = tmp_path / "calls.log"
+    log.touch()
+    folder = tmp_path / "bin"
+    folder.mkdir()
+    scripts = {
+        "mosquitto_pub": STUB.format(log=log),
+        "mosquitto_sub": SUB.format(allowed=PERSIST_REC_MODE),
+        "mi_motor": STUB.format(log=log),
+        "asetprop": STUB.format(log=log),
+        "agetprop": AGETPROP.format(
+            recording=PERSIST_REC_MODE, moving=SYS_PTZ_MOVING),
+    }
+    for name, text in scripts.items():
+        path = folder / name
+        path.write_text(text)
+        path.chmod(0o755)
+    return folder, log
+
+
+def _localize(script, folder):
+    """Point a script at the scratch /data/bin."""
+    return script.replace("/data/bin", str(folder))
+
+
+def test_command_script(tmp_path):
+    """Subscribed commands map to mi_motor and whitelisted setprops."""
+    folder, log = _bin_folder(tmp_path)
+    bridge = MqttBridge(_Camera())
+    script = bridge.command_script(AsyncTelnetShellG3("127.0.0.1"))
+    subprocess.run(["sh", "-c", _localize(script, folder)],
+                   check=True, timeout=10)
+    assert log.read_text().splitlines() == [
+        "asetprop {} true".format(SYS_PTZ_MOVING),
+        "mi_motor -x 10 -y 20 -a 30 -b 40",
+        "asetprop {} false".format(SYS_PTZ_MOVING),
+        "asetprop {} 1".format(PERSIST_REC_MODE),
+    ]
+
+
+def test_state_script(tmp_path):
+    """Watched properties are published retained, one topic each."""
+    folder, log = _bin_folder(tmp_path)
+    bridge = MqttBridge(_Camera())
+    script = bridge.state_script(AsyncTelnetShellG3("127.0.0.1"))
+    # the watch loop runs until killed
+    process = subprocess.Popen(["sh", "-c", _localize(script, folder)],
+                               start_new_session=True)
+    try:
+        deadline = time.monotonic() + 10
+        while (len(log.read_text().splitlines()) < 2 and
+               time.monotonic() < deadline):
+            time.sleep(0.05)
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+    assert sorted(log.read_text().splitlines()) == [
+        "mosquitto_pub -r -t {}/state/{} -m 1".format(
+            MQTT_TOPIC, PERSIST_REC_MODE),
+        "mosquitto_pub -r -t {}/state/{} -m false".format(
+            MQTT_TOPIC, SYS_PTZ_MOVING),
+    ]
+
+
+def test_client_mapping():
+    """State topics feed the push channel, commands go to one topic."""
+    camera = _Camera()
+    bridge = MqttBridge(camera)
+    client = _Client()
+
+    async def run():
+        bridge._loop = asyncio.get_running_loop()
+        bridge._client = client
+        assert not bridge.publish("move", 1, 2, 3, 4)
+        bridge._on_connect(client, None, {}, 0)
+        await asyncio.sleep(0)
+        bridge._on_message(client, None, _Message(
+            "{}/state/{}".format(MQTT_TOPIC, PERSIST_REC_MODE), b"1"))
+        await asyncio.sleep(0)
+        assert bridge.publish("move", 1, 2, 3, 4)
+        bridge._on_disconnect(client, None, 0)
+        await asyncio.sleep(0)
+        # the bridge reinstalls its scripts on the next connect
+        assert bridge._dropped
+
+    asyncio.run(run())
+    assert client.subscribed == ["{}/state/#".format(MQTT_TOPIC)]
+    assert camera.fed == [{PERSIST_REC_MODE: "1"}]
+    assert client.published == [
+        ("{}/command".format(MQTT_TOPIC), "move 1 2 3 4")]
+    assert camera.external == [True, False]
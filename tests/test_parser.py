@@ -0,0 +1,55 @@
+"""Tests of the incremental property dump parser."""
+from core.parser import PropertyParser
+from replay import load_session
+
+DUMP = (
+    "/ # [ro.sys.name]: [Camera Hub G3]\r\n"
+    "[persist.app.osd]: [cut short...]\r\n"
+    "[persist.app.script]: [first line\r\n"
+    "second line]\r\n"
+    "not a property\r\n"
+    "[persist.app.empty]: []\r\n"
+    "[sys.camera_ptz_moving]: [false]"
+)
+EXPECTED = {
+    "ro.sys.name": "Camera Hub G3",
+    "persist.app.script": "first line\nsecond line",
+    "persist.app.empty": "",
+    "sys.camera_ptz_moving": "false",
+}
+
+
+def _parse(chunks):
+    """Feed chunks and return the parser after close."""
+    parser = PropertyParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser
+
+
+def test_edge_cases():
+    """Prompts, cut values, multi-line values and a last open line."""
+    parser = _parse([DUMP])
+    assert parser.properties == EXPECTED
+    assert parser.truncated == {"persist.app.osd"}
+
+
+def test_any_split():
+    """A dump cut into pieces at any point parses the same."""
+    for size in range(1, 12):
+        chunks = [DUMP[pos:pos + size] for pos in range(0, len(DUMP), size)]
+        assert _parse(chunks).properties == EXPECTED, size
+    for cut in range(len(DUMP)):
+        assert _parse([DUMP[:cut], DUMP[cut:]]).properties == EXPECTED, cut
+
+
+def test_recorded_dump():
+    """The dump of a recorded session parses to what was recorded."""
+    fixture = load_session("g3_prompt.json")
+    answer = b"".join(
+        data for direction, data in fixture["session"]
+        if direction == "recv").decode("latin-1")
+    start = answer.index("[ro.sys.manufacturer]")
+    dump = answer[start:answer.index("\r\n/ # ", start)]
+    assert _parse([dump]).properties == fixture["expected"]["properties"]
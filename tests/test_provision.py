@@ -0,0 +1,152 @@
+"""Tests of the binary provisioner against a scripted camera shell."""
+import asyncio
+import hashlib
+
+import pytest
+
+from core import provision
+from core.provision import (
+    BIN_DIR,
+    VERIFIED_FILE,
+    Binary,
+    Provisioner
+)
+from core.shell import CommandResult
+
+DATA = b"\x7fELF mi_motor"
+GOOD = Binary("mi_motor", hashlib.md5(DATA).hexdigest(), "bin/mi_motor")
+PATH = "{}/mi_motor".format(BIN_DIR)
+PART = PATH + ".part"
+
+
+class _Shell:
+    """A camera file system behind run_batch.
+
+    files maps a path to its content and mtime; downloads lists what
+    each wget delivers, None for a failed one.
+    """
+
+    def __init__(self, files=None, downloads=()):
+        """Initialize the shell."""
+        self.files = dict(files or {})
+        self.downloads = list(downloads)
+        self.commands = []
+        self.clock = 1000
+
+    async def run_batch(self, commands, timeout=None):
+        """Run the commands one after the other."""
+        self.commands.extend(commands)
+        return [self._run(command) for command in commands]
+
+    def _run(self, command):
+        """Answer one command."""
+        path = command.split()[-1]
+        if command.startswith("cat "):
+            return self._cat(path)
+        if command.startswith("stat "):
+            if path not in self.files:
+                return CommandResult("No such file", 1)
+            data, mtime = self.files[path]
+            return CommandResult("{} {}".format(len(data), mtime), 0)
+        if command.startswith("md5sum "):
+            if path not in self.files:
+                return CommandResult("No such file", 1)
+            digest = hashlib.md5(self.files[path][0]).hexdigest()
+            return CommandResult("{}  {}".format(digest, path), 0)
+        if "wget" in command:
+            data = self.downloads.pop(0) if self.downloads else None
+            if data is None:
+                return CommandResult("wget: error", 1)
+            self._write(PART, data)
+            return CommandResult("", 0)
+        if command.startswith("chmod"):
+            self.files[PATH] = self.files.pop(PART)
+            self.clock += 1
+            return CommandResult("", 0)
+        if command.startswith("rm -f"):
+            self.files.pop(path, None)
+            return CommandResult("", 0)
+        if command.startswith("printf"):
+            text = command.split("'")[1].replace("\\n", "\n")
+            self._write(VERIFIED_FILE, text.encode())
+            return CommandResult("", 0)
+        raise AssertionError("unexpected command " + command)
+
+    def _cat(self, path):
+        """Print a file."""
+        if path not in self.files:
+            return CommandResult("No such file", 1)
+        return CommandResult(self.files[path][0].decode(), 0)
+
+    def _write(self, path, data):
+        """Store a file."""
+        self.clock += 1
+        self.files[path] = (data, self.clock)
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    """Retry without waiting."""
+
+    async def no_sleep(_delay):
+        pass
+
+    monkeypatch.setattr(provision.asyncio, "sleep", no_sleep)
+
+
+def _ensure(shell, trusted=()):
+    """Run the provisioner and return it and its result."""
+    provisioner = Provisioner(shell, retries=3)
+    result = asyncio.run(provisioner.async_ensure([GOOD], trusted))
+    return provisioner, result
+
+
+def test_marker_skips_md5():
+    """A binary matching its marker is trusted without hashing."""
+    shell = _Shell({PATH: (DATA, 500)})
+    provisioner, result = _ensure(shell)
+    assert result == {"mi_motor": True}
+    assert provisioner.hashed == 1
+    marker = shell.files[VERIFIED_FILE][0].decode()
+    assert marker == "mi_motor {} {} 500\n".format(GOOD.md5, len(DATA))
+
+    provisioner, result = _ensure(shell)
+    assert result == {"mi_motor": True}
+    assert provisioner.hashed == 0
+    assert not any("md5sum" in command for command in shell.commands[-2:])
+
+
+def test_changed_binary_is_hashed():
+    """A binary touched since its marker is hashed and replaced if bad."""
+    marker = "mi_motor {} {} 500\n".format(GOOD.md5, len(DATA)).encode()
+    shell = _Shell({PATH: (b"other", 600), VERIFIED_FILE: (marker, 1)},
+                   downloads=[DATA])
+    provisioner, result = _ensure(shell)
+    assert result == {"mi_motor": True}
+    assert provisioner.hashed == 1
+    assert provisioner.installed == 1
+    assert shell.files[PATH][0] == DATA
+    data, mtime = shell.files[PATH]
+    assert shell.files[VERIFIED_FILE][0].decode() == \
+        "mi_motor {} {} {}\n".format(GOOD.md5, len(data), mtime)
+
+
+def test_retries_are_bounded():
+    """Failed and corrupt downloads are retried, then given up."""
+    shell = _Shell(downloads=[None, b"corrupt", None])
+    provisioner, result = _ensure(shell)
+    assert result == {"mi_motor": False}
+    assert provisioner.installed == 0
+    assert sum("wget" in command for command in shell.commands) == 3
+    # a complete but corrupt file is not resumed
+    assert "rm -f {}".format(PART) in shell.commands
+    assert PATH not in shell.files
+
+
+def test_retry_succeeds():
+    """A download failing once is installed on the next attempt."""
+    shell = _Shell(downloads=[None, DATA])
+    provisioner, result = _ensure(shell)
+    assert result == {"mi_motor": True}
+    assert provisioner.installed == 1
+    assert sum("wget" in command for command in shell.commands) == 2
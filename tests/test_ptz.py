@@ -0,0 +1,113 @@
+"""Tests of the PTZ worker."""
+import asyncio
+
+from core.const import (
+    ANGLE_X,
+    ANGLE_X_RANGE,
+    ANGLE_Y,
+    ANGLE_Y_RANGE,
+    DIR_LEFT,
+    DIR_UP,
+    PTZ_STEP,
+    SPAN_X,
+    SPAN_Y
+)
+from core.ptz import PtzWorker
+
+
+class _Camera:
+    """The parts of AqaraCamera the worker uses, with a slow motor."""
+
+    def __init__(self, ok=True):
+        """Initialize the camera."""
+        self.ok = ok
+        self.position = {ANGLE_X: 0, ANGLE_Y: 0, SPAN_X: 100, SPAN_Y: 100}
+        self.moves = []
+        self.reads = 0
+        self.moving = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def async_get_motor_position(self):
+        """Read the motor."""
+        self.reads += 1
+        return dict(self.position)
+
+    async def async_move_motor(self, angle_x, angle_y, span_x, span_y):
+        """Move the motor once released."""
+        self.moves.append((angle_x, angle_y, span_x, span_y))
+        self.moving.set()
+        await self.release.wait()
+        return self.ok
+
+    def debug(self, message):
+        """Ignore debug output."""
+
+
+def test_coalescing():
+    """Steps queued while the motor moves become one move."""
+
+    async def run():
+        camera = _Camera()
+        worker = PtzWorker(camera)
+        first = asyncio.create_task(worker.async_step(DIR_UP))
+        await camera.moving.wait()
+        steps = [asyncio.create_task(worker.async_step(DIR_LEFT))
+                 for _ in range(5)]
+        await asyncio.sleep(0)
+        assert worker.stats["queue_depth"] == 5
+        camera.release.set()
+        results = await asyncio.gather(first, *steps)
+        await worker.async_stop()
+        return camera, worker, results
+
+    camera, worker, results = asyncio.run(run())
+    assert results == [True] * 6
+    assert camera.moves == [
+        (0, PTZ_STEP, 100, 100),
+        (5 * PTZ_STEP, PTZ_STEP, 100, 100),
+    ]
+    assert camera.reads == 1
+    assert worker.moves == 2
+    assert worker.coalesced == 4
+    assert worker.position[ANGLE_X] == 5 * PTZ_STEP
+
+
+def test_clamping():
+    """Moves past the motor range stop at its ends."""
+
+    async def run():
+        camera = _Camera()
+        camera.release.set()
+        worker = PtzWorker(camera)
+        await worker.async_move(1000, -1000, 50, 50)
+        worker.set_position({ANGLE_X: ANGLE_X_RANGE[1], ANGLE_Y: 0,
+                             SPAN_X: 50, SPAN_Y: 50})
+        await worker.async_step(DIR_LEFT)
+        await worker.async_stop()
+        return camera
+
+    camera = asyncio.run(run())
+    # a full absolute target needs no position read
+    assert camera.reads == 0
+    assert camera.moves == [
+        (ANGLE_X_RANGE[1], ANGLE_Y_RANGE[0], 50, 50),
+        (ANGLE_X_RANGE[1], 0, 50, 50),
+    ]
+
+
+def test_failed_move():
+    """A failed move is reported and the position read again."""
+
+    async def run():
+        camera = _Camera(ok=False)
+        camera.release.set()
+        worker = PtzWorker(camera)
+        moved = await worker.async_move(10, 10, 50, 50)
+        await worker.async_step(DIR_UP)
+        await worker.async_stop()
+        return camera, worker, moved
+
+    camera, worker, moved = asyncio.run(run())
+    assert moved is False
+    assert worker.position is None
+    assert camera.reads == 1
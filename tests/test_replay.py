@@ -0,0 +1,54 @@
+"""Tests of the shell against recorded camera sessions."""
+import asyncio
+
+import pytest
+
+from core.shell import shell_class
+from replay import ReplayCamera, async_run_scenario, load_session
+
+FIXTURES = ("g3_sentinel.json", "g3_prompt.json", "generic_sentinel.json")
+
+
+async def _async_replay(fixture, **options):
+    """Run the scenario against a replay of fixture."""
+    camera = ReplayCamera(fixture["session"], **options)
+    shell = shell_class(fixture["model"])(
+        "127.0.0.1", port=await camera.start(), framing=fixture["framing"])
+    try:
+        await shell.connect()
+        result = await async_run_scenario(shell)
+    finally:
+        await shell.close()
+        await camera.stop()
+    return result, camera.mismatches
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+@pytest.mark.parametrize("split,jitter", [(None, 0.01), (1, 0), (7, 0.001)])
+def test_replay(name, split, jitter):
+    """Answers cut anywhere parse the same as when recorded."""
+    fixture = load_session(name)
+    result, mismatches = asyncio.run(_async_replay(
+        fixture, jitter=jitter, split=split))
+    assert mismatches == []
+    assert result == fixture["expected"]
+
+
+def test_replay_mismatch():
+    """A shell sending something else than recorded is hung up on."""
+    fixture = load_session("g3_sentinel.json")
+    fixture["model"] = "generic"
+    camera = ReplayCamera(fixture["session"])
+
+    async def run():
+        shell = shell_class("generic")("127.0.0.1", port=await camera.start())
+        try:
+            await shell.connect()
+            with pytest.raises(EOFError):
+                await shell.login()
+        finally:
+            await shell.close()
+            await camera.stop()
+
+    asyncio.run(run())
+    assert camera.mismatches[0][0] == b"root\n"
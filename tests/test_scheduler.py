@@ -0,0 +1,128 @@
+"""Tests of the shell command scheduler."""
+import asyncio
+
+import pytest
+
+from core.const import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_STREAM
+)
+from core.scheduler import CommandExpired, CommandScheduler, command_priority
+from core.shell import ShellMetrics
+
+
+async def _async_hold(scheduler, priority, order, release,
+                      interruptible=False):
+    """Take the shell at priority, note it and hold it until release."""
+    with command_priority(priority, interruptible=interruptible):
+        async with scheduler:
+            order.append(priority)
+            await release.wait()
+
+
+def test_most_urgent_first():
+    """Waiters get the shell by priority, then in arrival order."""
+
+    async def run():
+        scheduler = CommandScheduler()
+        order = []
+        release = asyncio.Event()
+        release.set()
+        holder = asyncio.Event()
+        first = asyncio.create_task(
+            _async_hold(scheduler, PRIORITY_BACKGROUND, order, holder))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(
+                _async_hold(scheduler, priority, order, release))
+            for priority in (PRIORITY_BACKGROUND, PRIORITY_STREAM,
+                             PRIORITY_INTERACTIVE)
+        ]
+        await asyncio.sleep(0)
+        # the holder is not interruptible
+        assert not scheduler.yielding
+        holder.set()
+        await asyncio.gather(first, *tasks)
+        assert not scheduler.yielding
+        return order
+
+    assert asyncio.run(run()) == [
+        PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_STREAM,
+        PRIORITY_BACKGROUND]
+
+
+def test_yielding():
+    """Only an interruptible holder gives way to a more urgent waiter."""
+
+    async def run():
+        scheduler = CommandScheduler()
+        release = asyncio.Event()
+        holder = asyncio.create_task(_async_hold(
+            scheduler, PRIORITY_BACKGROUND, [], release, interruptible=True))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(
+            _async_hold(scheduler, PRIORITY_BACKGROUND, [], release))
+        await asyncio.sleep(0)
+        equal = scheduler.yielding
+        urgent = asyncio.create_task(
+            _async_hold(scheduler, PRIORITY_INTERACTIVE, [], release))
+        await asyncio.sleep(0)
+        more_urgent = scheduler.yielding
+        release.set()
+        await asyncio.gather(holder, waiter, urgent)
+        return equal, more_urgent
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_deadline_expires():
+    """A command still queued at its deadline fails instead of running."""
+
+    async def run():
+        metrics = ShellMetrics()
+        scheduler = CommandScheduler(metrics)
+        release = asyncio.Event()
+        holder = asyncio.create_task(
+            _async_hold(scheduler, PRIORITY_BACKGROUND, [], release))
+        await asyncio.sleep(0)
+        with command_priority(PRIORITY_STREAM, deadline=0.05):
+            with pytest.raises(CommandExpired):
+                async with scheduler:
+                    pass
+        # the expired waiter is gone, it neither yields nor gets the shell
+        assert not scheduler.yielding
+        release.set()
+        await holder
+        with command_priority(PRIORITY_STREAM, deadline=0.05):
+            async with scheduler:
+                pass
+        return metrics
+
+    metrics = asyncio.run(run())
+    assert metrics.expired == 1
+    assert isinstance(CommandExpired(), asyncio.TimeoutError)
+
+
+def test_cancelled_waiter():
+    """A waiter cancelled in the queue does not keep the shell."""
+
+    async def run():
+        scheduler = CommandScheduler()
+        release = asyncio.Event()
+        holder = asyncio.create_task(
+            _async_hold(scheduler, PRIORITY_BACKGROUND, [], release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(
+            _async_hold(scheduler, PRIORITY_INTERACTIVE, [], release))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        await holder
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # free again
+        await asyncio.wait_for(scheduler.acquire(PRIORITY_BACKGROUND), 1)
+        scheduler.release()
+
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+"""Tests of the asyncio telnet shell against the fake camera."""
+import asyncio
+import json
+
+from core.const import PRIORITY_BACKGROUND
+from core.scheduler import command_priority
+from core.shell import FRAMING_SENTINEL, AsyncTelnetShellG3
+from fake_camera import FakeCamera
+
+
+async def _async_shell(camera, framing=FRAMING_SENTINEL):
+    """Return a shell logged in to the fake camera."""
+    shell = AsyncTelnetShellG3(
+        "127.0.0.1", port=await camera.start(), framing=framing)
+    await shell.connect()
+    await shell.login()
+    return shell
+
+
+def test_get_prop_sentinel():
+    """A single property comes back without the prompts around it."""
+
+    async def run():
+        camera = FakeCamera()
+        shell = await _async_shell(camera)
+        try:
+            url = await shell.get_prop("sys.camera_rtsp_url")
+            version = await shell.get_prop("ro.sys.fw_ver")
+            batch = await shell.run_batch(["echo next"])
+        finally:
+            await shell.close()
+            await camera.stop()
+        return url, version, batch
+
+    url, version, batch = asyncio.run(run())
+    assert json.loads(url)["360p"] == "rtsp://192.168.1.20:8554/360p"
+    assert version == "3.3.4_0007.0004"
+    # nothing left over for the next command
+    assert batch[0].output == "next"
+    assert batch[0].status == 0
+
+
+def test_strip_prompts():
+    """Every prompt before and after an output is dropped."""
+    shell = AsyncTelnetShellG3("127.0.0.1")
+    assert shell._strip_prompts("/ # value\r\n/ # / # / # ") == "value"
+    assert shell._strip_prompts("~ # \r\n/ # value\r\n") == "value"
+    assert shell._strip_prompts("a # b") == "a # b"
+
+
+async def _async_contend(interruptible):
+    """Run a slow background batch, then an urgent command behind it."""
+    camera = FakeCamera()
+    shell = await _async_shell(camera)
+
+    async def background():
+        with command_priority(PRIORITY_BACKGROUND,
+                              interruptible=interruptible):
+            return await shell.run_batch(["sleep 1.5", "echo installed"])
+
+    try:
+        slow = asyncio.create_task(background())
+        await asyncio.sleep(0.2)
+        urgent = await shell.run_batch(["echo urgent"])
+        return await slow, urgent, shell.metrics.yielded
+    finally:
+        await shell.close()
+        await camera.stop()
+
+
+def test_background_batch_not_interrupted():
+    """An urgent command waits for a batch not marked interruptible."""
+    slow, urgent, yielded = asyncio.run(_async_contend(False))
+    assert [result.status for result in slow] == [0, 0]
+    assert slow[1].output == "installed"
+    assert urgent[0].output == "urgent"
+    assert yielded == 0
+
+
+def test_interruptible_batch_yields():
+    """An interruptible batch is cut short for an urgent command."""
+    slow, urgent, yielded = asyncio.run(_async_contend(True))
+    assert slow[-1].status == -1
+    assert urgent[0].output == "urgent"
+    assert urgent[0].status == 0
+    assert yielded == 1